@@ -1,16 +1,28 @@
 # app.py
+import os
 from flask import Flask
 from flask_cors import CORS
 from routes import bp
+from json_provider import FastJSONProvider
+import jobs
+import snapshot
+import tab_index
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)  # orjson when installed, same bytes as the default
 app.url_map.strict_slashes = False  # <— accept both /auth/login and /auth/login/
 
+# shared with the Quart side of asgi.py, which sets the same headers itself
+CORS_ALLOW_HEADERS = ["Content-Type", "Authorization", "If-None-Match"]
+CORS_EXPOSE_HEADERS = ["ETag", "Retry-After", "X-Served-From"]
+CORS_METHODS = ["GET", "POST", "OPTIONS"]
+
 CORS(
     app,
     resources={r"/*": {"origins": "*"}},
-    allow_headers=["Content-Type", "Authorization"],
-    methods=["GET", "POST", "OPTIONS"],
+    allow_headers=CORS_ALLOW_HEADERS,
+    expose_headers=CORS_EXPOSE_HEADERS,
+    methods=CORS_METHODS,
 )
 
 app.register_blueprint(bp)
@@ -18,6 +30,15 @@ app.register_blueprint(bp)
 from routes import auth_login  # import the view function
 app.add_url_rule("/auth/login", view_func=auth_login, methods=["POST"])
 
+# Background job workers: resume jobs left queued, and orphaned running ones, now
+# rather than on the first job-mode request.
+jobs.start(app)
+
+# Warm the derived per-user indexes once at boot (INDEX_WARM_ON_START=0 to skip),
+# from the latest local snapshot plus the rows added since when there is one.
+if os.environ.get("INDEX_WARM_ON_START", "1") == "1":
+    tab_index.warm_all(snapshot.load(tab_index.followed_tabs()))
+
 print("\n[FLASK ROUTES]")
 for rule in app.url_map.iter_rules():
     print(f"  {','.join(sorted(rule.methods)):<18} {rule.rule}")
@@ -0,0 +1,76 @@
+# backend/asgi.py
+"""
+Async serving mode.
+
+    uvicorn asgi:app --port 8000          (or: hypercorn asgi:app)
+
+The LLM/Sheets-bound endpoints in async_routes.ASYNC_PATHS are served by a
+Quart app, so one worker can hold hundreds of in-flight model calls. All
+other paths fall through to the existing Flask app (app.py) via a2wsgi's
+WSGI adapter, so the API surface is unchanged. a2wsgi runs Flask on its own
+pool of WSGI_THREADS threads; asgiref's WsgiToAsgi, which hands calls to a
+per-request CurrentThreadExecutor, broke Flask requests on a keep-alive
+connection once a Quart route had run on it (bench_async.py
+--check-dispatch). Job mode (`Prefer:
+respond-async`, `?mode=job`) works on the Quart routes too: the request is
+queued and later run by the Flask app's job workers (jobs.py), as under WSGI.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from a2wsgi import WSGIMiddleware
+from quart import Quart
+
+from app import app as flask_app, CORS_ALLOW_HEADERS, CORS_EXPOSE_HEADERS, CORS_METHODS
+from json_provider import FastJSONProvider
+from async_routes import abp, ASYNC_PATHS
+
+# Blocking Sheets calls run on the loop's default executor; size it for the
+# number of concurrent requests one worker is expected to hold.
+ASYNC_IO_THREADS = int(os.environ.get("ASYNC_IO_THREADS", "64"))
+# Threads serving the Flask (non-async) routes.
+WSGI_THREADS = int(os.environ.get("WSGI_THREADS", "16"))
+
+quart_app = Quart(__name__)
+quart_app.json = FastJSONProvider(quart_app)
+quart_app.url_map.strict_slashes = False
+quart_app.register_blueprint(abp)
+
+
+@quart_app.before_serving
+async def _configure_executor():
+    import asyncio
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(ASYNC_IO_THREADS))
+
+
+@quart_app.after_request
+async def _cors(resp):
+    # the flask_cors settings of app.py, so ETag / Retry-After stay readable and
+    # conditional GETs pass preflight behind this entrypoint too
+    resp.headers["Access-Control-Allow-Origin"] = "*"
+    resp.headers["Access-Control-Allow-Headers"] = ", ".join(CORS_ALLOW_HEADERS)
+    resp.headers["Access-Control-Expose-Headers"] = ", ".join(CORS_EXPOSE_HEADERS)
+    resp.headers["Access-Control-Allow-Methods"] = ", ".join(CORS_METHODS)
+    return resp
+
+
+class _Dispatcher:
+    """Send ASYNC_PATHS (and lifespan events) to Quart, everything else to Flask."""
+
+    def __init__(self, async_app, wsgi_app, async_paths):
+        self.async_app = async_app
+        self.wsgi_app = WSGIMiddleware(wsgi_app, workers=WSGI_THREADS)
+        self.async_paths = {p.rstrip("/") for p in async_paths}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan" or scope.get("path", "").rstrip("/") in self.async_paths:
+            await self.async_app(scope, receive, send)
+        else:
+            await self.wsgi_app(scope, receive, send)
+
+
+app = _Dispatcher(quart_app, flask_app, ASYNC_PATHS)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, port=8000)
@@ -0,0 +1,355 @@
+# backend/async_routes.py
+"""
+Async (Quart) versions of the endpoints that spend most of their time
+waiting on Sheets or the model: /meals/initial, /meals/daily, /meals/swap and
+/summaries/run. Served by asgi.py; every other route stays on the sync Flask
+blueprint. Request/response shapes are identical to routes.py, job mode
+included: an opted-in request is queued for the Flask view of the same
+name (jobs.py) and answered with the same 202.
+"""
+import asyncio
+import functools
+
+from quart import Blueprint, Response, request, jsonify, g, abort
+
+import async_sheets_client as asheets
+import auth_tokens
+import jobs
+import last_plans
+import summary_delta
+from singleflight import coalesce_async
+from routes import (
+    bcrypt,
+    REQUIRE_AUTH,
+    TODAY,
+    DEFAULT_BIOMARKER_SUMMARY,
+    DEFAULT_TASTE_SUMMARY,
+    _initial_profile,
+    _meal_rows,
+    _latest_summaries,
+    _user_restrictions,
+)
+
+from diet_app_ai import json_codec
+from diet_app_ai.initial_meal_generation_workflow import agenerate_initial_meals, model_routing, meal_schema
+from diet_app_ai.daily_meal_generation_workflow   import agenerate_daily_meals
+from diet_app_ai.biomarker_summary_workflow       import aupdate_biomarker_summary
+from diet_app_ai.preference_summary_workflow      import aupdate_taste_summary
+from diet_app_ai.single_meal_generation_workflow  import aenforce_restrictions, agenerate_single_meal, RestrictionUnmetError
+
+abp = Blueprint("api_async", __name__)
+
+# Paths asgi.py routes to this blueprint instead of the Flask app.
+ASYNC_PATHS = {"/auth/login", "/meals/initial", "/meals/daily", "/meals/swap", "/summaries/run"}
+
+
+async def _safe_json() -> dict:
+    """Same contract as routes._safe_json: always a dict, never raises."""
+    data = await request.get_json(force=True, silent=True)
+    if isinstance(data, dict):
+        return data
+    raw = (await request.get_data(as_text=True)) or ""
+    if raw:
+        try:
+            j = json_codec.loads(raw)
+            if isinstance(j, dict):
+                return j
+        except Exception:
+            pass
+    return {}
+
+def _extract_username(data: dict) -> str:
+    claimed = ""
+    for k in ("Username", "username", "user", "name"):
+        v = data.get(k)
+        if isinstance(v, str) and v.strip():
+            claimed = v.strip()
+            break
+    claimed = claimed or (request.args.get("Username") or request.args.get("username") or "").strip()
+    token_user = g.get("username")
+    if token_user:
+        if claimed and claimed != token_user:
+            # JSON body like routes._extract_username (a bare abort(403) renders HTML)
+            abort(Response(json_codec.dumps({"error": "Username does not match session token"}),
+                           403, content_type="application/json"))
+        return token_user
+    g.request_user = claimed  # attribution for llm_ledger
+    return claimed
+
+@abp.before_request
+async def _authenticate():
+    g.username = None
+    if request.method == "OPTIONS":
+        return None
+    username, err = auth_tokens.authenticate(request.headers.get("Authorization"))
+    if err:
+        return {"error": err}, 401
+    g.username = username
+    if REQUIRE_AUTH and not username and request.endpoint != "api_async.auth_login":
+        return {"error": "authentication required"}, 401
+    return None
+
+@abp.errorhandler(RestrictionUnmetError)
+async def _restrictions_unmet(e):
+    # a meal kept breaking the user's restrictions: fail rather than serve a smaller plan
+    return jsonify({"error": f"Could not generate meals that honor the dietary restrictions: {e}",
+                    "violations": e.violations}), 502
+
+@abp.errorhandler(TimeoutError)
+async def _llm_deadline(e):
+    return jsonify({"error": f"Model did not respond in time: {e}"}), 504
+
+@abp.errorhandler(ConnectionError)
+async def _dependency_down(e):
+    resp = jsonify({"error": f"Service temporarily unavailable: {e}"})
+    resp.headers["Retry-After"] = str(max(1, round(getattr(e, "retry_in_s", 0) or 5)))
+    return resp, 503
+
+def _job_mode(view):
+    """Same as jobs.job_mode; the job replays the Flask view, so it runs on the job workers."""
+    @functools.wraps(view)
+    async def wrapper(*args, **kwargs):
+        body = await _safe_json()
+        if not jobs.wants_job(request.headers, request.args, body):
+            return await view(*args, **kwargs)
+        payload, status, headers = await asheets.run(
+            jobs.enqueue, f"api.{view.__name__}", request.path, body, request.args, g.get("username"))
+        return jsonify(payload), status, headers
+    return wrapper
+
+def _last_plan_fallback(view):
+    """Same as routes._last_plan_fallback: serve the last stored plan while a dependency is down."""
+    @functools.wraps(view)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await view(*args, **kwargs)
+        except ConnectionError as e:
+            username = _extract_username(await _safe_json())
+            last = await asheets.run(last_plans.get, username) if username else None
+            if last is None:
+                raise
+            date, plan = last
+            print(f"[meals_daily] {e}; serving {username}'s plan from {date}")
+            resp = jsonify(plan)
+            resp.headers["X-Served-From"] = f"last-plan; date={date}"
+            return resp, 200
+    return wrapper
+
+async def _persist(rows_ing: list, rows_steps: list) -> None:
+    await asyncio.gather(
+        asheets.append_rows("MealIngredients", rows_ing),
+        asheets.append_rows("MealSteps", rows_steps),
+    )
+
+async def _summaries(plan: summary_delta.Plan, old_bio: str, old_taste: str):
+    """Run the summary workflows the plan needs, concurrently; the others keep their old text."""
+    async def _bio():
+        if not plan.need_bio:
+            return old_bio
+        out = await aupdate_biomarker_summary(payload=plan.bio_payload)
+        return out if isinstance(out, str) else str(out)
+
+    async def _taste():
+        if not plan.need_taste:
+            return old_taste
+        out = await aupdate_taste_summary(data=plan.taste_payload)
+        return out if isinstance(out, str) else str(out)
+
+    return await asyncio.gather(_bio(), _taste(), return_exceptions=True)
+
+
+# ---------- Login ----------
+@abp.post("/auth/login")
+async def auth_login():
+    data = (await request.get_json(silent=True)) or {}
+
+    def as_str(x):
+        if x is None: return ""
+        if isinstance(x, dict) and "value" in x: return str(x["value"])
+        return str(x)
+
+    username = as_str(data.get("username")).strip()
+    password = as_str(data.get("password"))
+    if not username:
+        return {"error": "username required"}, 400
+
+    _row_idx, row, header = await asheets.find_row_by_header_value("Users", "Username", username)
+    if row is None:
+        return jsonify({"error": "user not found"}), 404
+
+    ph_i = header.index("PasswordHash")
+    pwd_hash = row[ph_i] if len(row) > ph_i else ""
+    if not pwd_hash:
+        return jsonify({"needsPassword": True}), 409
+
+    # bcrypt runs on its own pool; the loop keeps serving other requests
+    if not await auth_tokens.acheck_password(bcrypt, pwd_hash, password):
+        return jsonify({"error": "bad credentials"}), 401
+
+    token, expires_at = auth_tokens.issue(username)
+    return jsonify({"ok": True, "token": token, "expires_at": expires_at}), 200
+
+
+# ---------- Initial meal generation ----------
+@abp.post("/meals/initial")
+@_job_mode
+@coalesce_async
+async def meals_initial():
+    req = await _safe_json()
+    username = _extract_username(req)
+    if not username:
+        return {"error": "Username is required"}, 400
+
+    profile, err, status = await asheets.run(_initial_profile, username)
+    if err:
+        return jsonify(err), status
+
+    with model_routing.collect() as calls:
+        meals = await agenerate_initial_meals(user_profile=profile)
+        meals = await aenforce_restrictions(meals, profile["dietary_restrictions"])
+    used = model_routing.used(calls, "initial", "single")
+
+    rows_ing, rows_steps = [], []
+    for slug, meta in meals.items():
+        ing, steps = _meal_rows(username, "Initial", slug, meta, used)
+        rows_ing += ing; rows_steps += steps
+    await _persist(rows_ing, rows_steps)
+
+    return meals, 200
+
+
+# ---------- Daily meal generation ----------
+@abp.post("/meals/daily")
+@_job_mode
+@_last_plan_fallback  # outside coalesce, which replays only body and status
+@coalesce_async
+async def meals_daily():
+    data = await _safe_json()
+    username = _extract_username(data)
+    if not username:
+        return {"error": "Username is required"}, 400
+
+    (biomarker_summary, taste_profile), restrictions = await asyncio.gather(
+        asheets.run(_latest_summaries, username),
+        asheets.run(_user_restrictions, username),
+    )
+    restrictions = restrictions or []
+
+    if not biomarker_summary or not taste_profile:
+        window_days = int(data.get("window_days", 7) or 7)
+        plan = await asheets.run(summary_delta.plan, username, biomarker_summary, taste_profile, window_days,
+                                 need_bio=not biomarker_summary, need_taste=not taste_profile)
+        with model_routing.collect() as summary_calls:
+            new_bio, new_taste = await _summaries(plan, biomarker_summary, taste_profile)
+        bio_done = plan.need_bio and not isinstance(new_bio, Exception)
+        taste_done = plan.need_taste and not isinstance(new_taste, Exception)
+        if not biomarker_summary:
+            biomarker_summary = new_bio if bio_done else DEFAULT_BIOMARKER_SUMMARY
+        if not taste_profile:
+            taste_profile = new_taste if taste_done else DEFAULT_TASTE_SUMMARY
+        if bio_done or taste_done:
+            await asheets.append_row("UserSummarization", [TODAY(), username, taste_profile, biomarker_summary,
+                                                           *model_routing.used(summary_calls, "biomarker_summary", "taste_summary")])
+            await asheets.run(summary_delta.commit, plan, bio_done, taste_done)
+
+    payload_context = {
+        "biomarker_summary":    biomarker_summary or "No recent biomarker data.",
+        "taste_summary":        taste_profile or "No strong preferences recorded.",
+        "dietary_restrictions": restrictions,
+    }
+
+    with model_routing.collect() as calls:
+        try:
+            meals = await agenerate_daily_meals(context=payload_context)
+        except meal_schema.MealFormatError as e:
+            return {"error": f"Model did not return valid JSON: {e}", "raw": e.raw}, 500
+        meals = await aenforce_restrictions(meals, restrictions, context=payload_context)
+    used = model_routing.used(calls, "daily", "single")
+
+    rows_ing, rows_steps = [], []
+    for meal_type in ("breakfast", "lunch", "dinner"):
+        for slug, meta in (meals.get(meal_type, {}) or {}).items():
+            ing, steps = _meal_rows(username, meal_type.capitalize(), slug, meta, used)
+            rows_ing += ing; rows_steps += steps
+    await _persist(rows_ing, rows_steps)
+
+    await asheets.run(last_plans.save, username, TODAY(), meals)
+    return jsonify(meals), 200
+
+
+# ---------- Single-meal swap ----------
+@abp.post("/meals/swap")
+@coalesce_async
+async def meals_swap():
+    data = await _safe_json()
+    username = _extract_username(data)
+    meal_type = str(data.get("MealType") or data.get("meal_type") or "").strip().lower()
+    meal_code = str(data.get("MealCode") or data.get("meal_code") or "").strip()
+    if not username:
+        return {"error": "Username is required"}, 400
+    if meal_type not in ("breakfast", "lunch", "dinner"):
+        return {"error": "MealType must be one of breakfast, lunch, dinner"}, 400
+    if not meal_code:
+        return {"error": "MealCode is required"}, 400
+
+    existing = [str(c) for c in (data.get("ExistingCodes") or []) if c]
+    (biomarker_summary, taste_profile), restrictions = await asyncio.gather(
+        asheets.run(_latest_summaries, username),
+        asheets.run(_user_restrictions, username),
+    )
+    restrictions = restrictions or []
+
+    context = {
+        "biomarker_summary": biomarker_summary or "No recent biomarker data.",
+        "taste_summary":     taste_profile or "No strong preferences recorded.",
+        "existing_slugs":    sorted(set(existing) | {meal_code}),
+    }
+    with model_routing.collect() as calls:
+        try:
+            meal = await agenerate_single_meal({
+                **context,
+                "meal_type":            meal_type,
+                "dietary_restrictions": restrictions,
+            })
+        except (ConnectionError, TimeoutError):
+            raise  # open breaker / deadline: the 503 + Retry-After and 504 handlers
+        except Exception as e:
+            return {"error": f"Model did not return a valid meal: {e}"}, 500
+        meal = (await aenforce_restrictions({meal_type: meal}, restrictions, context=context)).get(meal_type) or {}
+    if not meal:
+        return {"error": "Could not generate a replacement that honors the dietary restrictions"}, 502
+
+    slug, meta = next(iter(meal.items()))
+    await _persist(*_meal_rows(username, meal_type.capitalize(), slug, meta, model_routing.used(calls, "single")))
+
+    await asheets.run(last_plans.swap, username, meal_type, meal_code, meal)
+
+    return jsonify({"meal_type": meal_type, "replaced": meal_code, "meal": meal}), 200
+
+
+# ---------- Summaries ----------
+@abp.post("/summaries/run")
+@_job_mode
+@coalesce_async
+async def run_summaries():
+    data = await _safe_json()
+    username = _extract_username(data)
+    window_days = int(data.get("window_days", 7) or 7)
+    if not username:
+        return {"error": "Username is required"}, 400
+
+    old_bio, old_taste = await asheets.run(_latest_summaries, username)
+    plan = await asheets.run(summary_delta.plan, username, old_bio, old_taste, window_days)
+    if not plan.need_bio and not plan.need_taste:
+        return {"ok": True, "unchanged": True}, 200
+    with model_routing.collect() as calls:
+        new_bio, new_taste = await _summaries(plan, old_bio, old_taste)
+    if isinstance(new_bio, Exception):
+        return {"error": f"update_biomarker_summary failed: {new_bio}"}, 500
+    if isinstance(new_taste, Exception):
+        return {"error": f"update_taste_summary failed: {new_taste}"}, 500
+
+    await asheets.append_row("UserSummarization", [TODAY(), username, new_taste, new_bio,
+                                                   *model_routing.used(calls, "biomarker_summary", "taste_summary")])
+    await asheets.run(summary_delta.commit, plan, plan.need_bio, plan.need_taste)
+    return {"ok": True}, 201
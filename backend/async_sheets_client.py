@@ -0,0 +1,45 @@
+# backend/async_sheets_client.py
+"""
+Async facade over sheets_client for the ASGI app (asgi.py).
+
+gspread is a blocking client, so each call runs on the event loop's default
+executor via asyncio.to_thread; the loop itself never blocks on Sheets I/O
+and many requests can have Sheets calls in flight at once. Signatures mirror
+sheets_client one-for-one.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import sheets_client as _sync
+
+T = TypeVar("T")
+
+
+async def run(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run any blocking helper that touches Sheets (e.g. a routes.py reader) off the loop."""
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+async def get_values(tab: str, *args: Any, **kwargs: Any) -> List[List[str]]:
+    return await run(_sync.get_values, tab, *args, **kwargs)
+
+async def append_row(tab: str, values: List[Any], *args: Any, **kwargs: Any) -> None:
+    await run(_sync.append_row, tab, values, *args, **kwargs)
+
+async def append_rows(tab: str, rows: List[List[Any]], *args: Any, **kwargs: Any) -> None:
+    if not rows:
+        return
+    await run(_sync.append_rows, tab, rows, *args, **kwargs)
+
+async def update_row(tab: str, row_index: int, values: List[Any], *args: Any, **kwargs: Any) -> None:
+    await run(_sync.update_row, tab, row_index, values, *args, **kwargs)
+
+async def batch_get(tabs: List[str], *args: Any, **kwargs: Any) -> Dict[str, List[List[str]]]:
+    return await run(_sync.batch_get, tabs, *args, **kwargs)
+
+async def find_row_by_header_value(
+    tab: str, header_name: str, value: str, *args: Any, **kwargs: Any
+) -> Tuple[Optional[int], Optional[List[str]], List[str]]:
+    return await run(_sync.find_row_by_header_value, tab, header_name, value, *args, **kwargs)
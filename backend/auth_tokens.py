@@ -0,0 +1,132 @@
+# backend/auth_tokens.py
+"""
+Stateless signed session tokens.
+
+/auth/login issues `<payload>.<signature>` where payload is base64url JSON
+{"u": username, "iat": ..., "exp": ...} and signature is HMAC-SHA256 over
+the payload. Verifying one is a single HMAC (microseconds) with no Sheets
+read and no bcrypt, so only real logins pay for those.
+
+The key comes from SESSION_SECRET; without it a random key is generated once
+and kept in the local state dir so every worker on the host agrees on it.
+bcrypt checks run on a small dedicated pool (BCRYPT_WORKERS) that bounds
+how many cores password hashing can occupy. Under the sync app the request
+thread still waits for its hash; only the async app (acheck_password) gets
+its thread back meanwhile.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import local_store
+
+SESSION_TTL_S = int(os.environ.get("SESSION_TTL_S", str(30 * 24 * 3600)))
+BCRYPT_WORKERS = int(os.environ.get("BCRYPT_WORKERS", "2"))
+
+_bcrypt_pool = ThreadPoolExecutor(BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+
+
+def _load_secret() -> bytes:
+    env = os.environ.get("SESSION_SECRET")
+    if env:
+        return env.encode("utf-8")
+    os.makedirs(local_store.STATE_DIR, exist_ok=True)
+    path = os.path.join(local_store.STATE_DIR, "session_secret")
+    try:
+        # O_EXCL: the first worker to start writes the key, the rest read it
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    except FileExistsError:
+        pass
+    with open(path) as f:
+        return f.read().strip().encode("utf-8")
+
+
+_SECRET = _load_secret()
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _unb64(s: str) -> bytes:
+    return base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64(hmac.new(_SECRET, payload.encode("utf-8"), hashlib.sha256).digest())
+
+
+def issue(username: str, ttl_s: int = SESSION_TTL_S) -> Tuple[str, int]:
+    """Return (token, expires_at_epoch_seconds)."""
+    now = int(time.time())
+    exp = now + ttl_s
+    payload = _b64(json.dumps({"u": username, "iat": now, "exp": exp}, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_sign(payload)}", exp
+
+
+def verify(token: str) -> Optional[str]:
+    """Return the username for a valid, unexpired token, else None."""
+    try:
+        payload, sig = token.split(".", 1)
+    except ValueError:
+        return None
+    # utf-8 both sides: a non-ASCII token is just a bad signature, not an exception
+    if not hmac.compare_digest(sig.encode("utf-8"), _sign(payload).encode("ascii")):
+        return None
+    try:
+        claims = json.loads(_unb64(payload))
+        if int(claims.get("exp", 0)) < time.time():
+            return None
+    except (ValueError, TypeError, AttributeError):  # binascii.Error and UnicodeError are ValueErrors
+        return None
+    username = claims.get("u")
+    return username if isinstance(username, str) and username else None
+
+
+def bearer(header_value: Optional[str]) -> Optional[str]:
+    """Extract the token from an `Authorization: Bearer <token>` header."""
+    if not header_value:
+        return None
+    scheme, _, token = header_value.partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    return token.strip() or None
+
+
+def authenticate(header_value: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Return (username, error) for a request's Authorization header.
+    No header -> (None, None); a bad or expired token -> (None, message).
+    """
+    token = bearer(header_value)
+    if token is None:
+        return None, None
+    username = verify(token)
+    if username is None:
+        return None, "invalid or expired token"
+    return username, None
+
+
+def check_password(bcrypt, pwd_hash: str, password: str) -> bool:
+    """
+    bcrypt verification on the dedicated pool. The calling (sync Flask)
+    request thread still waits for the hash; the pool only caps how many
+    hashes run at once. acheck_password is the one that frees its caller.
+    """
+    return _bcrypt_pool.submit(bcrypt.check_password_hash, pwd_hash, password).result()
+
+
+async def acheck_password(bcrypt, pwd_hash: str, password: str) -> bool:
+    """Awaitable variant: the event loop keeps serving while bcrypt runs."""
+    return await asyncio.wrap_future(_bcrypt_pool.submit(bcrypt.check_password_hash, pwd_hash, password))
@@ -0,0 +1,184 @@
+# backend/bench_async.py
+"""
+Concurrent throughput: sync Flask app vs. async serving mode (asgi.py).
+
+    python bench_async.py --requests 400 --concurrency 200 --latency-ms 800
+
+Both apps run in-process against the local LLM stub (llm_stub_server.py) and
+the in-memory Sheets backend, so only the serving model differs. The sync app
+is served by a fixed pool of --sync-threads request threads (like a threaded
+gunicorn worker); the async app by a single uvicorn worker.
+
+    python bench_async.py --check-dispatch
+
+Regression check for asgi.py's dispatcher instead: alternates Quart-served
+and Flask-served requests on ONE keep-alive connection and exits non-zero
+if any of them fails with a 5xx.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+USERNAME = "bench-user"
+
+
+def _seed_file() -> str:
+    seed = {
+        "UserPreferences": [
+            ["Username", "Height", "Weight", "DietaryRestrictions", "CreatedAt"],
+            [USERNAME, "70", "150", "vegetarian", "2025-01-01 00:00:00"],
+        ],
+        "UserSummarization": [
+            ["Date", "Username", "PreferenceSummary", "BiomarkerSummary", "Model", "Temperature"],
+            ["2025-01-01", USERNAME, "Likes oats.", "Steady energy.", "llama", "0.7"],
+        ],
+    }
+    fd, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w") as f:
+        json.dump(seed, f)
+    return path
+
+
+def _start_sync(port: int, threads: int):
+    from werkzeug.serving import BaseWSGIServer
+    from app import app as flask_app
+
+    class PooledWSGIServer(BaseWSGIServer):
+        """Fixed-size request thread pool, unlike werkzeug's thread-per-request."""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._pool = ThreadPoolExecutor(threads)
+
+        def process_request(self, request, client_address):
+            self._pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    server = PooledWSGIServer("127.0.0.1", port, flask_app)
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _start_async(port: int):
+    import uvicorn
+    from asgi import app as asgi_app
+
+    server = uvicorn.Server(uvicorn.Config(asgi_app, host="127.0.0.1", port=port,
+                                           log_level="warning", backlog=1024))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def _drive(base: str, path: str, total: int, concurrency: int):
+    import httpx
+
+    latencies, errors = [], 0
+    sem = asyncio.Semaphore(concurrency)
+    body = {"Username": USERNAME, "MealType": "lunch", "MealCode": "old-lunch"}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base, timeout=600, limits=limits) as client:
+        async def one():
+            nonlocal errors
+            async with sem:
+                t0 = time.perf_counter()
+                try:
+                    r = await client.post(path, json=body)
+                    if r.status_code >= 400:
+                        errors += 1
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        wall = time.perf_counter() - t0
+
+    latencies.sort()
+    q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {"rps": total / wall, "p50": q[49], "p95": q[94], "errors": errors, "wall": wall}
+
+
+async def _check_dispatch(base: str, rounds: int) -> int:
+    import httpx
+
+    quart = ("POST", "/meals/swap", {"json": {"Username": USERNAME, "MealType": "lunch", "MealCode": "old-lunch"}})
+    flask = ("GET", "/user/status", {"params": {"username": USERNAME}})
+    failures = 0
+    limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+    async with httpx.AsyncClient(base_url=base, timeout=60, limits=limits) as client:
+        for i, (method, path, kwargs) in enumerate([quart, flask, flask, quart, flask] * rounds):
+            r = await client.request(method, path, **kwargs)
+            ok = r.status_code < 500
+            failures += not ok
+            if not ok:
+                print(f"  #{i} {method} {path} -> {r.status_code} {r.text[:120]}")
+    print(f"{5 * rounds} requests on one connection, {failures} failed")
+    return failures
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--concurrency", type=int, default=200)
+    ap.add_argument("--latency-ms", type=float, default=800.0)
+    ap.add_argument("--sheets-latency-ms", type=float, default=50.0)
+    ap.add_argument("--sync-threads", type=int, default=8)
+    ap.add_argument("--path", default="/meals/swap")
+    ap.add_argument("--check-dispatch", action="store_true",
+                    help="alternate Quart and Flask requests on one connection instead of benchmarking")
+    args = ap.parse_args()
+
+    from llm_stub_server import start_stub
+    stub = start_stub(latency_ms=args.latency_ms)
+
+    # must be set before sheets_client / the workflows are imported
+    os.environ["GENAI_BASE_URL"] = f"http://127.0.0.1:{stub.server_port}"
+    os.environ.setdefault("GENAI_STUDIO_API_KEY", "stub")  # the stub ignores it
+    os.environ.setdefault("REQUIRE_AUTH", "0")  # the bench posts bare Usernames
+    os.environ["SHEETS_BACKEND"] = "memory"
+    os.environ["SHEETS_MEMORY_SEED"] = _seed_file()
+    os.environ["SHEETS_MEMORY_LATENCY_MS"] = str(args.sheets_latency_ms)
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "diet_app_ai"))
+
+    if args.check_dispatch:
+        _start_async(8913)
+        sys.exit(1 if asyncio.run(_check_dispatch("http://127.0.0.1:8913", rounds=10)) else 0)
+
+    _start_sync(8911, args.sync_threads)
+    _start_async(8912)
+
+    rows = []
+    for label, port in (("sync (flask)", 8911), ("async (asgi)", 8912)):
+        res = asyncio.run(_drive(f"http://127.0.0.1:{port}", args.path, args.requests, args.concurrency))
+        rows.append((label, res))
+
+    print(f"\n{args.requests} x POST {args.path}, concurrency {args.concurrency}, "
+          f"LLM latency {args.latency_ms:.0f} ms, Sheets latency {args.sheets_latency_ms:.0f} ms, "
+          f"sync threads {args.sync_threads}")
+    print(f"{'mode':<14}{'req/s':>9}{'p50 s':>9}{'p95 s':>9}{'errors':>8}{'wall s':>9}")
+    for label, r in rows:
+        print(f"{label:<14}{r['rps']:>9.1f}{r['p50']:>9.2f}{r['p95']:>9.2f}{r['errors']:>8}{r['wall']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
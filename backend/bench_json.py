@@ -0,0 +1,73 @@
+# backend/bench_json.py
+"""
+JSON round trip of a 15-meal daily plan: stdlib vs. json_codec (orjson).
+
+    python bench_json.py --iterations 5000
+
+One round trip is what /meals/daily does with the plan: parse the model's
+text, serialize the response body the way jsonify does (sorted, compact,
+ASCII), and serialize the recent meals into the next summary prompt. The
+codec's output is checked to be byte-identical to the stdlib's first.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path[:0] = [os.path.dirname(os.path.abspath(__file__)),
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), "diet_app_ai")]
+
+import json_codec  # noqa: E402
+
+
+def _plan(per_section: int = 5) -> dict:
+    plan = {}
+    for section in ("breakfast", "lunch", "dinner"):
+        plan[section] = {
+            f"{section}-dish-{i}": {
+                "description": f"A {section} dish number {i}, roasted vegetables with a lemon-tahini drizzle, crispy chickpeas and fresh herbs.",
+                "ingredients": {f"ingredient {k}": f"{k + 1}/2 cup" for k in range(10)},
+                "instructions": "\n".join(f"Step {s}: chop, season and cook until golden, about {s * 3} minutes." for s in range(1, 7)),
+            }
+            for i in range(per_section)
+        }
+    return plan
+
+
+def _stdlib_round_trip(text: str) -> tuple[str, str]:
+    meals = json.loads(text)
+    body = json.dumps(meals, sort_keys=True, separators=(",", ":"))
+    prompt = json.dumps({k: v for section in meals.values() for k, v in section.items()}, separators=(",", ":"))
+    return body, prompt
+
+
+def _codec_round_trip(text: str) -> tuple[str, str]:
+    meals = json_codec.loads(text)
+    body = json_codec.dumps(meals, sort_keys=True)
+    prompt = json_codec.dumps({k: v for section in meals.values() for k, v in section.items()})
+    return body, prompt
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--iterations", type=int, default=5000)
+    ap.add_argument("--per-section", type=int, default=5, help="meals per section (5 -> 15-meal plan)")
+    args = ap.parse_args()
+
+    text = json.dumps(_plan(args.per_section), indent=2)  # what the model sends back
+    assert _codec_round_trip(text) == _stdlib_round_trip(text), "codec output differs from stdlib"
+
+    print(f"plan: {len(text)} bytes of model text, backend={json_codec.BACKEND}")
+    results = {}
+    for name, fn in (("stdlib", _stdlib_round_trip), ("json_codec", _codec_round_trip)):
+        best = min(timeit.repeat(lambda: fn(text), number=args.iterations, repeat=3))
+        results[name] = best / args.iterations * 1e6
+        print(f"  {name:<10} {results[name]:8.1f} us / round trip")
+    print(f"  speedup    {results['stdlib'] / results['json_codec']:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# backend/bench_prompt_cache.py
+"""
+How much of each model request is a shared, cacheable prefix: the old prompt
+layout vs. the chat-message layout (diet_app_ai/prompt_templates.py).
+
+    python bench_prompt_cache.py --users 20 --latency-ms 300 --per-prompt-token-ms 1.0
+
+1. Token diff: every workflow's prompt is rendered for --users synthetic
+   users in both layouts; the shared prefix is the longest run of leading
+   tokens identical across all of them (what a provider's prefix cache can
+   reuse between users).
+2. Measured: the same requests are sent through the workflows' client to the
+   local stub with prefix caching on (llm_stub_server.py --prefix-cache),
+   where uncached prompt tokens cost --per-prompt-token-ms of prefill each.
+
+"before" rebuilds the pre-restructure order from the same prompt pieces
+(instructions, then the user's context, then the output format / task, all
+in one human message), so only the ordering differs.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+sys.path[:0] = [os.path.dirname(os.path.abspath(__file__)),
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), "diet_app_ai")]
+
+from langchain_core.messages import HumanMessage, SystemMessage  # noqa: E402
+from langchain_core.prompts import PromptTemplate  # noqa: E402
+
+import prompt_templates  # noqa: E402
+from daily_meal_generation_prompt import DAILY_INSTRUCTIONS, DAILY_OUTPUT_FORMAT  # noqa: E402
+from initial_meal_generation_prompt import INITIAL_MEAL_INSTRUCTIONS, INITIAL_MEAL_OUTPUT_FORMAT  # noqa: E402
+from single_meal_generation_prompt import SINGLE_MEAL_INSTRUCTIONS, SINGLE_MEAL_OUTPUT_FORMAT  # noqa: E402
+from llm_stub_server import LatencyModel, PrefixCache, start_stub  # noqa: E402
+
+Messages = List[Tuple[str, str]]
+WORKFLOWS = ("initial", "daily", "single", "biomarker_summary", "taste_summary")
+
+
+def _tokenizer() -> Tuple[str, Callable[[str], List]]:
+    try:
+        import tiktoken
+        enc = tiktoken.get_encoding("cl100k_base")
+        return "cl100k_base", enc.encode
+    except Exception:  # not installed, or no network to fetch the encoding
+        return "approx (words + punctuation)", re.compile(r"\s*\w+|\s*[^\w\s]|\s+").findall
+
+
+def _before_template(workflow: str) -> str:
+    system, human = prompt_templates.MESSAGES[workflow]
+    pieces = {
+        "initial": (INITIAL_MEAL_INSTRUCTIONS, INITIAL_MEAL_OUTPUT_FORMAT),
+        "daily": (DAILY_INSTRUCTIONS, DAILY_OUTPUT_FORMAT),
+        "single": (SINGLE_MEAL_INSTRUCTIONS, SINGLE_MEAL_OUTPUT_FORMAT),
+    }
+    if workflow in pieces:
+        head, tail = pieces[workflow]
+    else:  # summaries: role line, data, then the task
+        head, tail = system.split("\n", 1)
+    return head.rstrip("\n") + "\n" + human + "\n\n" + tail.lstrip("\n")
+
+
+_BEFORE = {w: PromptTemplate.from_template(_before_template(w)) for w in WORKFLOWS}
+
+
+def render(layout: str, workflow: str, inputs: Dict[str, str]) -> Messages:
+    if layout == "before":
+        return [("human", _BEFORE[workflow].format(**inputs))]
+    return prompt_templates.render(workflow, inputs)
+
+
+def _inputs(workflow: str, rng: random.Random) -> Dict[str, str]:
+    restrictions = ", ".join(rng.sample(["vegetarian", "lactose-free", "gluten-free", "no pork", "nut allergy"],
+                                        rng.randint(0, 2))) or "None"
+    taste = rng.choice(["Likes spicy Thai curries and crunchy textures.", "Prefers mild Mediterranean bowls.",
+                        "Enjoys hearty stews; dislikes mushrooms and olives."])
+    biomarker = rng.choice(["Energy dips after heavy lunches.", "Mood steadier on high-fiber days.",
+                            "No recent biomarker data."])
+    dishes = ["quinoa-black-bean-bowl", "greek-salad-with-feta", "tofu-stir-fry", "lentil-soup", "oat-porridge"]
+    if workflow == "initial":
+        return {"height": str(rng.randint(60, 76)), "weight": str(rng.randint(110, 220)),
+                "dietary_restrictions": restrictions}
+    if workflow == "daily":
+        return {"biomarker_summary": biomarker, "taste_summary": taste, "dietary_restrictions": restrictions}
+    if workflow == "single":
+        return {"meal_type": rng.choice(["breakfast", "lunch", "dinner"]), "biomarker_summary": biomarker,
+                "taste_summary": taste, "dietary_restrictions": restrictions,
+                "avoid_ingredients": rng.choice(["None", "bacon", "shrimp, cheese"]),
+                "existing_slugs": ", ".join(rng.sample(dishes, 3))}
+    if workflow == "biomarker_summary":
+        journal = "\n".join(f"Day {d} Mood {rng.randint(1, 10)} Energy {rng.randint(1, 10)} "
+                            f"Fullness {rng.randint(1, 10)}" for d in range(1, 6))
+        return {"existing_summary": biomarker, "biomarker_journal": journal,
+                "ingredient_stats": "\n".join(
+                    f"- {ing} -> {rng.choice(['Mood', 'Energy', 'Fullness'])} (same day): r={rng.uniform(-.7, .7):+.2f}, "
+                    f"{rng.uniform(-2, 2):+.1f} pts, eaten on {rng.randint(3, 9)}/21 scored days"
+                    for ing in rng.sample(["spinach", "black beans", "oats", "chickpeas", "tofu"], 3))}
+    return {"existing_summary": taste, "liked_meals": ", ".join(rng.sample(dishes, 2)),
+            "disliked_meals": ", ".join(rng.sample(dishes, 2))}
+
+
+def _conversation(messages: Messages) -> str:
+    return "".join(f"<|{role}|>{text}" for role, text in messages)
+
+
+def _common_prefix(seqs: List[List]) -> int:
+    n = min(len(s) for s in seqs)
+    for i in range(n):
+        if any(s[i] != seqs[0][i] for s in seqs[1:]):
+            return i
+    return n
+
+
+def token_diff(users: int, seed: int) -> None:
+    name, encode = _tokenizer()
+    print(f"shared prefix across {users} users (tokenizer: {name})")
+    print(f"{'workflow':<20}{'tokens':>8}{'before':>16}{'after':>16}")
+    for workflow in WORKFLOWS:
+        rng = random.Random(seed)
+        inputs = [_inputs(workflow, rng) for _ in range(users)]
+        row = []
+        for layout in ("before", "after"):
+            toks = [encode(_conversation(render(layout, workflow, i))) for i in inputs]
+            mean = statistics.mean(len(t) for t in toks)
+            shared = _common_prefix(toks)
+            row.append((mean, shared))
+        (mean, b), (_m, a) = row
+        print(f"{workflow:<20}{mean:>8.0f}{b:>8} ({100 * b / mean:3.0f}%){a:>8} ({100 * a / mean:3.0f}%)")
+
+
+def measured(users: int, seed: int, latency_ms: float, per_prompt_token_ms: float) -> None:
+    os.environ.setdefault("GENAI_STUDIO_API_KEY", "stub")  # the stub ignores it
+    from model_routing import get_llm
+
+    print(f"\nstub with prefix caching: {latency_ms:.0f} ms + {per_prompt_token_ms} ms per uncached prompt token")
+    print(f"{'layout':<8}{'requests':>9}{'mean s':>8}{'p95 s':>8}{'prompt tok':>11}{'cached':>8}{'uncached':>9}")
+    for layout in ("before", "after"):
+        stub = start_stub(latency=LatencyModel(latency_ms, per_prompt_token_ms=per_prompt_token_ms),
+                          prefix_cache=PrefixCache())
+        llm = get_llm(base_url=f"http://127.0.0.1:{stub.server_port}", request_timeout=60.0)
+        rng = random.Random(seed)
+        latencies = []
+        for _ in range(users):
+            for workflow in WORKFLOWS:
+                msgs = [SystemMessage(content=t) if role == "system" else HumanMessage(content=t)
+                        for role, t in render(layout, workflow, _inputs(workflow, rng))]
+                t0 = time.perf_counter()
+                llm.invoke(msgs)
+                latencies.append(time.perf_counter() - t0)
+        stub.shutdown()
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        print(f"{layout:<8}{len(latencies):>9}{statistics.mean(latencies):>8.3f}{p95:>8.3f}"
+              f"{stub.prompt_tokens:>11}{stub.cached_tokens:>8}{stub.prompt_tokens - stub.cached_tokens:>9}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--latency-ms", type=float, default=300.0)
+    ap.add_argument("--per-prompt-token-ms", type=float, default=1.0)
+    ap.add_argument("--no-requests", action="store_true", help="token diff only")
+    args = ap.parse_args()
+
+    token_diff(args.users, args.seed)
+    if not args.no_requests:
+        measured(args.users, args.seed, args.latency_ms, args.per_prompt_token_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# backend/biomarker_correlation.py
+"""
+Ingredient -> biomarker statistics for the biomarker summary.
+
+Instead of handing the model a raw dump of meals and scores, the summary
+prompt gets the top-k numeric findings over a longer history
+(ANALYSIS_DAYS), so its size is fixed however much history a user has.
+
+Per user:
+  * days      every calendar day in the window
+  * B         days x 3 scores (Mood, Energy, Fullness) from UserBiomarker;
+              NaN where nothing was logged, the mean if logged twice
+  * X         ingredients x days, 1 if the ingredient was in a meal the user
+              liked (= picked) that day: UserMealPreferences rows with
+              Like=TRUE, outside onboarding, joined to that meal's
+              MealIngredients rows
+
+For every ingredient, biomarker and lag (eaten on day t, score on day
+t + lag) it computes, in one matrix pass per (biomarker, lag), the
+point-biserial correlation r and the effect size delta (mean score on
+exposed days minus unexposed days). Ingredients need MIN_DAYS exposed AND
+unexposed scored days to be considered, and |r| must clear both MIN_ABS_R
+and 2/sqrt(days) (roughly the 95% noise band); findings are ranked by |r|.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from sheets_client import batch_get
+
+BIOMARKERS = ("Mood", "Energy", "Fullness")
+ANALYSIS_DAYS = int(os.environ.get("BIOMARKER_ANALYSIS_DAYS", "90"))
+TOP_K = int(os.environ.get("BIOMARKER_TOP_K", "8"))
+LAGS = (0, 1, 2)
+MIN_DAYS = 3
+MIN_ABS_R = 0.2
+
+_LAG_TEXT = {0: "same day", 1: "next day", 2: "2 days later"}
+
+
+@dataclass(frozen=True)
+class Finding:
+    ingredient: str
+    biomarker: str
+    lag: int
+    r: float
+    delta: float      # mean score exposed - unexposed
+    exposed: int      # scored days with the ingredient (at this lag)
+    days: int         # scored days considered
+
+    def text(self) -> str:
+        return (f"{self.ingredient} -> {self.biomarker} ({_LAG_TEXT.get(self.lag, f'{self.lag} days later')}): "
+                f"r={self.r:+.2f}, {self.delta:+.1f} pts, eaten on {self.exposed}/{self.days} scored days")
+
+
+def _date(s: str) -> Optional[dt.date]:
+    try:
+        return dt.datetime.strptime(s, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def _cols(header: Sequence[str], names: Sequence[str]) -> Optional[List[int]]:
+    try:
+        return [list(header).index(n) for n in names]
+    except ValueError:
+        return None
+
+
+def build_matrices(username: str, biomarker_rows: List[List[str]], ingredient_rows: List[List[str]],
+                   preference_rows: List[List[str]], start: dt.date, end: dt.date
+                   ) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """(ingredients, X ingredients x days, B days x len(BIOMARKERS)) for start..end inclusive."""
+    n_days = (end - start).days + 1
+    B_sum = np.zeros((n_days, len(BIOMARKERS)))
+    B_cnt = np.zeros((n_days, len(BIOMARKERS)))
+
+    cols = _cols(biomarker_rows[0], ("Date", "Username", *BIOMARKERS)) if biomarker_rows else None
+    for r in (biomarker_rows[1:] if cols else []):
+        if len(r) <= max(cols) or r[cols[1]] != username:
+            continue
+        d = _date(r[cols[0]])
+        if not d or not start <= d <= end:
+            continue
+        for j, c in enumerate(cols[2:]):
+            try:
+                B_sum[(d - start).days, j] += float(r[c])
+                B_cnt[(d - start).days, j] += 1
+            except ValueError:
+                continue
+    with np.errstate(invalid="ignore"):
+        B = B_sum / B_cnt  # NaN where nothing was logged
+
+    # meal code -> {date generated: ingredients}; a pick uses that day's plan, else the latest earlier one
+    meals: Dict[str, Dict[dt.date, Set[str]]] = {}
+    cols = _cols(ingredient_rows[0], ("Date", "Username", "MealCode", "Ingredients")) if ingredient_rows else None
+    for r in (ingredient_rows[1:] if cols else []):
+        if len(r) <= max(cols) or r[cols[1]] != username:
+            continue
+        d = _date(r[cols[0]])
+        ing = r[cols[3]].strip().lower()
+        if d and ing and d <= end:
+            meals.setdefault(r[cols[2]], {}).setdefault(d, set()).add(ing)
+
+    eaten: List[Tuple[int, Set[str]]] = []
+    cols = _cols(preference_rows[0], ("Date", "Username", "MealCode", "Like")) if preference_rows else None
+    initial_i = list(preference_rows[0]).index("Initial") if cols and "Initial" in preference_rows[0] else None
+    for r in (preference_rows[1:] if cols else []):
+        if len(r) <= max(cols) or r[cols[1]] != username or str(r[cols[3]]).upper() != "TRUE":
+            continue
+        if initial_i is not None and len(r) > initial_i and str(r[initial_i]).upper() == "TRUE":
+            continue
+        d = _date(r[cols[0]])
+        versions = meals.get(r[cols[2]])
+        if not d or not start <= d <= end or not versions:
+            continue
+        earlier = [v for v in versions if v <= d]
+        if earlier:
+            eaten.append(((d - start).days, versions[max(earlier)]))
+
+    ingredients = sorted({i for _d, ings in eaten for i in ings})
+    index = {ing: k for k, ing in enumerate(ingredients)}
+    X = np.zeros((len(ingredients), n_days))
+    for day, ings in eaten:
+        X[[index[i] for i in ings], day] = 1.0
+    return ingredients, X, B
+
+
+def lagged_effects(ingredients: List[str], X: np.ndarray, B: np.ndarray,
+                   lags: Sequence[int] = LAGS, min_days: int = MIN_DAYS) -> List[Finding]:
+    """Every supported (ingredient, biomarker, lag) with its r and delta."""
+    out: List[Finding] = []
+    n_days = B.shape[0]
+    for lag in lags:
+        if lag >= n_days:
+            continue
+        Xl = X[:, : n_days - lag]            # eaten on t
+        Bl = B[lag:]                          # scored on t + lag
+        for j, name in enumerate(BIOMARKERS):
+            scored = ~np.isnan(Bl[:, j])
+            n = int(scored.sum())
+            if n < 2 * min_days:
+                continue
+            x, y = Xl[:, scored], Bl[scored, j]
+            exposed = x.sum(axis=1)
+            ok = (exposed >= min_days) & (n - exposed >= min_days)
+            if not ok.any():
+                continue
+            x, exposed = x[ok], exposed[ok]
+            xc = x - exposed[:, None] / n
+            yc = y - y.mean()
+            sx = np.sqrt((xc ** 2).sum(axis=1))
+            sy = np.sqrt((yc ** 2).sum())
+            with np.errstate(invalid="ignore", divide="ignore"):
+                r = (xc @ yc) / (sx * sy)
+                delta = (x @ y) / exposed - ((1.0 - x) @ y) / (n - exposed)
+            for k, i in enumerate(np.flatnonzero(ok)):
+                if np.isfinite(r[k]):
+                    out.append(Finding(ingredients[i], name, lag, float(r[k]), float(delta[k]), int(exposed[k]), n))
+    return out
+
+
+def top_findings(findings: List[Finding], k: int = TOP_K, min_abs_r: float = MIN_ABS_R) -> List[Finding]:
+    """Strongest k findings, at most one lag per (ingredient, biomarker)."""
+    best: Dict[Tuple[str, str], Finding] = {}
+    for f in findings:
+        key = (f.ingredient, f.biomarker)
+        if abs(f.r) < max(min_abs_r, 2.0 / np.sqrt(f.days)):
+            continue
+        if key not in best or abs(f.r) > abs(best[key].r):
+            best[key] = f
+    return sorted(best.values(), key=lambda f: -abs(f.r))[:k]
+
+
+def analyze(username: str, days: int = ANALYSIS_DAYS, k: int = TOP_K,
+            today: Optional[dt.date] = None) -> List[Finding]:
+    """Top-k findings for `username` over the last `days` days (one Sheets batch read)."""
+    end = today or dt.date.today()
+    tabs = batch_get(["UserBiomarker", "MealIngredients", "UserMealPreferences"], username=username)
+    ingredients, X, B = build_matrices(username, tabs.get("UserBiomarker", []), tabs.get("MealIngredients", []),
+                                       tabs.get("UserMealPreferences", []), end - dt.timedelta(days=days - 1), end)
+    if not ingredients:
+        return []
+    return top_findings(lagged_effects(ingredients, X, B), k)
+
+
+def findings_text(findings: List[Finding], days: int = ANALYSIS_DAYS) -> str:
+    """Compact block for the summary prompt (at most TOP_K lines)."""
+    if not findings:
+        return f"No ingredient shows a consistent pattern over the last {days} days yet."
+    return "\n".join(f"- {f.text()}" for f in findings)
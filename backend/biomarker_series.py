@@ -0,0 +1,214 @@
+# backend/biomarker_series.py
+"""
+Per-user biomarker time series, for /biomarkers/trends and the summary
+journal.
+
+For every user the index keeps one entry per logged day in parallel NumPy
+arrays, sorted by date:
+
+    ordinal   date.toordinal()
+    total     sum of the day's Mood / Energy / Fullness scores
+    count     how many scores went into each sum
+    c_total   running (prefix) sums of `total` and `count`, so the mean over
+    c_count   any date range is two binary searches and a subtraction
+
+It follows UserBiomarker like the other tab indexes (built from one
+batch_get, then fed every append), so trends never rescan the tab.
+Appending a new latest day is O(1) amortized; a back-dated row (rare)
+rebuilds that user's prefix sums.
+"""
+from __future__ import annotations
+
+import datetime as dt
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from tab_index import TabIndex, Col
+
+BIOMARKERS = ("Mood", "Energy", "Fullness")
+WINDOWS = (7, 30, 90)
+
+
+def _ordinal(s: str) -> Optional[int]:
+    try:
+        return dt.datetime.strptime(s, "%Y-%m-%d").date().toordinal()
+    except ValueError:
+        return None
+
+
+class Series:
+    """One user's daily series (see module docstring)."""
+
+    __slots__ = ("n", "ordinal", "total", "count", "c_total", "c_count")
+
+    def __init__(self, capacity: int = 32):
+        k = len(BIOMARKERS)
+        self.n = 0
+        self.ordinal = np.zeros(capacity, dtype=np.int64)
+        self.total = np.zeros((capacity, k))
+        self.count = np.zeros((capacity, k))
+        # c_*[i] = sum of rows [0, i); one extra slot for the empty prefix
+        self.c_total = np.zeros((capacity + 1, k))
+        self.c_count = np.zeros((capacity + 1, k))
+
+    def _grow(self) -> None:
+        cap = len(self.ordinal) * 2
+        for name in ("ordinal", "total", "count"):
+            old = getattr(self, name)
+            new = np.zeros((cap,) + old.shape[1:], dtype=old.dtype)
+            new[: self.n] = old[: self.n]
+            setattr(self, name, new)
+        for name in ("c_total", "c_count"):
+            old = getattr(self, name)
+            new = np.zeros((cap + 1,) + old.shape[1:])
+            new[: self.n + 1] = old[: self.n + 1]
+            setattr(self, name, new)
+
+    def add(self, ordinal: int, scores: Sequence[Optional[float]]) -> None:
+        values = np.array([np.nan if s is None else s for s in scores], dtype=float)
+        present = ~np.isnan(values)
+        values = np.where(present, values, 0.0)
+        n = self.n
+        if n and ordinal == self.ordinal[n - 1]:
+            self.total[n - 1] += values
+            self.count[n - 1] += present
+            self.c_total[n] += values
+            self.c_count[n] += present
+            return
+        if n == 0 or ordinal > self.ordinal[n - 1]:
+            if n == len(self.ordinal):
+                self._grow()
+            self.ordinal[n], self.total[n], self.count[n] = ordinal, values, present
+            self.c_total[n + 1] = self.c_total[n] + values
+            self.c_count[n + 1] = self.c_count[n] + present
+            self.n += 1
+            return
+        # back-dated: merge into / insert before a later day, then redo the prefix sums
+        i = int(np.searchsorted(self.ordinal[:n], ordinal))
+        if self.ordinal[i] == ordinal:
+            self.total[i] += values
+            self.count[i] += present
+        else:
+            if n == len(self.ordinal):
+                self._grow()
+            self.ordinal[i + 1: n + 1] = self.ordinal[i:n]
+            self.total[i + 1: n + 1] = self.total[i:n]
+            self.count[i + 1: n + 1] = self.count[i:n]
+            self.ordinal[i], self.total[i], self.count[i] = ordinal, values, present
+            self.n += 1
+        np.cumsum(self.total[: self.n], axis=0, out=self.c_total[1: self.n + 1])
+        np.cumsum(self.count[: self.n], axis=0, out=self.c_count[1: self.n + 1])
+
+    def _span(self, first: int, last: int) -> tuple[int, int]:
+        """Row range [i, j) of days with first <= ordinal <= last."""
+        o = self.ordinal[: self.n]
+        return int(np.searchsorted(o, first, "left")), int(np.searchsorted(o, last, "right"))
+
+    def window(self, first: int, last: int) -> Dict[str, Any]:
+        i, j = self._span(first, last)
+        total = self.c_total[j] - self.c_total[i]
+        count = self.c_count[j] - self.c_count[i]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total / count
+        return {"days": j - i, "mean": mean}
+
+    def daily_means(self, first: int, last: int) -> tuple[np.ndarray, np.ndarray]:
+        i, j = self._span(first, last)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.ordinal[i:j], self.total[i:j] / self.count[i:j]
+
+    def logging_streak(self, today: int) -> int:
+        """Consecutive logged days ending today (or yesterday, if today isn't logged yet)."""
+        o = self.ordinal[: self.n]
+        if not self.n or o[-1] < today - 1:
+            return 0
+        gaps = np.flatnonzero(np.diff(o) != 1)
+        start = gaps[-1] + 1 if len(gaps) else 0
+        return int(self.n - start)
+
+
+def _round(x: float) -> Optional[float]:
+    return None if np.isnan(x) else round(float(x), 2)
+
+
+class BiomarkerSeriesIndex(TabIndex):
+    TABS = ("UserBiomarker",)
+
+    def _reset(self) -> None:
+        self._series: Dict[str, Series] = {}
+
+    def _apply(self, tab: str, col: Col, first_row: int, rows: List[List[Any]]) -> None:
+        for r in rows:
+            username, ordinal = col(r, "Username"), _ordinal(col(r, "Date"))
+            if not username or ordinal is None:
+                continue
+            scores = []
+            for name in BIOMARKERS:
+                try:
+                    scores.append(float(col(r, name)))
+                except ValueError:
+                    scores.append(None)
+            self._series.setdefault(username, Series()).add(ordinal, scores)
+
+    def points(self, username: str, window_days: int, today: dt.date) -> List[Dict[str, Any]]:
+        """Per-day scores of the last `window_days` days: [{"date", "Mood", "Energy", "Fullness"}]."""
+        self.ensure_built()
+        t = today.toordinal()
+        with self._lock:
+            s = self._series.get(username)
+            if s is None:
+                return []
+            ordinals, means = s.daily_means(t - window_days, t)
+        out = []
+        for o, row in zip(ordinals, means):
+            point: Dict[str, Any] = {"date": dt.date.fromordinal(int(o)).isoformat()}
+            for name, v in zip(BIOMARKERS, row):
+                if not np.isnan(v):
+                    point[name] = int(v) if float(v).is_integer() else round(float(v), 1)
+            out.append(point)
+        return out
+
+    def trends(self, username: str, today: dt.date, windows: Sequence[int] = WINDOWS) -> Dict[str, Any]:
+        """
+        For each window W (days, ending today): mean per biomarker, the mean of
+        the W days before it and the delta, plus streaks: consecutive logged
+        days, and per biomarker the consecutive latest logged days at or above
+        the user's 30-day mean.
+        """
+        self.ensure_built()
+        t = today.toordinal()
+        with self._lock:
+            s = self._series.get(username)
+            if s is None or not s.n:
+                return {"username": username, "as_of": today.isoformat(), "days_logged": 0,
+                        "last_logged": None, "windows": {}, "streaks": {"logging": 0}}
+            out: Dict[str, Any] = {
+                "username": username,
+                "as_of": today.isoformat(),
+                "days_logged": s.n,
+                "last_logged": dt.date.fromordinal(int(s.ordinal[s.n - 1])).isoformat(),
+                "windows": {},
+            }
+            for w in windows:
+                cur = s.window(t - w + 1, t)
+                prev = s.window(t - 2 * w + 1, t - w)
+                out["windows"][str(w)] = {"days": cur["days"], **{
+                    name: {
+                        "mean": _round(cur["mean"][k]),
+                        "prev_mean": _round(prev["mean"][k]),
+                        "delta": _round(cur["mean"][k] - prev["mean"][k]),
+                    } for k, name in enumerate(BIOMARKERS)
+                }}
+            baseline = s.window(t - 29, t)["mean"]
+            _o, recent = s.daily_means(t - 89, t)
+            streaks: Dict[str, int] = {"logging": s.logging_streak(t)}
+            for k, name in enumerate(BIOMARKERS):
+                vals = recent[:, k][~np.isnan(recent[:, k])]
+                below = np.flatnonzero(vals < baseline[k]) if not np.isnan(baseline[k]) else np.arange(len(vals))
+                streaks[name] = int(len(vals) - (below[-1] + 1 if len(below) else 0))
+            out["streaks"] = streaks
+        return out
+
+
+BIOMARKER_SERIES = BiomarkerSeriesIndex()
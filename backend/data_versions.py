@@ -0,0 +1,101 @@
+# backend/data_versions.py
+"""
+Per-user data version stamps.
+
+Every write made through sheets_client to a user-scoped tab (append_row,
+append_rows, update_row — whether from routes.py or a models.py save())
+bumps the version of each Username it touched. Read endpoints derive their
+ETag from the stamp, so checking `If-None-Match` costs one local SQLite read
+and no Sheets call (see http_cache.py).
+
+Stamps live in local_store ("versions") so every worker on the host sees
+the same value. `epoch` is random per state dir: wiping the dir can never
+make an old ETag match again.
+
+Import this module AFTER the tab indexes (status_index, summary_index,
+meal_index): listeners run in subscription order, and the stamp must only
+move once the indexes already reflect the write.
+"""
+from __future__ import annotations
+
+import secrets
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import local_store
+import sheets_client
+
+USER_TABS = (
+    "Users",
+    "UserPreferences",
+    "UserMealPreferences",
+    "UserBiomarker",
+    "MealIngredients",
+    "MealSteps",
+    "UserSummarization",
+)
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+_epoch: Optional[str] = None
+_username_col: Dict[str, int] = {}
+
+
+def _conn():
+    global _schema_ready, _epoch
+    conn = local_store.connect("versions")
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                conn.execute("CREATE TABLE IF NOT EXISTS versions (username TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+                conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+                conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', ?)", (secrets.token_hex(4),))
+                _epoch = conn.execute("SELECT value FROM meta WHERE key = 'epoch'").fetchone()["value"]
+                _schema_ready = True
+    return conn
+
+
+def bump(usernames: Iterable[str]) -> None:
+    names = sorted({u for u in usernames if u})
+    if not names:
+        return
+    db = _conn()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        db.executemany(
+            "INSERT INTO versions (username, version) VALUES (?, 1) "
+            "ON CONFLICT(username) DO UPDATE SET version = version + 1",
+            [(u,) for u in names],
+        )
+        db.execute("COMMIT")
+    except Exception:
+        if db.in_transaction:
+            db.execute("ROLLBACK")
+        raise
+
+
+def stamp(username: str) -> str:
+    """Opaque version of everything stored for `username`, e.g. '3f9a1c2e.17'."""
+    row = _conn().execute("SELECT version FROM versions WHERE username = ?", (username,)).fetchone()
+    return f"{_epoch}.{row['version'] if row else 0}"
+
+
+def _column(tab: str) -> Optional[int]:
+    i = _username_col.get(tab)
+    if i is None:
+        header = sheets_client.get_header(tab)
+        if "Username" not in header:
+            return None
+        i = _username_col[tab] = header.index("Username")
+    return i
+
+
+def _on_write(tab: str, first_row: Optional[int], rows: List[List[Any]], kind: str, shard: int = 0) -> None:
+    i = _column(tab)
+    if i is None:
+        return
+    bump(str(r[i]).strip() for r in rows if len(r) > i and r[i] is not None)
+
+
+for _tab in USER_TABS:
+    sheets_client.subscribe(_tab, _on_write)
@@ -4,17 +4,36 @@ Prompt for BIOMARKER FEEDBACK SUMMARIZATION.
 Variables
 ---------
 {existing_summary}    – str (may be empty)
-{biomarker_journal}   – str  ← raw text of user logs (mood, bloating, etc.)
-{meals_last_period}   – JSON or bullet list of meals eaten in that same window
+{biomarker_journal}   – str  ← logs since the previous findings (Mood / Energy /
+                               Fullness per entry; backend/summary_delta.py)
+{ingredient_stats}    – str  ← top-k ingredient→biomarker statistics over a
+                               longer history (backend/biomarker_correlation.py);
+                               fixed size however long the history is, or a
+                               one-line note when unchanged since last time
 
 Output
 ------
 A short evidence-style narrative linking ingredients → possible biomarker effects.
 Keep it ≤150 words. 
+
+The role and task are the (cacheable) system message; the user's data
+follows as the human message.
 """
-BIOMARKER_SUMMARIZATION_PROMPT = """\
+BIOMARKER_SUMMARY_SYSTEM = """\
 You are an AI nutrition analyst relating meals to biomarker feedback.
 
+TASK
+Write ≤150 words summarizing plausible relationships between recurring
+ingredients/nutrients and the user’s biomarkers.  Ground them in the
+statistics given (r = correlation, pts = mean score difference on days the
+ingredient was eaten); weak or few-day findings deserve less weight.  Use
+hedging language ("may", "could") rather than strong causal claims.  No
+citations yet.
+
+Return ONLY the output text. DO NOT include any other text. Avoid using pronouns - use "they" instead.
+"""
+
+BIOMARKER_SUMMARY_USER = """\
 PREVIOUS FINDINGS
 {existing_summary}
 
@@ -22,13 +41,8 @@ LATEST DATA
 • Biomarker journal:
 {biomarker_journal}
 
-• Meals eaten in this window:
-{meals_last_period}
-
-TASK
-Write ≤150 words summarizing plausible relationships between recurring
-ingredients/nutrients and the user’s biomarkers.  Use hedging language
-("may", "could") rather than strong causal claims.  No citations yet.
-
-Return ONLY the output text. DO NOT include any other text. Avoid using pronouns - use "they" instead.
+• Ingredient–biomarker statistics (strongest first):
+{ingredient_stats}
 """
+
+BIOMARKER_SUMMARIZATION_PROMPT = BIOMARKER_SUMMARY_SYSTEM + "\n" + BIOMARKER_SUMMARY_USER
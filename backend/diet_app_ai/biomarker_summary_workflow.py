@@ -3,44 +3,38 @@ LANGCHAIN WORKFLOW · BIOMARKER FEEDBACK SUMMARIZATION
 Function: `update_biomarker_summary(payload: dict) -> str`
 """
 from typing import Dict
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
-from biomarker_summary_prompt import BIOMARKER_SUMMARIZATION_PROMPT
-from initial_meal_generation_workflow import get_llm
-import json
-
-_PROMPT = PromptTemplate(
-    template=BIOMARKER_SUMMARIZATION_PROMPT,
-    input_variables=[
-        "existing_summary",
-        "biomarker_journal",
-        "meals_last_period",
-    ],
-)
+from initial_meal_generation_workflow import model_routing
+import prompt_templates
+
+# inputs: existing_summary, biomarker_journal, ingredient_stats
+_PROMPT = prompt_templates.PROMPTS["biomarker_summary"]
 
 
 def update_biomarker_summary(payload: Dict[str, str]) -> str:
 
-    chain = LLMChain(llm=get_llm(), prompt=_PROMPT)
-    return chain.run(payload).strip()
+    return model_routing.invoke("biomarker_summary", _PROMPT, payload).strip()
+
+async def aupdate_biomarker_summary(payload: Dict[str, str]) -> str:
+    return (await model_routing.ainvoke("biomarker_summary", _PROMPT, payload)).strip()
 
 if __name__ == "__main__":
+    import json_codec
+
     payload = dict(
         existing_summary=(
-            "User typically feels best after high-fiber, plant-forward dinners "
-            "and reports mild bloating when meals are very legume-heavy."
+            "User reports steadier Energy and higher Fullness after high-fiber, "
+            "plant-forward dinners; Mood dips on days with very late meals."
         ),
-        biomarker_journal=(
-            # strength, skin, energy, bloating scores (10 = great)
-            "2025-06-10  strength 6  skin 8  energy 5  bloating 4\n"
-            "2025-06-11  strength 7  skin 7  energy 6  bloating 3\n"
-            "2025-06-12  strength 5  skin 6  energy 4  bloating 2"
-        ),
-        meals_last_period=json.dumps([
-            "quinoa-black-bean-bowl",
-            "greek-salad-with-feta",
-            "tofu-stir-fry-with-broccoli"
+        # what summary_delta.plan() sends: the new UserBiomarker rows as JSON (1-10 scores)
+        biomarker_journal=json_codec.dumps([
+            {"date": "2025-06-10", "Mood": 6, "Energy": 5, "Fullness": 7},
+            {"date": "2025-06-11", "Mood": 7, "Energy": 6, "Fullness": 8},
+            {"date": "2025-06-12", "Mood": 5, "Energy": 4, "Fullness": 6},
         ]),
+        ingredient_stats=(
+            "- black beans -> Fullness (same day): r=+0.58, +1.9 pts, eaten on 6/21 scored days\n"
+            "- chickpeas -> Energy (next day): r=-0.41, -1.2 pts, eaten on 5/20 scored days"
+        ),
     )
 
     new_summary = update_biomarker_summary(payload)
@@ -0,0 +1,168 @@
+"""
+CIRCUIT BREAKERS FOR REMOTE DEPENDENCIES (Sheets API, model endpoint)
+
+    closed     calls go through; the outcomes of the last `window` calls
+               are kept. Once at least `min_calls` are in and the share of
+               failures reaches `failure_rate`, the breaker opens.
+    open       calls fail at once with CircuitOpenError, for `open_s`
+               seconds, instead of each waiting through a failing call.
+    half_open  after `open_s`, ONE probe call is let through (others still
+               fail fast). Success closes the breaker with a clean window;
+               failure opens it for another `open_s`.
+
+CircuitOpenError is a ConnectionError, so callers can handle it without
+importing this module (routes answer 503), like LLMDeadlineExceeded is a
+TimeoutError.
+
+    BREAKER = CircuitBreaker("sheets", is_failure=...)
+    rows = BREAKER.call(ws.get_all_values)
+
+Defaults come from BREAKER_FAILURE_RATE, BREAKER_WINDOW, BREAKER_MIN_CALLS
+and BREAKER_OPEN_S; `snapshot()` feeds the monitoring endpoint.
+"""
+from __future__ import annotations
+
+import collections
+import os
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+FAILURE_RATE = float(os.environ.get("BREAKER_FAILURE_RATE", "0.5"))
+WINDOW = int(os.environ.get("BREAKER_WINDOW", "20"))
+MIN_CALLS = int(os.environ.get("BREAKER_MIN_CALLS", "10"))
+OPEN_S = float(os.environ.get("BREAKER_OPEN_S", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(ConnectionError):
+    """The dependency's breaker is open; the call was not attempted."""
+
+    def __init__(self, name: str, retry_in_s: float):
+        super().__init__(f"{name} unavailable (circuit open, retry in {retry_in_s:.0f}s)")
+        self.name = name
+        self.retry_in_s = retry_in_s
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_rate: float = FAILURE_RATE, window: int = WINDOW,
+                 min_calls: int = MIN_CALLS, open_s: float = OPEN_S,
+                 is_failure: Optional[Callable[[BaseException], bool]] = None):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_s = open_s
+        self._is_failure = is_failure or (lambda e: True)
+        self._lock = threading.Lock()
+        self._outcomes: Deque[bool] = collections.deque(maxlen=window)  # True = failure
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._counts: Dict[str, int] = collections.Counter()
+
+    # ---- state machine ----
+    def allow(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now. Pair with success()/failure()."""
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            retry_in = self._opened_at + self.open_s - time.monotonic()
+            if self._state == OPEN and retry_in <= 0:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                self._counts["probes"] += 1
+                return
+            self._counts["rejected"] += 1
+        raise CircuitOpenError(self.name, max(retry_in, 0.0))
+
+    def success(self) -> None:
+        with self._lock:
+            if self._state == OPEN:
+                return  # a straggler from before the breaker opened; only a probe may close it
+            if self._state == HALF_OPEN:
+                self._close()
+            self._outcomes.append(False)
+
+    def failure(self, e: Optional[BaseException] = None) -> None:
+        if e is not None and not self._is_failure(e):
+            self.success()  # the dependency answered; the request itself was wrong
+            return
+        with self._lock:
+            self._counts["failures"] += 1
+            if self._state == OPEN:
+                return
+            if self._state == HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(True)
+            n = len(self._outcomes)
+            if n >= self.min_calls and sum(self._outcomes) / n >= self.failure_rate:
+                self._open()
+
+    def release(self) -> None:
+        """Give back a half-open probe slot without recording an outcome."""
+        with self._lock:
+            self._probing = False
+
+    def _open(self) -> None:
+        self._state, self._opened_at, self._probing = OPEN, time.monotonic(), False
+        self._counts["opened"] += 1
+        print(f"[circuit_breaker] {self.name} opened for {self.open_s:.0f}s")
+
+    def _close(self) -> None:
+        self._state, self._probing = CLOSED, False
+        self._outcomes.clear()
+        print(f"[circuit_breaker] {self.name} closed")
+
+    # ---- wrapping calls ----
+    def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        self.allow()
+        try:
+            out = fn(*args, **kwargs)
+        except Exception as e:
+            self.failure(e)
+            raise
+        except BaseException:  # cancelled / interrupted: says nothing about the dependency
+            self.release()
+            raise
+        self.success()
+        return out
+
+    async def acall(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        self.allow()
+        try:
+            out = await fn(*args, **kwargs)
+        except Exception as e:
+            self.failure(e)
+            raise
+        except BaseException:  # cancelled / interrupted: says nothing about the dependency
+            self.release()
+            raise
+        self.success()
+        return out
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() >= self._opened_at + self.open_s:
+                return HALF_OPEN  # the next call will probe
+            return self._state
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            n = len(self._outcomes)
+            return {
+                "state": state,
+                "failure_rate": round(sum(self._outcomes) / n, 3) if n else 0.0,
+                "window_calls": n,
+                "retry_in_s": round(max(self._opened_at + self.open_s - time.monotonic(), 0.0), 1)
+                              if state == OPEN else 0.0,
+                "config": {"failure_rate": self.failure_rate, "window": self._outcomes.maxlen,
+                           "min_calls": self.min_calls, "open_s": self.open_s},
+                **{k: self._counts.get(k, 0) for k in ("failures", "opened", "rejected", "probes")},
+            }
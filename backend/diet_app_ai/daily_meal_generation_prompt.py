@@ -1,6 +1,8 @@
 # daily_meal_generation_prompts.py
+# The system message (instructions + output format) is identical for every
+# user, so providers can cache it as a prompt prefix; only DAILY_USER varies.
 
-DAILY_SYSTEM = """You are a meal-planning model.
+DAILY_INSTRUCTIONS = """You are a meal-planning model.
 Generate exactly 3 sections — breakfast, lunch, dinner — each with 5 suggestions.
 Return ONLY JSON that matches the schema below. Each suggestion must include:
 - long_name  (a human-friendly title)
@@ -16,21 +18,12 @@ Hard requirements:
 - Do NOT include any text outside the JSON.
 """
 
-# Note: we include BOTH the new and legacy keys so PromptTemplate.from_template()
-# will accept either. Your chain should pass values for the union:
-#   biomarker_summary, taste_profile, taste_summary, goals, user_goals, dietary_restrictions
-DAILY_USER = """Context:
-- Biomarker summary: {biomarker_summary}
-- Taste preferences (profile/summary): {taste_summary}
-- Dietary restrictions: {dietary_restrictions}
-
-Output JSON (example shape):
-Output format example:
+DAILY_OUTPUT_FORMAT = """Output JSON (example shape):
 {{
   "breakfast": {{
     "slug1": {{
       "long_name": "...",
-      "description": "...,
+      "description": "...",
       "ingredients": {{ "ingredient": "amount", ... }},
       "instructions": "1) ...\\n2) ..."
     }},
@@ -41,4 +34,12 @@ Output format example:
   "dinner": {{ ... }}
 }}"""
 
-DAILY_MEAL_GENERATION_PROMPT = DAILY_SYSTEM + "\n" + DAILY_USER
+DAILY_SYSTEM = DAILY_INSTRUCTIONS + "\n" + DAILY_OUTPUT_FORMAT
+
+# The chain passes: biomarker_summary, taste_summary, dietary_restrictions
+DAILY_USER = """Context:
+- Biomarker summary: {biomarker_summary}
+- Taste preferences (profile/summary): {taste_summary}
+- Dietary restrictions: {dietary_restrictions}"""
+
+DAILY_MEAL_GENERATION_PROMPT = DAILY_SYSTEM + "\n\n" + DAILY_USER
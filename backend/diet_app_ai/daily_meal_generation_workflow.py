@@ -1,28 +1,23 @@
 """
 LANGCHAIN WORKFLOW · DAILY MEAL GENERATION
 Function: `generate_daily_meals(context: dict) -> dict`
+
+Output is schema-constrained and validated (meal_schema.py); a plan that
+still doesn't validate after one repair pass raises MealFormatError.
 """
 from typing import Dict, Any, List
-import json
-from langchain import LLMChain
-from langchain.prompts import PromptTemplate
-from langchain.llms import LlamaCpp
-from daily_meal_generation_prompt import DAILY_MEAL_GENERATION_PROMPT
-from initial_meal_generation_workflow import get_llm  # reuse helper
-from langchain_core.output_parsers.json import JsonOutputParser
-
-
-_PROMPT = PromptTemplate.from_template(
-    DAILY_MEAL_GENERATION_PROMPT
-)
+from initial_meal_generation_workflow import meal_schema
 
-def generate_daily_meals(context: Dict[str, Any]) -> str:
-    """Generate daily meals JSON using a prompt that expects both the new and legacy keys."""
-    parser = JsonOutputParser()
 
+def _daily_chain_inputs(context: Dict[str, Any]) -> Dict[str, Any]:
     context_copy = context.copy()
     context_copy["dietary_restrictions"] = ", ".join(context_copy.get("dietary_restrictions", []))
+    return context_copy
 
-    chain = LLMChain(llm=get_llm(), prompt=_PROMPT, verbose=True, output_parser = parser)
+def generate_daily_meals(context: Dict[str, Any]) -> Dict[str, Any]:
+    """Generate the daily plan {breakfast|lunch|dinner: {slug: meal}} from the summaries and restrictions."""
+    return meal_schema.generate("daily", _daily_chain_inputs(context), verbose=True)
 
-    return chain.invoke(context_copy)["text"]
\ No newline at end of file
+async def agenerate_daily_meals(context: Dict[str, Any]) -> Dict[str, Any]:
+    """Async twin of `generate_daily_meals` (awaits the model via `ainvoke`)."""
+    return await meal_schema.agenerate("daily", _daily_chain_inputs(context), verbose=True)
@@ -1,5 +1,7 @@
 # initial_meal_generation_prompts.py
-INITIAL_MEAL_SYSTEM = """You are a diet planning assistant. Generate 10 diverse, realistic meals as JSON only.
+# The system message (instructions + output format) is identical for every
+# user, so providers can cache it as a prompt prefix; only INITIAL_MEAL_USER varies.
+INITIAL_MEAL_INSTRUCTIONS = """You are a diet planning assistant. Generate 10 diverse, realistic meals as JSON only.
 Each top-level key is a short, hyphen-seperated slug.
 For each meal include:
 - long_name: longer descriptive title
@@ -9,16 +11,11 @@ For each meal include:
 - RESPECT USER DIETARY RESTRICTIONS (e.g., vegetarian means NO MEAT/SEAFOOD).
 Return ONLY valid JSON, no markdown fences, no commentary."""
 
-INITIAL_MEAL_USER = """User profile:
-- Height (in): {height}
-- Weight (lb): {weight}
-- Dietary restrictions (comma-separated): {dietary_restrictions}
-
-Output format example:
+INITIAL_MEAL_OUTPUT_FORMAT = """Output format example:
 {{
   "slug1": {{
     "long_name": "...",
-    "description": "...,
+    "description": "...",
     "ingredients": {{ "ingredient": "amount", ... }},
     "instructions": "1) ...\\n2) ..."
   }},
@@ -26,4 +23,11 @@ Output format example:
   "slug10": {{ ... }}
 }}"""
 
-INITIAL_MEAL_GENERATION_PROMPT = INITIAL_MEAL_SYSTEM + "\n" + INITIAL_MEAL_USER
\ No newline at end of file
+INITIAL_MEAL_SYSTEM = INITIAL_MEAL_INSTRUCTIONS + "\n\n" + INITIAL_MEAL_OUTPUT_FORMAT
+
+INITIAL_MEAL_USER = """User profile:
+- Height (in): {height}
+- Weight (lb): {weight}
+- Dietary restrictions (comma-separated): {dietary_restrictions}"""
+
+INITIAL_MEAL_GENERATION_PROMPT = INITIAL_MEAL_SYSTEM + "\n\n" + INITIAL_MEAL_USER
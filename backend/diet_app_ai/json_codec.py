@@ -0,0 +1,69 @@
+"""
+JSON encode/decode used by the workflows and the Flask/Quart apps.
+
+Uses orjson when it is installed and the stdlib `json` module otherwise.
+Output is byte-identical to
+
+    json.dumps(obj, ensure_ascii=True, sort_keys=sort_keys, separators=(",", ":"))
+
+whichever backend runs: orjson's result is used only when it is pure ASCII
+and has none of the few spellings where the two differ (DEL, which the stdlib
+escapes, and exponents like 1e-7 vs 1e-07); anything else is re-encoded by
+the stdlib. Anything orjson refuses (>64-bit ints, non-str keys, unknown types
+without a `default`) falls back to the stdlib too; dates and dataclasses always
+go through `default`, as with the stdlib. The one deliberate difference: NaN
+and Infinity come out as `null` (valid JSON) instead of the stdlib's `NaN`. `loads` accepts exactly what
+`json.loads` accepts and raises `json.JSONDecodeError` on bad input.
+
+    JSON_BACKEND=stdlib    # force the stdlib path (e.g. to compare)
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+from typing import Any, Callable, Optional
+
+JSONDecodeError = json.JSONDecodeError
+
+try:
+    import orjson  # optional
+except ImportError:  # pragma: no cover - depends on the deployment
+    orjson = None
+
+if os.environ.get("JSON_BACKEND", "").lower() == "stdlib":
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "stdlib"
+
+_COMPACT = (",", ":")
+_OPTS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS if orjson is not None else 0
+# orjson writes 1e-7 where the stdlib writes 1e-07 (may also hit inside strings: harmless, just slower)
+_SHORT_EXP = re.compile(rb"\de-\d(?!\d)")
+
+
+def _std_dumps(obj: Any, sort_keys: bool, default: Optional[Callable[[Any], Any]]) -> str:
+    return json.dumps(obj, ensure_ascii=True, sort_keys=sort_keys, separators=_COMPACT, default=default)
+
+
+def dumps(obj: Any, *, sort_keys: bool = False, default: Optional[Callable[[Any], Any]] = None) -> str:
+    """Compact, ASCII-only JSON text."""
+    if orjson is None:
+        return _std_dumps(obj, sort_keys, default)
+    try:
+        raw = orjson.dumps(obj, default=default, option=_OPTS | orjson.OPT_SORT_KEYS if sort_keys else _OPTS)
+    except (TypeError, orjson.JSONEncodeError):
+        return _std_dumps(obj, sort_keys, default)
+    # cheap byte scans first; DEL is escaped by the stdlib but not by orjson
+    if not raw.isascii() or b"\x7f" in raw or (b"e-" in raw and _SHORT_EXP.search(raw)):
+        return _std_dumps(obj, sort_keys, default)
+    return raw.decode("ascii")
+
+
+def loads(s: str | bytes) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            pass  # the stdlib also takes NaN/Infinity and big ints; it raises the real error
+    return json.loads(s)
@@ -0,0 +1,19 @@
+# json_repair_prompt.py
+# One repair pass for meal JSON that failed to parse or validate. The
+# system message is static (cacheable); the schema, the errors and the
+# broken output go in the human message.
+JSON_REPAIR_SYSTEM = """You repair JSON produced by a meal-planning model.
+Fix the JSON below so that it parses and matches the JSON schema given with it.
+Keep every meal and all of its content; change only what is needed to fix the listed errors.
+Return ONLY the corrected JSON, no markdown fences, no commentary."""
+
+JSON_REPAIR_USER = """Fix the JSON ({schema_name}).
+
+Schema:
+{schema}
+
+Errors:
+{errors}
+
+JSON to fix:
+{output}"""
@@ -0,0 +1,118 @@
+"""
+LATENCY HISTOGRAMS AND HEDGE BUDGET FOR MODEL CALLS
+
+`Histogram` keeps counts in fixed log-spaced buckets (50 ms .. ~10 min,
++25% per bucket), so recording is O(1) and a percentile is one pass over
+~45 counters. model_routing keeps one per workflow and uses it to decide
+when to fire a hedged request; `snapshot()` feeds the metrics endpoint.
+
+`HedgeBudget` caps hedges to a fraction of recent calls (sliding window),
+so a slow endpoint can't be hit with double traffic.
+"""
+from __future__ import annotations
+
+import bisect
+import collections
+import math
+import threading
+from typing import Deque, Dict, List, Optional
+
+_BOUNDS: List[float] = []
+_b = 0.05
+while _b < 600.0:
+    _BOUNDS.append(round(_b, 4))
+    _b *= 1.25
+
+
+class Histogram:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(_BOUNDS) + 1)
+        self.count = 0
+        self.total_s = 0.0
+        self.timeouts = 0
+        self.errors = 0
+
+    def record(self, seconds: float) -> None:
+        i = bisect.bisect_left(_BOUNDS, seconds)
+        with self._lock:
+            self._counts[i] += 1
+            self.count += 1
+            self.total_s += seconds
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Upper bound of the bucket holding the p-th percentile (None when empty)."""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = math.ceil(self.count * p / 100.0)
+            seen = 0
+            for i, n in enumerate(self._counts):
+                seen += n
+                if seen >= rank:
+                    return _BOUNDS[i] if i < len(_BOUNDS) else _BOUNDS[-1]
+        return None
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        return {
+            "count": self.count,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "mean_s": round(self.total_s / self.count, 3) if self.count else None,
+            "p50_s": self.percentile(50),
+            "p90_s": self.percentile(90),
+            "p95_s": self.percentile(95),
+            "p99_s": self.percentile(99),
+        }
+
+
+class HedgeBudget:
+    """Allow a hedge only while hedges stay under `max_rate` of the last `window` requests."""
+
+    def __init__(self, max_rate: float, window: int = 200):
+        self.max_rate = max_rate
+        self._lock = threading.Lock()
+        self._recent: Deque[bool] = collections.deque(maxlen=window)  # True = hedged
+        self._hedged = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _push(self, hedged: bool) -> None:
+        if len(self._recent) == self._recent.maxlen and self._recent[0]:
+            self._hedged -= 1
+        self._recent.append(hedged)
+        self._hedged += hedged
+
+    def call(self) -> None:
+        with self._lock:
+            self._push(False)
+
+    def try_hedge(self) -> bool:
+        with self._lock:
+            if (self._hedged + 1) / (len(self._recent) + 1) > self.max_rate:
+                return False
+            # a hedge counts as one more (hedged) request in the window
+            self._push(True)
+            self.hedges += 1
+            return True
+
+    def won(self) -> None:
+        with self._lock:
+            self.hedge_wins += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "recent_hedge_rate": round(self._hedged / len(self._recent), 3) if self._recent else 0.0,
+                "max_rate": self.max_rate,
+            }
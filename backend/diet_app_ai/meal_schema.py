@@ -0,0 +1,240 @@
+"""
+MEAL OUTPUT SCHEMA · structured output, validation and one repair pass
+
+The JSON schemas the meal workflows ask for are derived once, at import,
+from the `Meal` shape below, so the prompt, the schema sent as
+`response_format` (see model_routing, Route.response_format) and the
+validator can't drift apart:
+
+    initial   {slug: Meal, ...}
+    daily     {"breakfast": {slug: Meal, ...}, "lunch": {...}, "dinner": {...}}
+    single    {slug: Meal}
+
+`generate` / `agenerate` run a workflow and return the parsed, validated
+dict. Output that does not parse, or does not match the schema after cheap
+local fixes (numbers -> strings, a list of steps -> one string), gets ONE
+repair call on the "json_repair" route with the schema and the errors; if
+that fails too, MealFormatError is raised.
+"""
+from __future__ import annotations
+
+import collections
+import threading
+from typing import Any, Dict, List, Tuple, TypedDict, get_args, get_origin, get_type_hints
+
+import json_codec
+import model_routing
+import prompt_templates
+
+
+class Meal(TypedDict):
+    long_name: str
+    description: str
+    ingredients: Dict[str, str]  # ingredient -> amount
+    instructions: str
+
+
+SECTIONS = ("breakfast", "lunch", "dinner")
+
+
+class MealFormatError(ValueError):
+    """The model's output did not parse/validate, even after the repair pass."""
+
+    def __init__(self, message: str, raw: str):
+        super().__init__(message)
+        self.raw = raw
+
+
+def _json_type(tp) -> Dict[str, Any]:
+    if tp is str:
+        return {"type": "string"}
+    if get_origin(tp) is dict:
+        _key, value = get_args(tp)
+        return {"type": "object", "additionalProperties": _json_type(value)}
+    raise TypeError(f"no JSON schema for {tp!r}")
+
+
+_MEAL_FIELDS: Dict[str, Any] = get_type_hints(Meal)
+MEAL_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {name: _json_type(tp) for name, tp in _MEAL_FIELDS.items()},
+    "required": list(_MEAL_FIELDS),
+    "additionalProperties": False,
+}
+
+
+def _meals_by_slug(min_meals: int, max_meals: int = 0) -> Dict[str, Any]:
+    schema: Dict[str, Any] = {"type": "object", "additionalProperties": MEAL_SCHEMA, "minProperties": min_meals}
+    if max_meals:
+        schema["maxProperties"] = max_meals
+    return schema
+
+
+SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "initial": {"title": "initial_meals", **_meals_by_slug(1)},
+    "daily": {
+        "title": "daily_meal_plan",
+        "type": "object",
+        "properties": {s: _meals_by_slug(1) for s in SECTIONS},
+        "required": list(SECTIONS),
+        "additionalProperties": False,
+    },
+    "single": {"title": "single_meal", **_meals_by_slug(1, 1)},
+}
+# compact text for the repair prompt, built once like the schemas
+_SCHEMA_TEXT = {w: json_codec.dumps(s) for w, s in SCHEMAS.items()}
+
+
+# ---- validation ----
+def _fix_meal(meal: Dict[str, Any]) -> None:
+    """Cheap local fixes that don't need the model."""
+    ingredients = meal.get("ingredients")
+    if isinstance(ingredients, dict):
+        for k, v in list(ingredients.items()):
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                ingredients[k] = str(v)
+    steps = meal.get("instructions")
+    if isinstance(steps, list) and all(isinstance(s, str) for s in steps):
+        meal["instructions"] = "\n".join(steps)
+
+
+def _check_meal(path: str, meal: Any, errors: List[str]) -> None:
+    if not isinstance(meal, dict):
+        errors.append(f"{path}: expected an object, got {type(meal).__name__}")
+        return
+    _fix_meal(meal)
+    for name in _MEAL_FIELDS:
+        if name not in meal:
+            errors.append(f"{path}: missing '{name}'")
+    for name in meal.keys() - _MEAL_FIELDS.keys():
+        errors.append(f"{path}: unexpected field '{name}'")
+    for name in ("long_name", "description", "instructions"):
+        if name in meal and not isinstance(meal[name], str):
+            errors.append(f"{path}.{name}: expected a string")
+    ingredients = meal.get("ingredients")
+    if "ingredients" in meal:
+        if not isinstance(ingredients, dict):
+            errors.append(f"{path}.ingredients: expected an object of ingredient -> amount")
+        else:
+            for k, v in ingredients.items():
+                if not isinstance(v, str):
+                    errors.append(f"{path}.ingredients.{k}: expected a string amount")
+
+
+def _check_slugs(path: str, meals: Any, schema: Dict[str, Any], errors: List[str]) -> None:
+    if not isinstance(meals, dict):
+        errors.append(f"{path or '$'}: expected an object of slug -> meal")
+        return
+    if len(meals) < schema["minProperties"]:
+        errors.append(f"{path or '$'}: expected at least {schema['minProperties']} meal(s)")
+    if schema.get("maxProperties") and len(meals) > schema["maxProperties"]:
+        errors.append(f"{path or '$'}: expected at most {schema['maxProperties']} meal(s)")
+    for slug, meal in meals.items():
+        _check_meal(f"{path}.{slug}" if path else slug, meal, errors)
+
+
+def validate(workflow: str, data: Any) -> List[str]:
+    """Schema errors of a parsed output (empty list: valid). Fixes trivial type slips in place."""
+    errors: List[str] = []
+    schema = SCHEMAS[workflow]
+    if workflow == "daily":
+        if not isinstance(data, dict):
+            return ["$: expected an object with breakfast, lunch and dinner"]
+        for section in SECTIONS:
+            if section not in data:
+                errors.append(f"$: missing '{section}'")
+            else:
+                _check_slugs(section, data[section], schema["properties"][section], errors)
+        for extra in data.keys() - set(SECTIONS):
+            errors.append(f"$: unexpected section '{extra}'")
+        return errors
+    _check_slugs("", data, schema, errors)
+    return errors
+
+
+def _parse(text: Any) -> Any:
+    if not isinstance(text, str):
+        return text
+    try:
+        return json_codec.loads(text)
+    except json_codec.JSONDecodeError:
+        # a fenced or chatty answer around otherwise valid JSON
+        first, last = text.find("{"), text.rfind("}")
+        if first != -1 and first < last:
+            return json_codec.loads(text[first:last + 1])
+        raise
+
+
+def check(workflow: str, text: Any) -> Tuple[Any, List[str]]:
+    try:
+        data = _parse(text)
+    except json_codec.JSONDecodeError as e:
+        return None, [f"invalid JSON: {e}"]
+    if workflow == "single" and isinstance(data, dict) and "ingredients" in data:
+        # a model that skips the slug wrapper and returns the meal itself
+        slug = "-".join(str(data.get("long_name") or "replacement-meal").lower().split())
+        data = {slug: data}
+    return data, validate(workflow, data)
+
+
+# ---- outcome counters (GET /llm/metrics) ----
+_lock = threading.Lock()
+_stats: Dict[str, collections.Counter] = collections.defaultdict(collections.Counter)
+
+
+def _count(workflow: str, outcome: str) -> None:
+    with _lock:
+        _stats[workflow][outcome] += 1
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """Per workflow: valid (first try), repaired, failed."""
+    with _lock:
+        return {w: dict(c) for w, c in _stats.items()}
+
+
+def _repair_inputs(workflow: str, text: Any, errors: List[str]) -> Dict[str, str]:
+    return {
+        "schema_name": SCHEMAS[workflow]["title"],
+        "schema": _SCHEMA_TEXT[workflow],
+        "errors": "\n".join(f"- {e}" for e in errors[:20]),
+        "output": text if isinstance(text, str) else json_codec.dumps(text),
+    }
+
+
+def _settle(workflow: str, text: Any, errors: List[str], repaired_text: Any) -> Any:
+    data, repair_errors = check(workflow, repaired_text)
+    if repair_errors:
+        _count(workflow, "failed")
+        raise MealFormatError(f"{workflow} output invalid after repair: {'; '.join(repair_errors[:5])}",
+                              repaired_text if isinstance(repaired_text, str) else str(text))
+    _count(workflow, "repaired")
+    return data
+
+
+def generate(workflow: str, inputs: Dict[str, Any], verbose: bool = False) -> Any:
+    """Run a meal workflow with structured output; returns the validated dict."""
+    prompt = prompt_templates.PROMPTS[workflow]
+    text = model_routing.invoke(workflow, prompt, inputs, verbose=verbose, json_schema=SCHEMAS[workflow])
+    data, errors = check(workflow, text)
+    if not errors:
+        _count(workflow, "valid")
+        return data
+    print(f"[meal_schema] {workflow} output invalid ({errors[0]}), repairing")
+    repaired = model_routing.invoke("json_repair", prompt_templates.PROMPTS["json_repair"],
+                                    _repair_inputs(workflow, text, errors), json_schema=SCHEMAS[workflow])
+    return _settle(workflow, text, errors, repaired)
+
+
+async def agenerate(workflow: str, inputs: Dict[str, Any], verbose: bool = False) -> Any:
+    """Async twin of `generate`."""
+    prompt = prompt_templates.PROMPTS[workflow]
+    text = await model_routing.ainvoke(workflow, prompt, inputs, verbose=verbose, json_schema=SCHEMAS[workflow])
+    data, errors = check(workflow, text)
+    if not errors:
+        _count(workflow, "valid")
+        return data
+    print(f"[meal_schema] {workflow} output invalid ({errors[0]}), repairing")
+    repaired = await model_routing.ainvoke("json_repair", prompt_templates.PROMPTS["json_repair"],
+                                           _repair_inputs(workflow, text, errors), json_schema=SCHEMAS[workflow])
+    return _settle(workflow, text, errors, repaired)
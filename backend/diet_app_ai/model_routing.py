@@ -0,0 +1,456 @@
+"""
+PER-WORKFLOW MODEL ROUTING
+
+Maps each workflow to the model that serves it:
+
+    workflow            model              temp  max_tokens  budget_s  fallback          hedge  output
+    initial             llama3.1:latest    0.7   4096        90        -                 -      json_schema
+    daily               llama3.1:latest    0.7   4096        90        -                 -      json_schema
+    single              llama3.1:latest    0.7   1024        30        -                 p95    json_schema
+    json_repair         llama3.1:latest    0.0   4096        60        -                 -      json_schema
+    biomarker_summary   llama3.2:latest    0.3    400        15        llama3.1:latest   p95    text
+    taste_summary       llama3.2:latest    0.3    300        15        llama3.1:latest   p95    text
+
+`budget_s` is the timeout of one model call. When a call runs over (or
+fails) and the route has a fallback model, the request is re-sent once to
+the fallback, within the workflow's overall `deadline_s`; past it the call
+raises LLMDeadlineExceeded (a TimeoutError).
+
+`response_format`: when the caller passes a JSON schema (meal_schema.py),
+"json_schema" sends it as an OpenAI-style response_format so the endpoint
+constrains decoding; "json_object" asks only for some JSON (endpoints
+without schema support); None sends nothing.
+
+Hedging: once a call has been in flight longer than the `hedge_pct`
+percentile of that workflow's observed latency (llm_latency.Histogram), an
+identical second request is fired and the first answer wins. Hedges are
+capped at LLM_HEDGE_MAX_RATE of recent requests per workflow.
+
+Override any field with MODEL_ROUTES, e.g.
+
+    MODEL_ROUTES='{"daily": {"model": "llama3.3:70b", "budget_s": 120}}'
+
+Every call is recorded in the active `collect()` block, so callers can
+persist the model and temperature that actually produced a result:
+
+    with model_routing.collect() as calls:
+        meals = generate_daily_meals(context)
+    model, temperature = model_routing.used(calls, "daily")
+
+Circuit breakers: each model has one (circuit_breaker.py). While a model's
+breaker is open, its attempts are skipped without waiting: the call goes
+straight to the fallback model, or raises CircuitOpenError (a
+ConnectionError) when there is none left. `breakers()` reports their state.
+
+Every attempt (primary, hedge, fallback) is also reported to the
+`on_usage` listeners with its token usage, latency and outcome; listeners
+run in the caller's context (the request, for routes), on whichever thread
+finished the attempt. backend/llm_ledger.py is the one that persists them.
+"""
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import contextvars
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, replace
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from langchain.chains import LLMChain
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_community.chat_models import ChatOpenAI
+
+from diet_app_ai.circuit_breaker import CircuitBreaker, CircuitOpenError  # one module object, shared with sheets_client
+from llm_latency import HedgeBudget, Histogram
+
+GENAI_STUDIO_API_KEY = os.environ.get("GENAI_STUDIO_API_KEY", "")
+if not GENAI_STUDIO_API_KEY:
+    raise RuntimeError("GENAI_STUDIO_API_KEY is not set; export the GenAI Studio API key "
+                       "(any value works against llm_stub_server.py)")
+# Point at a local OpenAI-compatible server (benchmarks, load tests) with GENAI_BASE_URL.
+GENAI_BASE_URL = os.environ.get("GENAI_BASE_URL", "https://genai.rcac.purdue.edu/api")
+
+
+# Hedging: at most this share of recent requests per workflow may be hedges,
+# and only once the workflow has enough samples to know its percentiles.
+HEDGE_MAX_RATE = float(os.environ.get("LLM_HEDGE_MAX_RATE", "0.1"))
+HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_CALL_THREADS = int(os.environ.get("LLM_CALL_THREADS", "64"))
+
+
+@dataclass(frozen=True)
+class Route:
+    model: str
+    temperature: float
+    max_tokens: int
+    budget_s: float
+    fallback_model: Optional[str] = None
+    deadline_s: Optional[float] = None   # whole call incl. fallback (default: budget per attempt)
+    hedge_pct: Optional[float] = None    # hedge once the call runs past this latency percentile
+    response_format: Optional[str] = None  # "json_schema" | "json_object" | None
+
+
+DEFAULT_ROUTES: Dict[str, Route] = {
+    "initial":           Route("llama3.1:latest", 0.7, 4096, 90.0, response_format="json_schema"),
+    "daily":             Route("llama3.1:latest", 0.7, 4096, 90.0, response_format="json_schema"),
+    "single":            Route("llama3.1:latest", 0.7, 1024, 30.0, hedge_pct=95, response_format="json_schema"),
+    "json_repair":       Route("llama3.1:latest", 0.0, 4096, 60.0, response_format="json_schema"),
+    "biomarker_summary": Route("llama3.2:latest", 0.3,  400, 15.0, "llama3.1:latest", hedge_pct=95),
+    "taste_summary":     Route("llama3.2:latest", 0.3,  300, 15.0, "llama3.1:latest", hedge_pct=95),
+}
+
+
+def _load_routes() -> Dict[str, Route]:
+    routes = dict(DEFAULT_ROUTES)
+    overrides = json.loads(os.environ.get("MODEL_ROUTES") or "{}")
+    for workflow, fields in overrides.items():
+        base = routes.get(workflow) or DEFAULT_ROUTES["daily"]
+        routes[workflow] = replace(base, **fields)
+    return routes
+
+
+ROUTES = _load_routes()
+
+
+def route(workflow: str) -> Route:
+    return ROUTES[workflow]
+
+
+# Building a client costs ~100 ms (HTTP clients, TLS context), which would
+# dominate concurrent serving; clients are reused per configuration.
+@lru_cache(maxsize=32)
+def get_llm(
+    api_key: str = GENAI_STUDIO_API_KEY,
+    base_url: str = GENAI_BASE_URL,
+    model_name: str = "llama3.1:latest",
+    temperature: float = 0.7,
+    max_tokens: Optional[int] = None,
+    request_timeout: Optional[float] = None,
+    ):
+    return ChatOpenAI(
+        api_key=api_key,
+        base_url=f"{base_url}",
+        model=model_name,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        request_timeout=request_timeout,
+        max_retries=0 if request_timeout else 2,
+    )
+
+
+# ---- which model served what ----
+Call = Tuple[str, str, float]  # (workflow, model, temperature)
+_calls: contextvars.ContextVar[Optional[List[Call]]] = contextvars.ContextVar("model_calls", default=None)
+
+
+@contextlib.contextmanager
+def collect() -> Iterator[List[Call]]:
+    """Record every routed call made inside the block (threads/tasks started inside inherit it)."""
+    calls: List[Call] = []
+    token = _calls.set(calls)
+    try:
+        yield calls
+    finally:
+        _calls.reset(token)
+
+
+def _record(workflow: str, model: str, temperature: float) -> None:
+    calls = _calls.get()
+    if calls is not None:
+        calls.append((workflow, model, temperature))
+
+
+def used(calls: List[Call], *workflows: str) -> Tuple[str, float | str]:
+    """(Model, Temperature) cell values for rows produced by `workflows`."""
+    hits = [(m, t) for w, m, t in calls if w in workflows]
+    if not hits:
+        r = ROUTES[workflows[0]]
+        return r.model, r.temperature
+    models = list(dict.fromkeys(m for m, _t in hits))
+    temps = list(dict.fromkeys(t for _m, t in hits))
+    return "+".join(models), temps[0] if len(temps) == 1 else "+".join(map(str, temps))
+
+
+# ---- per-attempt usage ----
+class _Usage(BaseCallbackHandler):
+    """Token counts of one model call, as reported by the provider."""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+
+    def on_llm_end(self, response, **kwargs: Any) -> None:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        self.prompt_tokens += usage.get("prompt_tokens") or 0
+        self.completion_tokens += usage.get("completion_tokens") or 0
+        self.cached_tokens += (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+
+
+UsageListener = Callable[[Dict[str, Any]], None]
+_usage_listeners: List[UsageListener] = []
+
+
+def on_usage(fn: UsageListener) -> None:
+    """Call `fn(record)` after every model attempt. `outcome` is ok, error, timeout or cancelled."""
+    _usage_listeners.append(fn)
+
+
+def _emit(workflow: str, model: str, usage: _Usage, seconds: float, outcome: str, hedge: bool) -> None:
+    record = {
+        "workflow": workflow,
+        "model": model,
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "cached_tokens": usage.cached_tokens,
+        "latency_s": seconds,
+        "outcome": outcome,
+        "hedge": hedge,
+    }
+    for fn in _usage_listeners:
+        try:
+            fn(record)
+        except Exception as e:  # accounting must never fail a model call
+            print(f"[model_routing] usage listener failed: {e}")
+
+
+def _outcome(e: BaseException) -> str:
+    return "timeout" if isinstance(e, TimeoutError) or "Timeout" in type(e).__name__ else "error"
+
+
+# ---- running a chain on a route ----
+class LLMDeadlineExceeded(TimeoutError):
+    """The workflow's deadline passed before any model call returned."""
+
+
+_latency: Dict[Tuple[str, str], Histogram] = collections.defaultdict(Histogram)
+_hedges: Dict[str, HedgeBudget] = collections.defaultdict(lambda: HedgeBudget(HEDGE_MAX_RATE))
+_pool = ThreadPoolExecutor(LLM_CALL_THREADS, thread_name_prefix="llm")
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def _is_outage(e: BaseException) -> bool:
+    """Timeouts, connection errors, 429 and 5xx count against the endpoint; other 4xx don't."""
+    code = getattr(e, "status_code", None)
+    return not (isinstance(code, int) and 400 <= code < 500 and code != 429)
+
+
+def _breaker(model: str) -> CircuitBreaker:
+    b = _breakers.get(model)
+    if b is None:
+        b = _breakers.setdefault(model, CircuitBreaker(f"llm:{model}", is_failure=_is_outage))
+    return b
+
+
+def _response_format(r: Route, json_schema: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if json_schema is None or r.response_format is None:
+        return None
+    if r.response_format == "json_object":
+        return {"type": "json_object"}
+    return {"type": "json_schema", "json_schema": {"name": json_schema.get("title", "output"), "schema": json_schema}}
+
+
+def _chain(prompt, model: str, r: Route, output_parser=None, verbose: bool = False,
+           json_schema: Optional[Dict[str, Any]] = None) -> LLMChain:
+    llm = get_llm(model_name=model, temperature=r.temperature, max_tokens=r.max_tokens,
+                  request_timeout=r.budget_s)
+    kwargs: Dict[str, Any] = {"llm": llm, "prompt": prompt, "verbose": verbose}
+    if output_parser is not None:
+        kwargs["output_parser"] = output_parser
+    response_format = _response_format(r, json_schema)
+    if response_format is not None:
+        kwargs["llm_kwargs"] = {"response_format": response_format}
+    return LLMChain(**kwargs)
+
+
+def _attempts(workflow: str) -> List[Tuple[str, Route]]:
+    r = ROUTES[workflow]
+    out = [(r.model, r)]
+    if r.fallback_model and r.fallback_model != r.model:
+        out.append((r.fallback_model, r))
+    return out
+
+
+def _deadline(r: Route) -> float:
+    if r.deadline_s:
+        return r.deadline_s
+    return r.budget_s * (2 if r.fallback_model else 1)
+
+
+def _hedge_delay(workflow: str, model: str, r: Route) -> Optional[float]:
+    """Seconds after which a second identical request is worth firing (None: don't hedge)."""
+    if r.hedge_pct is None:
+        return None
+    hist = _latency[(workflow, model)]
+    if hist.count < HEDGE_MIN_SAMPLES:
+        return None
+    return hist.percentile(r.hedge_pct)
+
+
+def _log_fallback(workflow: str, model: str, e: BaseException, next_model: str) -> None:
+    why = "circuit open" if isinstance(e, CircuitOpenError) else f"failed ({type(e).__name__})"
+    print(f"[model_routing] {workflow} on {model} {why}, falling back to {next_model}")
+
+
+def _attempt(workflow: str, model: str, r: Route, timeout: float, call) -> Any:
+    """One routed call on the pool, hedged once if it runs past the workflow's percentile."""
+    hist, hedge = _latency[(workflow, model)], _hedges[workflow]
+    hedge.call()
+    delay = _hedge_delay(workflow, model, r)
+    start = time.monotonic()
+
+    def timed(hedged: bool):
+        usage, t0 = _Usage(), time.monotonic()
+        try:
+            out = call(usage)
+        except BaseException as e:
+            _emit(workflow, model, usage, time.monotonic() - t0, _outcome(e), hedged)
+            raise
+        hist.record(time.monotonic() - t0)
+        _emit(workflow, model, usage, time.monotonic() - t0, "ok", hedged)
+        return out
+
+    # pool threads run in a copy of the caller's context, so collectors and
+    # usage listeners see the request that made the call
+    primary = _pool.submit(contextvars.copy_context().run, timed, False)
+    pending = {primary}
+    if delay is not None and delay < timeout:
+        done, _ = wait(pending, timeout=delay)
+        if not done and hedge.try_hedge():
+            pending.add(_pool.submit(contextvars.copy_context().run, timed, True))
+    error: Optional[BaseException] = None
+    while pending:
+        remaining = timeout - (time.monotonic() - start)
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for f in done:
+            if f.exception() is None:
+                if f is not primary:
+                    hedge.won()
+                return f.result()
+            error = f.exception()
+    if error is not None and not pending:
+        hist.record_error()
+        raise error
+    # the losing threads finish on their own, bounded by the client timeout
+    hist.record_timeout()
+    raise LLMDeadlineExceeded(f"{workflow} on {model}: no response within {timeout:.1f}s")
+
+
+async def _aattempt(workflow: str, model: str, r: Route, timeout: float, call) -> Any:
+    """Async twin of `_attempt`; the losing request is cancelled."""
+    hist, hedge = _latency[(workflow, model)], _hedges[workflow]
+    hedge.call()
+    delay = _hedge_delay(workflow, model, r)
+    start = time.monotonic()
+
+    async def timed(hedged: bool):
+        usage, t0 = _Usage(), time.monotonic()
+        try:
+            out = await call(usage)
+        except asyncio.CancelledError:
+            _emit(workflow, model, usage, time.monotonic() - t0, "cancelled", hedged)
+            raise
+        except Exception as e:
+            _emit(workflow, model, usage, time.monotonic() - t0, _outcome(e), hedged)
+            raise
+        hist.record(time.monotonic() - t0)
+        _emit(workflow, model, usage, time.monotonic() - t0, "ok", hedged)
+        return out
+
+    primary = asyncio.ensure_future(timed(False))
+    pending = {primary}
+    try:
+        if delay is not None and delay < timeout:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done and hedge.try_hedge():
+                pending.add(asyncio.ensure_future(timed(True)))
+        error: Optional[BaseException] = None
+        while pending:
+            remaining = timeout - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    if t is not primary:
+                        hedge.won()
+                    return t.result()
+                error = t.exception()
+        if error is not None and not pending:
+            hist.record_error()
+            raise error
+        hist.record_timeout()
+        raise LLMDeadlineExceeded(f"{workflow} on {model}: no response within {timeout:.1f}s")
+    finally:
+        for t in pending:
+            t.cancel()
+
+
+def invoke(workflow: str, prompt, inputs: Dict[str, Any], output_parser=None, verbose: bool = False,
+           json_schema: Optional[Dict[str, Any]] = None) -> Any:
+    """Run `prompt` on the workflow's route and return the chain's "text" output."""
+    attempts = _attempts(workflow)
+    deadline = time.monotonic() + _deadline(attempts[0][1])
+    for i, (model, r) in enumerate(attempts):
+        timeout = min(r.budget_s, deadline - time.monotonic())
+        if timeout <= 0:
+            raise LLMDeadlineExceeded(f"{workflow}: deadline passed before trying {model}")
+        chain = _chain(prompt, model, r, output_parser, verbose, json_schema)
+        try:
+            out = _breaker(model).call(_attempt, workflow, model, r, timeout,
+                                       lambda usage: chain.invoke(inputs, config={"callbacks": [usage]})["text"])
+        except Exception as e:
+            if i + 1 == len(attempts):
+                raise
+            _log_fallback(workflow, model, e, attempts[i + 1][0])
+            continue
+        _record(workflow, model, r.temperature)
+        return out
+
+
+async def ainvoke(workflow: str, prompt, inputs: Dict[str, Any], output_parser=None, verbose: bool = False,
+                  json_schema: Optional[Dict[str, Any]] = None) -> Any:
+    """Async twin of `invoke`."""
+    attempts = _attempts(workflow)
+    deadline = time.monotonic() + _deadline(attempts[0][1])
+    for i, (model, r) in enumerate(attempts):
+        timeout = min(r.budget_s, deadline - time.monotonic())
+        if timeout <= 0:
+            raise LLMDeadlineExceeded(f"{workflow}: deadline passed before trying {model}")
+        chain = _chain(prompt, model, r, output_parser, verbose, json_schema)
+
+        async def call(usage):
+            return (await chain.ainvoke(inputs, config={"callbacks": [usage]}))["text"]
+        try:
+            out = await _breaker(model).acall(_aattempt, workflow, model, r, timeout, call)
+        except Exception as e:
+            if i + 1 == len(attempts):
+                raise
+            _log_fallback(workflow, model, e, attempts[i + 1][0])
+            continue
+        _record(workflow, model, r.temperature)
+        return out
+
+
+def stats() -> Dict[str, Any]:
+    """Per-workflow route, latency histogram per model, and hedging counters."""
+    out: Dict[str, Any] = {}
+    for workflow, r in ROUTES.items():
+        out[workflow] = {
+            "route": {**asdict(r), "deadline_s": _deadline(r)},
+            "latency": {m: h.snapshot() for (w, m), h in list(_latency.items()) if w == workflow},
+            "hedging": _hedges[workflow].snapshot(),
+        }
+    return out
+
+
+def breakers() -> Dict[str, Dict[str, Any]]:
+    """Circuit breaker state per model (see circuit_breaker.CircuitBreaker.snapshot)."""
+    return {m: b.snapshot() for m, b in list(_breakers.items())}
@@ -4,23 +4,19 @@ Prompt for MEAL-PREFERENCE SUMMARIZATION.
 Variables
 ---------
 {existing_summary} – str (may be empty the first time)
-{liked_meals}      – JSON string or bullet list
-{disliked_meals}   – JSON string or bullet list
+{liked_meals}      – comma-separated meal codes rated since the last summary
+{disliked_meals}   – comma-separated meal codes rated since the last summary
 
 Output
 ------
 A concise paragraph (≤120 words) describing patterns in likes & dislikes. 
+
+The role and task are the (cacheable) system message; the user's data
+follows as the human message.
 """
-PREFERENCE_SUMMARIZATION_PROMPT = """\
+PREFERENCE_SUMMARY_SYSTEM = """\
 You are updating a user taste profile summarizing meal preferences.
 
-EXISTING SUMMARY
-{existing_summary}
-
-NEW DATA
-Liked  : {liked_meals}
-Disliked: {disliked_meals}
-
 TASK
 1. Detect themes (cuisine styles, ingredients, textures, cooking methods).
 2. Update the summary in ≤120 words, written as third-person notes. Avoid using pronouns - use "they" instead.
@@ -28,3 +24,14 @@ TASK
 
 Return ONLY the revised summary text, no JSON needed.
 """
+
+PREFERENCE_SUMMARY_USER = """\
+EXISTING SUMMARY
+{existing_summary}
+
+NEW DATA
+Liked  : {liked_meals}
+Disliked: {disliked_meals}
+"""
+
+PREFERENCE_SUMMARIZATION_PROMPT = PREFERENCE_SUMMARY_SYSTEM + "\n" + PREFERENCE_SUMMARY_USER
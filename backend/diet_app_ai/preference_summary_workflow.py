@@ -3,18 +3,15 @@ LANGCHAIN WORKFLOW · MEAL-PREFERENCE SUMMARIZATION
 Function: `update_taste_summary(data: dict) -> str`
 """
 from typing import Dict
-from langchain import LLMChain
-from langchain.prompts import PromptTemplate
-from langchain.llms import LlamaCpp
-from preference_summary_prompt import PREFERENCE_SUMMARIZATION_PROMPT
-from initial_meal_generation_workflow import get_llm
+from initial_meal_generation_workflow import model_routing
+import prompt_templates
 
-_PROMPT = PromptTemplate(
-    template=PREFERENCE_SUMMARIZATION_PROMPT,
-    input_variables=["existing_summary", "liked_meals", "disliked_meals"],
-)
+# inputs: existing_summary, liked_meals, disliked_meals
+_PROMPT = prompt_templates.PROMPTS["taste_summary"]
 
 
 def update_taste_summary(data: Dict[str, str]) -> str:
-    chain = LLMChain(llm=get_llm(), prompt=_PROMPT)
-    return chain.run(data).strip()
+    return model_routing.invoke("taste_summary", _PROMPT, data).strip()
+
+async def aupdate_taste_summary(data: Dict[str, str]) -> str:
+    return (await model_routing.ainvoke("taste_summary", _PROMPT, data)).strip()
@@ -0,0 +1,50 @@
+"""
+CHAT PROMPT TEMPLATES · compiled once at import
+
+Every workflow sends two chat messages:
+
+    system   instructions + output format   identical for every user and call
+    human    the per-user context           profile, summaries, restrictions, ...
+
+With the fixed part first and byte-stable, providers that cache prompt
+prefixes (OpenAI-style prompt caching, vLLM/llama.cpp KV reuse) can skip
+re-processing it on every request; see bench_prompt_cache.py for the shared
+prefix per workflow and the measured effect.
+
+    _PROMPT = prompt_templates.PROMPTS["daily"]
+"""
+from typing import Dict, List, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from biomarker_summary_prompt import BIOMARKER_SUMMARY_SYSTEM, BIOMARKER_SUMMARY_USER
+from daily_meal_generation_prompt import DAILY_SYSTEM, DAILY_USER
+from initial_meal_generation_prompt import INITIAL_MEAL_SYSTEM, INITIAL_MEAL_USER
+from json_repair_prompt import JSON_REPAIR_SYSTEM, JSON_REPAIR_USER
+from preference_summary_prompt import PREFERENCE_SUMMARY_SYSTEM, PREFERENCE_SUMMARY_USER
+from single_meal_generation_prompt import SINGLE_MEAL_SYSTEM, SINGLE_MEAL_USER
+
+# workflow -> (system, human); keys match model_routing's workflow names
+MESSAGES: Dict[str, Tuple[str, str]] = {
+    "initial":           (INITIAL_MEAL_SYSTEM, INITIAL_MEAL_USER),
+    "daily":             (DAILY_SYSTEM, DAILY_USER),
+    "single":            (SINGLE_MEAL_SYSTEM, SINGLE_MEAL_USER),
+    "biomarker_summary": (BIOMARKER_SUMMARY_SYSTEM, BIOMARKER_SUMMARY_USER),
+    "taste_summary":     (PREFERENCE_SUMMARY_SYSTEM, PREFERENCE_SUMMARY_USER),
+    "json_repair":       (JSON_REPAIR_SYSTEM, JSON_REPAIR_USER),
+}
+
+
+def _compile(system: str, human: str) -> ChatPromptTemplate:
+    prompt = ChatPromptTemplate.from_messages([("system", system), ("human", human)])
+    # the prefix must not depend on the inputs, or it stops being cacheable
+    assert not prompt.messages[0].prompt.input_variables, "system message must be static"
+    return prompt
+
+
+PROMPTS: Dict[str, ChatPromptTemplate] = {w: _compile(s, h) for w, (s, h) in MESSAGES.items()}
+
+
+def render(workflow: str, inputs: Dict[str, str]) -> List[Tuple[str, str]]:
+    """[(role, text), ...] exactly as the model receives them."""
+    return [(m.type, m.content) for m in PROMPTS[workflow].format_messages(**inputs)]
@@ -0,0 +1,268 @@
+"""
+RESTRICTION VALIDATOR
+Function: `find_violations(meals: dict, restrictions: list) -> dict`
+
+Checks generated meals against the user's dietary restrictions with a
+keyword/lexicon matcher. Every restriction is compiled once into a single
+regex; all ingredient names of a plan are joined into one newline-separated
+buffer so each lexicon of a restriction is a single `finditer` pass over
+the whole plan, not one search per ingredient.
+
+A qualifier exempts a hit only when it sits right before the matched term
+("almond milk", "vegan cheese"), and only for the lexicon it belongs to:
+the dairy qualifiers never exempt meat or seafood.
+
+    >>> find_violations(
+    ...     {"breakfast": {"ham-omelette": {"ingredients": {"ham": "2 slices"}}}},
+    ...     ["vegetarian"],
+    ... )
+    {'ham-omelette': [('ham', 'vegetarian')]}
+    >>> meals = {slug: {"ingredients": {slug.replace("_", " "): "1"}} for slug in (
+    ...     "almond-crusted_chicken", "coconut_shrimp", "soy-glazed_salmon",
+    ...     "chicken_fried_rice", "almond_milk", "whole_milk")}
+    >>> sorted(find_violations(meals, ["vegan"]))
+    ['almond-crusted_chicken', 'chicken_fried_rice', 'coconut_shrimp', 'soy-glazed_salmon', 'whole_milk']
+    >>> sorted(find_violations(meals, ["vegetarian"]))
+    ['almond-crusted_chicken', 'chicken_fried_rice', 'coconut_shrimp', 'soy-glazed_salmon']
+    >>> milks = {"lf": {"ingredients": {"lactose-free milk": "1 cup"}},
+    ...          "oat": {"ingredients": {"oat milk": "1 cup"}}}
+    >>> find_violations(milks, ["lactose intolerant"]), sorted(find_violations(milks, ["Dairy free"]))
+    ({}, ['lf'])
+
+(python -m doctest diet_app_ai/restriction_validator.py)
+"""
+from __future__ import annotations
+
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MEAL_SECTIONS = ("breakfast", "lunch", "dinner")
+
+# ---- Lexicons ----
+_MEAT = [
+    "beef", "steak", "veal", "pork", "ham", "bacon", "prosciutto", "pancetta",
+    "salami", "pepperoni", "chorizo", "sausage", "hot dog", "lamb", "mutton",
+    "goat", "venison", "bison", "chicken", "turkey", "duck", "goose", "quail",
+    "meat", "meatball", "ground beef", "brisket", "ribs", "jerky", "gelatin",
+    "lard", "bone broth", "chicken broth", "beef broth", "chicken stock",
+    "beef stock",
+]
+_SEAFOOD = [
+    "fish", "salmon", "tuna", "cod", "tilapia", "halibut", "trout", "sardine",
+    "sardines", "anchovy", "anchovies", "mackerel", "haddock", "snapper",
+    "bass", "mahi", "swordfish", "catfish", "fish sauce", "shrimp", "prawn",
+    "prawns", "crab", "lobster", "scallop", "scallops", "clam", "clams",
+    "mussel", "mussels", "oyster", "oysters", "squid", "calamari", "octopus",
+    "seafood", "roe", "caviar",
+]
+_SHELLFISH = [
+    "shrimp", "prawn", "prawns", "crab", "lobster", "scallop", "scallops",
+    "clam", "clams", "mussel", "mussels", "oyster", "oysters", "crawfish",
+    "shellfish",
+]
+_DAIRY = [
+    "milk", "cheese", "butter", "cream", "yogurt", "yoghurt", "ghee", "whey",
+    "casein", "kefir", "ricotta", "mozzarella", "parmesan", "cheddar", "feta",
+    "brie", "gouda", "paneer", "mascarpone", "cottage cheese", "cream cheese",
+    "sour cream", "half-and-half", "buttermilk", "custard", "ice cream",
+    "creme fraiche", "crème fraîche", "labneh", "skyr", "quark",
+]
+_EGG = ["egg", "eggs", "egg white", "egg whites", "egg yolk", "mayonnaise", "mayo", "meringue"]
+_GLUTEN = [
+    "wheat", "flour", "bread", "breadcrumbs", "panko", "pasta", "spaghetti",
+    "penne", "macaroni", "noodles", "couscous", "bulgur", "farro", "barley",
+    "rye", "seitan", "semolina", "spelt", "tortilla", "pita", "naan", "bagel",
+    "croissant", "cracker", "crackers", "soy sauce", "orzo", "udon", "ramen",
+]
+_NUTS = [
+    "almond", "almonds", "walnut", "walnuts", "pecan", "pecans", "cashew",
+    "cashews", "pistachio", "pistachios", "hazelnut", "hazelnuts",
+    "macadamia", "brazil nut", "pine nut", "pine nuts", "nut", "nuts",
+    "almond butter", "nutella", "praline", "marzipan",
+]
+_PEANUT = ["peanut", "peanuts", "peanut butter", "satay"]
+_SOY = ["soy", "soya", "tofu", "tempeh", "edamame", "miso", "soy sauce", "tamari"]
+_ANIMAL_OTHER = ["honey"]
+
+# Qualifiers that make an otherwise-matching ingredient compliant when they
+# directly precede the term, e.g. "almond milk", "vegan cheese", "gluten-free pasta".
+_PLANT_QUALIFIERS = [
+    "vegan", "plant-based", "plant based", "meatless", "vegetarian",
+    "meat-free", "imitation", "mock", "beyond", "impossible",
+]
+_DAIRY_FREE_QUALIFIERS = _PLANT_QUALIFIERS + [
+    "dairy-free", "dairy free", "non-dairy",
+    "almond", "oat", "soy", "coconut", "rice", "cashew", "hemp", "peanut",
+    "cocoa", "shea",
+]
+# lactose-free milk is still milk: fine for lactose-free, not for dairy-free or vegan
+_DAIRY_QUALIFIERS = _DAIRY_FREE_QUALIFIERS + ["lactose-free", "lactose free"]
+_GLUTEN_QUALIFIERS = [
+    "gluten-free", "gluten free", "rice", "almond", "coconut", "chickpea",
+    "corn", "buckwheat", "tapioca", "cassava", "oat", "potato", "rice noodle",
+    "rice noodles", "zucchini", "zoodles",
+]
+_NUT_QUALIFIERS = ["nut-free", "nut free", "coconut", "nutmeg", "butternut", "sunflower"]
+_EGG_QUALIFIERS = _PLANT_QUALIFIERS + ["egg-free", "egg free", "eggplant", "eggplants"]
+
+# canonical restriction -> [(forbidden terms, qualifiers exempting those terms), ...]
+_Rule = List[Tuple[List[str], List[str]]]
+_RULES: Dict[str, _Rule] = {
+    "vegetarian": [(_MEAT + _SEAFOOD, _PLANT_QUALIFIERS)],
+    "vegan": [
+        (_MEAT + _SEAFOOD + _ANIMAL_OTHER, _PLANT_QUALIFIERS),
+        (_DAIRY, _DAIRY_FREE_QUALIFIERS),
+        (_EGG, _EGG_QUALIFIERS),
+    ],
+    "pescatarian": [(_MEAT, _PLANT_QUALIFIERS)],
+    "lactose-free": [(_DAIRY, _DAIRY_QUALIFIERS)],
+    "dairy-free": [(_DAIRY, _DAIRY_FREE_QUALIFIERS)],
+    "gluten-free": [(_GLUTEN, _GLUTEN_QUALIFIERS)],
+    "nut-free": [(_NUTS + _PEANUT, _NUT_QUALIFIERS)],
+    "peanut-free": [(_PEANUT, ["peanut-free", "peanut free"])],
+    "egg-free": [(_EGG, _EGG_QUALIFIERS)],
+    "shellfish-free": [(_SHELLFISH, ["imitation"])],
+    "seafood-free": [(_SEAFOOD, ["imitation"])],
+    "soy-free": [(_SOY, ["soy-free", "soy free"])],
+    "pork-free": [(["pork", "ham", "bacon", "prosciutto", "pancetta", "lard", "chorizo", "pepperoni", "salami"], _PLANT_QUALIFIERS)],
+    "beef-free": [(["beef", "steak", "veal", "brisket", "ground beef", "beef broth", "beef stock"], _PLANT_QUALIFIERS)],
+}
+
+_ALIASES = {
+    "veg": "vegetarian",
+    "veggie": "vegetarian",
+    "plant-based": "vegan",
+    "plant based": "vegan",
+    "pescetarian": "pescatarian",
+    "lactose intolerant": "lactose-free",
+    "no lactose": "lactose-free",
+    "no dairy": "dairy-free",
+    "no gluten": "gluten-free",
+    "celiac": "gluten-free",
+    "coeliac": "gluten-free",
+    "no nuts": "nut-free",
+    "tree-nut-free": "nut-free",
+    "tree nut free": "nut-free",
+    "no peanuts": "peanut-free",
+    "no eggs": "egg-free",
+    "no shellfish": "shellfish-free",
+    "no seafood": "seafood-free",
+    "no fish": "seafood-free",
+    "no soy": "soy-free",
+    "no pork": "pork-free",
+    "halal": "pork-free",
+    "kosher": "pork-free",
+    "no beef": "beef-free",
+}
+
+
+def _terms_pattern(terms: Iterable[str]) -> str:
+    # longest first so "cream cheese" wins over "cream"
+    uniq = sorted({t.lower() for t in terms if t}, key=len, reverse=True)
+    return "|".join(re.escape(t) for t in uniq)
+
+
+def normalize_restriction(raw: str) -> str:
+    """Lower-case, collapse whitespace and map aliases to a canonical key."""
+    key = " ".join((raw or "").lower().replace("_", " ").split())
+    key = _ALIASES.get(key, key)
+    if key.endswith(" free") and not key.endswith("-free"):
+        key = key[: -len(" free")] + "-free"
+    return _ALIASES.get(key, key)
+
+
+_Compiled = List[Tuple["re.Pattern[str]", Optional["re.Pattern[str]"]]]
+
+
+@lru_cache(maxsize=256)
+def _compile(restriction: str) -> Optional[_Compiled]:
+    """
+    Return [(forbidden, exempt), ...] patterns, one pair per lexicon, for a
+    canonical restriction. `exempt` matches a qualifier at the end of the
+    text before a hit. Unknown "no X" / "X-free" restrictions fall back to
+    matching X itself.
+    """
+    if restriction in _RULES:
+        lexicons = _RULES[restriction]
+    else:
+        term = ""
+        if restriction.startswith("no "):
+            term = restriction[3:]
+        elif restriction.endswith("-free"):
+            term = restriction[: -len("-free")]
+        term = term.strip()
+        if not term:
+            return None
+        # "no mushrooms" should also catch "mushroom"
+        terms = [term, term[:-1]] if term.endswith("s") and len(term) > 3 else [term]
+        lexicons = [(terms, [f"{term}-free", f"{term} free"])]
+
+    return [(re.compile(r"(?<![\w-])(?:%s)(?:es|s)?(?![\w-])" % _terms_pattern(terms)),
+             re.compile(r"(?<![\w-])(?:%s)[\s-]+\Z" % _terms_pattern(qualifiers)) if qualifiers else None)
+            for terms, qualifiers in lexicons]
+
+
+def iter_meals(meals: dict):
+    """Yield (section, slug, meta) for both sectioned (daily) and flat (initial) plans."""
+    if not isinstance(meals, dict):
+        return
+    if any(k in meals for k in MEAL_SECTIONS):
+        for section in MEAL_SECTIONS:
+            for slug, meta in (meals.get(section) or {}).items():
+                if isinstance(meta, dict):
+                    yield section, slug, meta
+        return
+    for slug, meta in meals.items():
+        if isinstance(meta, dict):
+            yield None, slug, meta
+
+
+def find_violations(meals: dict, restrictions: Iterable[str]) -> Dict[str, List[Tuple[str, str]]]:
+    """
+    Return {slug: [(ingredient, restriction), ...]} for every meal that
+    contains a forbidden ingredient. Meals without violations are omitted.
+    """
+    rules = []
+    for r in restrictions or []:
+        canon = normalize_restriction(r)
+        compiled = _compile(canon) if canon else None
+        if compiled:
+            rules.append((r.strip(), compiled))
+    if not rules:
+        return {}
+
+    # Flatten every ingredient in the plan into one buffer.
+    owners: List[str] = []
+    names: List[str] = []
+    for _section, slug, meta in iter_meals(meals):
+        for ing in (meta.get("ingredients") or {}):
+            owners.append(slug)
+            names.append(str(ing).lower())
+    if not names:
+        return {}
+
+    buf = "\n".join(names)
+    starts, pos = [], 0
+    for n in names:
+        starts.append(pos)
+        pos += len(n) + 1
+
+    flagged: Dict[int, List[str]] = {}
+    for label, lexicons in rules:
+        for forbidden, exempt in lexicons:
+            for m in forbidden.finditer(buf):
+                i = bisect_right(starts, m.start()) - 1
+                # only a qualifier right before the term counts: "almond milk", not "almond-crusted chicken"
+                if exempt is not None and exempt.search(buf, starts[i], m.start()):
+                    continue
+                hits = flagged.setdefault(i, [])
+                if label not in hits:
+                    hits.append(label)
+
+    out: Dict[str, List[Tuple[str, str]]] = {}
+    for i in sorted(flagged):
+        for label in flagged[i]:
+            out.setdefault(owners[i], []).append((names[i], label))
+    return out
@@ -0,0 +1,38 @@
+# single_meal_generation_prompt.py
+# The system message (instructions + output format) is identical for every
+# request, so providers can cache it as a prompt prefix; the meal type and
+# everything else request-specific lives in SINGLE_MEAL_USER.
+SINGLE_MEAL_INSTRUCTIONS = """You are a meal-planning model. Generate exactly ONE meal of the requested meal type as JSON only.
+The single top-level key is a short, hyphen-separated slug.
+The meal must include:
+- long_name: a human-friendly title
+- description: 1–2 short sentences
+- ingredients: object of {{item: amount_string}}
+- instructions: single string with numbered or newline-separated steps
+Hard requirements:
+- Rigorously honor the user's dietary restrictions. Vegetarian means VEGETARIAN MEALS.
+- Do NOT use any of the ingredients listed under "Avoid".
+- Do NOT reuse any of the slugs listed under "Already suggested".
+Return ONLY valid JSON, no markdown fences, no commentary."""
+
+SINGLE_MEAL_OUTPUT_FORMAT = """Output format example:
+{{
+  "slug": {{
+    "long_name": "...",
+    "description": "...",
+    "ingredients": {{ "ingredient": "amount", ... }},
+    "instructions": "1) ...\\n2) ..."
+  }}
+}}"""
+
+SINGLE_MEAL_SYSTEM = SINGLE_MEAL_INSTRUCTIONS + "\n\n" + SINGLE_MEAL_OUTPUT_FORMAT
+
+SINGLE_MEAL_USER = """Context:
+- Meal type: {meal_type}
+- Biomarker summary: {biomarker_summary}
+- Taste preferences: {taste_summary}
+- Dietary restrictions: {dietary_restrictions}
+- Avoid: {avoid_ingredients}
+- Already suggested: {existing_slugs}"""
+
+SINGLE_MEAL_GENERATION_PROMPT = SINGLE_MEAL_SYSTEM + "\n\n" + SINGLE_MEAL_USER
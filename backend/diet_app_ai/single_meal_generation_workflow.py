@@ -0,0 +1,189 @@
+"""
+LANGCHAIN WORKFLOW · SINGLE MEAL GENERATION
+Functions:
+    `generate_single_meal(context: dict) -> dict`
+    `enforce_restrictions(meals: dict, restrictions: list, context: dict) -> dict`
+    (plus `agenerate_single_meal` / `aenforce_restrictions` async twins)
+
+Used to replace individual meals (restriction violations, user swaps)
+without paying for a full plan re-generation.
+"""
+import asyncio
+from typing import Dict, Any, List, Optional, Tuple
+from initial_meal_generation_workflow import meal_schema
+from restriction_validator import find_violations, iter_meals
+
+class RestrictionUnmetError(ValueError):
+    """Meals that still break a restriction after every regeneration attempt."""
+
+    def __init__(self, violations: Dict[str, List[Tuple[str, str]]]):
+        super().__init__("no compliant replacement for " + ", ".join(sorted(violations)))
+        self.violations = violations   # {slug: [(ingredient, restriction), ...]}
+
+
+def _single_inputs(context: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        "meal_type":            context.get("meal_type") or "meal",
+        "biomarker_summary":    context.get("biomarker_summary") or "No recent biomarker data.",
+        "taste_summary":        context.get("taste_summary") or "No strong preferences recorded.",
+        "dietary_restrictions": ", ".join(context.get("dietary_restrictions") or []) or "None",
+        "avoid_ingredients":    ", ".join(context.get("avoid_ingredients") or []) or "None",
+        "existing_slugs":       ", ".join(context.get("existing_slugs") or []) or "None",
+    }
+
+
+def _single_output(out: Dict[str, Any]) -> Dict[str, Any]:
+    # validated by meal_schema: exactly one {slug: meal}
+    slug, meta = next(iter(out.items()))
+    return {slug: meta}
+
+
+def generate_single_meal(context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    context = {
+      "meal_type": "breakfast" | "lunch" | "dinner" | "meal",
+      "dietary_restrictions": [..],
+      "avoid_ingredients": [..],        # optional
+      "existing_slugs": [..],           # optional
+      "biomarker_summary": str,         # optional
+      "taste_summary": str,             # optional
+    }
+    Returns: {slug: {long_name, description, ingredients:{..}, instructions}}
+    """
+    return _single_output(meal_schema.generate("single", _single_inputs(context)))
+
+
+async def agenerate_single_meal(context: Dict[str, Any]) -> Dict[str, Any]:
+    """Async twin of `generate_single_meal`."""
+    return _single_output(await meal_schema.agenerate("single", _single_inputs(context)))
+
+
+def _unique_slug(slug: str, taken: set) -> str:
+    base, n = slug, 2
+    while slug in taken:
+        slug = f"{base}-{n}"
+        n += 1
+    return slug
+
+
+def _violating(meals: Dict[str, Any], restrictions: List[str]):
+    """Return (violations, [(section, slug, avoid), ...]) in plan order."""
+    violations = find_violations(meals, restrictions)
+    todo = [
+        (section, slug, sorted({ing for ing, _r in violations[slug]}))
+        for section, slug, _meta in iter_meals(meals) if slug in violations
+    ]
+    return violations, todo
+
+
+def _request(context, section, restrictions, avoid, taken) -> Dict[str, Any]:
+    return {
+        **context,
+        "meal_type":            section or "meal",
+        "dietary_restrictions": restrictions,
+        "avoid_ingredients":    avoid,
+        "existing_slugs":       sorted(taken),
+    }
+
+
+def _check(candidate, restrictions, avoid):
+    """Return (compliant (slug, meta) or None, widened avoid list)."""
+    problems = find_violations(candidate, restrictions)
+    if not problems:
+        return next(iter(candidate.items())), avoid
+    return None, sorted(set(avoid) | {ing for hits in problems.values() for ing, _r in hits})
+
+
+def _merge(meals: Dict[str, Any], replacements: Dict[str, Optional[tuple]], violations) -> Dict[str, Any]:
+    unmet = {slug: violations[slug] for slug, r in replacements.items() if r is None}
+    if unmet:
+        print(f"[restrictions] no compliant replacement for {', '.join(sorted(unmet))}")
+        raise RestrictionUnmetError(unmet)
+    taken = {slug for _s, slug, _m in iter_meals(meals) if slug not in replacements}
+
+    def _merge_section(section_meals: Dict[str, Any]) -> Dict[str, Any]:
+        merged = {}
+        for slug, meta in section_meals.items():
+            if slug not in replacements:
+                merged[slug] = meta
+                continue
+            new_slug, new_meta = replacements[slug]
+            new_slug = _unique_slug(new_slug, taken)
+            taken.add(new_slug)
+            merged[new_slug] = new_meta
+        return merged
+
+    if any(s for s, _slug, _m in iter_meals(meals)):
+        return {k: (_merge_section(v) if isinstance(v, dict) else v) for k, v in meals.items()}
+    return _merge_section(meals)
+
+
+def enforce_restrictions(
+    meals: Dict[str, Any],
+    restrictions: List[str],
+    context: Optional[Dict[str, Any]] = None,
+    max_attempts: int = 3,
+) -> Dict[str, Any]:
+    """
+    Validate a generated plan (flat initial dict or sectioned daily dict)
+    and regenerate ONLY the meals that break a restriction. Replacements are
+    merged back in place, keeping the plan's order and size. If a meal still
+    violates after `max_attempts` regenerations, RestrictionUnmetError is
+    raised rather than serving it or shrinking the plan. An open breaker or
+    a deadline (ConnectionError / TimeoutError) propagates as is.
+    """
+    violations, todo = _violating(meals, restrictions)
+    if not todo:
+        return meals
+
+    context = context or {}
+    taken = {slug for _s, slug, _m in iter_meals(meals)}
+    replacements: Dict[str, Optional[tuple]] = {}
+    for section, slug, avoid in todo:
+        replacement = None
+        for _ in range(max_attempts):
+            try:
+                candidate = generate_single_meal(_request(context, section, restrictions, avoid, taken))
+            except (ConnectionError, TimeoutError):
+                raise
+            except Exception as e:
+                print(f"[restrictions] regeneration failed for {slug}: {e}")
+                continue
+            replacement, avoid = _check(candidate, restrictions, avoid)
+            if replacement:
+                taken.add(replacement[0])
+                break
+        replacements[slug] = replacement
+    return _merge(meals, replacements, violations)
+
+
+async def aenforce_restrictions(
+    meals: Dict[str, Any],
+    restrictions: List[str],
+    context: Optional[Dict[str, Any]] = None,
+    max_attempts: int = 3,
+) -> Dict[str, Any]:
+    """Async twin of `enforce_restrictions`; violating meals are regenerated concurrently."""
+    violations, todo = _violating(meals, restrictions)
+    if not todo:
+        return meals
+
+    context = context or {}
+    taken = {slug for _s, slug, _m in iter_meals(meals)}
+
+    async def _replace(section, slug, avoid):
+        for _ in range(max_attempts):
+            try:
+                candidate = await agenerate_single_meal(_request(context, section, restrictions, avoid, taken))
+            except (ConnectionError, TimeoutError):
+                raise
+            except Exception as e:
+                print(f"[restrictions] regeneration failed for {slug}: {e}")
+                continue
+            replacement, avoid = _check(candidate, restrictions, avoid)
+            if replacement:
+                return replacement
+        return None
+
+    results = await asyncio.gather(*(_replace(*item) for item in todo))
+    return _merge(meals, {slug: r for (_s, slug, _a), r in zip(todo, results)}, violations)
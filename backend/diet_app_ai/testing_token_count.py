@@ -106,7 +106,7 @@ def repeat_daily_generation (user_profile: dict, NUM_DAYS: int,
             biomarker_payload = {
                 "existing_summary": existing_summary,
                 "biomarker_journal": biomarker_journal if len(biomarker_journal) == 0 else "No biomarker data yet.",
-                "meals_last_period": json.dumps(meals_last_period) if len(meals_last_period) == 0 else "No meals eaten yet.",
+                "ingredient_stats": "No ingredient shows a consistent pattern yet.",
             }
 
             biomarker_summary = update_biomarker_summary(biomarker_payload)
@@ -0,0 +1,117 @@
+# backend/history_index.py
+"""
+Per-user history of generated meals and meal feedback, for the paginated
+/history/meals and /history/feedback endpoints.
+
+For every user the index keeps, in sheet-row order, one entry per meal (the
+run of MealIngredients rows of one date and MealCode collapses into the
+entry of its first row) and one per UserMealPreferences row, with parallel
+lists of row numbers and dates. Rows are appended in date order, so both
+lists are sorted and a page is two binary searches and a slice:
+O(log n + page size), whatever the length of the history.
+
+Pages run newest first. The cursor is the row of the last entry returned,
+wrapped so clients treat it as opaque; the next page holds the entries
+before that row.
+"""
+from __future__ import annotations
+
+import base64
+import bisect
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from tab_index import TabIndex, Col
+
+MEALS_TAB = "MealIngredients"
+FEEDBACK_TAB = "UserMealPreferences"
+KINDS = {MEALS_TAB: "meals", FEEDBACK_TAB: "feedback"}
+
+
+@dataclass
+class _History:
+    rows: List[int] = field(default_factory=list)
+    dates: List[str] = field(default_factory=list)
+    items: List[Dict[str, Any]] = field(default_factory=list)
+
+    def add(self, row: int, date: str, item: Dict[str, Any]) -> None:
+        if self.rows and row < self.rows[-1]:  # another worker's write, applied late (tab_index.sync)
+            i = bisect.bisect_left(self.rows, row)
+        else:
+            i = len(self.rows)
+        self.rows.insert(i, row)
+        self.dates.insert(i, date)
+        self.items.insert(i, item)
+
+
+def encode_cursor(kind: str, row: int) -> str:
+    return base64.urlsafe_b64encode(f"{kind}:{row}".encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(kind: str, cursor: str) -> int:
+    """Row inside the cursor; ValueError when it is not a cursor of this kind."""
+    try:
+        text = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("malformed cursor")
+    prefix, _, row = text.partition(":")
+    if prefix != kind or not row.isdigit():
+        raise ValueError("malformed cursor")
+    return int(row)
+
+
+class HistoryIndex(TabIndex):
+    TABS = (MEALS_TAB, FEEDBACK_TAB)
+
+    def _reset(self) -> None:
+        self._by_user: Dict[str, Dict[str, _History]] = {t: {} for t in self.TABS}
+        # username -> (last MealIngredients row, (date, type, code)) to collapse a meal's rows
+        self._last_meal: Dict[str, Tuple[int, Tuple[str, str, str]]] = {}
+
+    def _apply(self, tab: str, col: Col, first_row: int, rows: List[List[Any]]) -> None:
+        by_user = self._by_user[tab]
+        for offset, r in enumerate(rows):
+            username, date = col(r, "Username"), col(r, "Date")
+            if not username or not date:
+                continue
+            row = first_row + offset
+            if tab == MEALS_TAB:
+                key = (date, col(r, "MealType"), col(r, "MealCode"))
+                last = self._last_meal.get(username)
+                if last is not None and last[0] == row - 1 and last[1] == key:
+                    self._last_meal[username] = (row, key)
+                    continue
+                self._last_meal[username] = (row, key)
+                item = {"date": date, "meal_type": key[1], "meal_code": key[2],
+                        "description": col(r, "Description")}
+            else:
+                item = {"date": date, "meal_code": col(r, "MealCode"),
+                        "like": col(r, "Like").upper() == "TRUE",
+                        "initial": col(r, "Initial").upper() == "TRUE"}
+            by_user.setdefault(username, _History()).add(row, date, item)
+
+    def page(self, username: str, tab: str, limit: int, cursor: Optional[str] = None,
+             since: Optional[str] = None, until: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Up to `limit` entries (newest first) dated since..until (inclusive,
+        YYYY-MM-DD) and before `cursor`, plus the cursor of the next page
+        (None on the last one). Raises ValueError for a bad cursor.
+        """
+        kind = KINDS[tab]
+        before = decode_cursor(kind, cursor) if cursor else None
+        self.ensure_built()
+        with self._lock:
+            h = self._by_user[tab].get(username)
+            if h is None:
+                return {"items": [], "next_cursor": None}
+            hi = len(h.rows) if before is None else bisect.bisect_left(h.rows, before)
+            if until:
+                hi = min(hi, bisect.bisect_right(h.dates, until))
+            lo = bisect.bisect_left(h.dates, since) if since else 0
+            start = max(lo, hi - limit)
+            items = [dict(item) for item in reversed(h.items[start:hi])]
+            next_cursor = encode_cursor(kind, h.rows[start]) if start > lo else None
+        return {"items": items, "next_cursor": next_cursor}
+
+
+HISTORY = HistoryIndex()
@@ -0,0 +1,97 @@
+# backend/http_cache.py
+"""
+Conditional GET and response compression for the read endpoints.
+
+`@conditional` tags a view's 200 response with a weak ETag built from the
+user's data version stamp (data_versions.py) plus the endpoint and its
+inputs. A request whose `If-None-Match` already holds that tag gets an
+empty 304 before the view runs, i.e. without any Sheets read.
+
+`compress` (registered as an after_request hook) gzips JSON bodies larger
+than COMPRESS_MIN_BYTES, or brotli-compresses them when the optional
+`brotli` package is installed and the client accepts `br`.
+"""
+from __future__ import annotations
+
+import functools
+import gzip
+import hashlib
+import json
+import os
+
+from flask import current_app, g, request
+
+import data_versions
+
+try:
+    import brotli  # optional
+except ImportError:  # pragma: no cover - depends on the deployment
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "5"))
+
+
+def _username(body: dict) -> str:
+    """Same resolution as routes._extract_username; "" when the view must decide (403/400)."""
+    claimed = ""
+    for k in ("Username", "username", "user", "name"):
+        v = body.get(k)
+        if isinstance(v, str) and v.strip():
+            claimed = v.strip()
+            break
+    claimed = claimed or (request.args.get("Username") or request.args.get("username") or "").strip()
+    token_user = g.get("username")
+    if token_user:
+        return token_user if claimed in ("", token_user) else ""
+    return claimed
+
+
+def etag_for(username: str, endpoint: str, body: dict, args: dict) -> str:
+    inputs = hashlib.sha256(
+        json.dumps([endpoint, body, args], sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()[:16]
+    return f"{data_versions.stamp(username)}.{inputs}"
+
+
+def conditional(view):
+    """ETag / 304 for a read-only view whose output depends only on the user's data and its inputs."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        body = request.get_json(force=True, silent=True)
+        body = body if isinstance(body, dict) else {}
+        username = _username(body)
+        if not username:
+            return view(*args, **kwargs)
+
+        tag = etag_for(username, request.endpoint, body, request.args.to_dict(flat=False))
+        if request.if_none_match.contains_weak(tag):
+            resp = current_app.response_class(status=304)
+        else:
+            resp = current_app.make_response(view(*args, **kwargs))
+            if resp.status_code != 200:
+                return resp
+        resp.set_etag(tag, weak=True)
+        # the browser may keep it, but must revalidate every time
+        resp.headers["Cache-Control"] = "private, no-cache"
+        return resp
+    return wrapper
+
+
+def compress(resp):
+    if (resp.status_code != 200 or resp.direct_passthrough or resp.mimetype != "application/json"
+            or "Content-Encoding" in resp.headers):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    data = resp.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return resp
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        resp.set_data(brotli.compress(data, quality=BROTLI_QUALITY))
+        resp.headers["Content-Encoding"] = "br"
+    elif accepted["gzip"]:
+        resp.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+        resp.headers["Content-Encoding"] = "gzip"
+    return resp
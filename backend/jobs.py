@@ -0,0 +1,412 @@
+# backend/jobs.py
+"""
+Opt-in background job mode for the long-running generation endpoints.
+
+A client asks for job mode with `Prefer: respond-async` (or `?mode=job`,
+or `"Job": true` in the body). The view then answers `202` right away with
+a job id, and the real work runs later on a bounded worker pool:
+
+    POST /meals/daily  {"Username": "alice"}   Prefer: respond-async
+    -> 202 {"job_id": "...", "status": "queued", "status_url": "/jobs/<id>"}
+    GET  /jobs/<id>
+    -> {"status": "done", "http_status": 200, "result": {...}, ...}
+
+Jobs are stored in a local SQLite queue (local_store), so queued work
+survives a restart and every worker on the host shares it. A worker runs a
+job by replaying the original request through the app's full dispatch
+(before/after_request hooks, error handlers), authenticated as the token
+user who submitted it. A
+submission identical to a queued, running or recently finished job returns
+that job instead of creating a new one.
+
+The queue starts with the app (start(app) in app.py). A claimed job carries
+its worker's identity and a lease the worker renews every JOB_LEASE_S / 3;
+a 'running' job whose worker has exited, or whose lease has lapsed, goes
+back on the queue, at startup and then on every renewal.
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import os
+import socket
+import statistics
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from flask import current_app, g, jsonify, request
+
+import local_store
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+JOB_MAX_QUEUED = int(os.environ.get("JOB_MAX_QUEUED", "200"))
+JOB_DEDUP_TTL_S = float(os.environ.get("JOB_DEDUP_TTL_S", "60"))
+JOB_POLL_S = float(os.environ.get("JOB_POLL_S", "1.0"))
+JOB_LEASE_S = float(os.environ.get("JOB_LEASE_S", "30"))
+
+_ENVIRON_FLAG = "diet_app.job_id"
+_ENVIRON_USER = "diet_app.job_user"
+_HOST = socket.gethostname()
+OWNER = f"{_HOST}:{os.getpid()}:{uuid.uuid4().hex[:8]}"   # this process, on claimed jobs
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    dedup_key   TEXT NOT NULL,
+    endpoint    TEXT NOT NULL,
+    path        TEXT NOT NULL,
+    body        TEXT NOT NULL,
+    query       TEXT NOT NULL,
+    status      TEXT NOT NULL,          -- queued | running | done | failed
+    http_status INTEGER,
+    result      TEXT,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL,
+    username    TEXT,                   -- who submitted it, for GET /jobs/<id>
+    owner       TEXT,                   -- OWNER of the worker running it
+    lease_until REAL,
+    auth_user   TEXT                    -- token user it was submitted under; the replay runs as them
+);
+CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, created_at);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+
+# columns added after the first release; ALTERed into older job databases
+_ADDED_COLUMNS = {"username": "TEXT", "owner": "TEXT", "lease_until": "REAL", "auth_user": "TEXT"}
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
+def _db():
+    global _schema_ready
+    conn = local_store.connect("jobs")
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                conn.executescript(_SCHEMA)
+                have = {r["name"] for r in conn.execute("PRAGMA table_info(jobs)")}
+                for name, kind in _ADDED_COLUMNS.items():
+                    if name not in have:
+                        conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+                _schema_ready = True
+    return conn
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """Whether the process that claimed a job may still be running it (see OWNER)."""
+    if not owner:
+        return False   # claimed before owners were recorded
+    host, _, rest = owner.partition(":")
+    pid, _, _token = rest.partition(":")
+    if host != _HOST or not pid.isdigit():
+        return True    # another host's process: only its lease tells
+    if int(pid) == os.getpid():
+        return owner == OWNER   # same pid, earlier process (e.g. a restarted container)
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _public(row) -> Dict[str, Any]:
+    out: Dict[str, Any] = {
+        "job_id": row["id"],
+        "endpoint": row["path"],
+        "status": row["status"],
+        "status_url": f"/jobs/{row['id']}",
+        "created_at": row["created_at"],
+    }
+    if row["started_at"]:
+        out["queue_wait_s"] = round(row["started_at"] - row["created_at"], 3)
+    if row["finished_at"] and row["started_at"]:
+        out["service_s"] = round(row["finished_at"] - row["started_at"], 3)
+    if row["status"] in ("done", "failed"):
+        out["http_status"] = row["http_status"]
+        out["result"] = json.loads(row["result"]) if row["result"] else None
+        if row["error"]:
+            out["error"] = row["error"]
+    return out
+
+
+class JobQueue:
+    """SQLite-backed queue drained by a fixed pool of daemon threads."""
+
+    def __init__(self, app, workers: int = JOB_WORKERS):
+        self.app = app
+        self.workers = workers
+        self._wake = threading.Condition()
+        self._threads = []
+
+    def start(self) -> None:
+        self.requeue_orphans()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        t = threading.Thread(target=self._renew_loop, name="job-lease", daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    # ---- leases ----
+    def requeue_orphans(self) -> int:
+        """Put 'running' jobs whose worker is gone (or whose lease lapsed) back on the queue."""
+        db = _db()
+        now = time.time()
+        n = 0
+        for row in db.execute("SELECT id, owner, lease_until FROM jobs WHERE status='running'").fetchall():
+            if _owner_alive(row["owner"]) and (row["lease_until"] or 0) >= now:
+                continue
+            n += db.execute(
+                "UPDATE jobs SET status='queued', started_at=NULL, owner=NULL, lease_until=NULL "
+                "WHERE id=? AND status='running' AND owner IS ?",
+                (row["id"], row["owner"]),
+            ).rowcount
+        if n:
+            print(f"[jobs] requeued {n} orphaned job(s)")
+            with self._wake:
+                self._wake.notify_all()
+        return n
+
+    def _renew_loop(self) -> None:
+        while True:
+            time.sleep(JOB_LEASE_S / 3)
+            try:
+                _db().execute("UPDATE jobs SET lease_until=? WHERE status='running' AND owner=?",
+                              (time.time() + JOB_LEASE_S, OWNER))
+                self.requeue_orphans()
+            except Exception as e:  # keep renewing; a missed beat costs at most a rerun
+                print(f"[jobs] lease renewal failed: {e}")
+
+    # ---- submit ----
+    def submit(self, endpoint: str, path: str, body: dict, query: dict,
+               username: Optional[str] = None, auth_user: Optional[str] = None) -> tuple[Dict[str, Any], bool]:
+        """Return (job, created). Duplicates of a live/recent job return that job."""
+        key = hashlib.sha256(
+            json.dumps([endpoint, body, query, auth_user], sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        now = time.time()
+        db = _db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT * FROM jobs WHERE dedup_key=? AND (status IN ('queued','running') "
+                "OR (status='done' AND finished_at > ?)) ORDER BY created_at DESC LIMIT 1",
+                (key, now - JOB_DEDUP_TTL_S),
+            ).fetchone()
+            if row is not None:
+                db.execute("COMMIT")
+                return _public(row), False
+            depth = db.execute("SELECT COUNT(*) FROM jobs WHERE status='queued'").fetchone()[0]
+            if depth >= JOB_MAX_QUEUED:
+                db.execute("ROLLBACK")
+                raise OverflowError(f"job queue is full ({depth} queued)")
+            job_id = uuid.uuid4().hex
+            db.execute(
+                "INSERT INTO jobs (id, dedup_key, endpoint, path, body, query, status, created_at, username, auth_user) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, key, endpoint, path, json.dumps(body), json.dumps(query), now,
+                 username or None, auth_user or None),
+            )
+            db.execute("COMMIT")
+        except Exception:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            raise
+        with self._wake:
+            self._wake.notify()
+        return get(job_id), True
+
+    # ---- workers ----
+    def _claim(self) -> Optional[Any]:
+        db = _db()
+        row = db.execute(
+            "SELECT id FROM jobs WHERE status='queued' ORDER BY created_at LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        claimed = db.execute(
+            "UPDATE jobs SET status='running', started_at=?, owner=?, lease_until=? WHERE id=? AND status='queued'",
+            (now, OWNER, now + JOB_LEASE_S, row["id"]),
+        ).rowcount
+        # another worker (thread or process) may have won the race
+        return db.execute("SELECT * FROM jobs WHERE id=?", (row["id"],)).fetchone() if claimed else None
+
+    def _loop(self) -> None:
+        while True:
+            job = self._claim()
+            if job is None:
+                with self._wake:
+                    self._wake.wait(JOB_POLL_S)
+                continue
+            self._run(job)
+
+    def _run(self, job) -> None:
+        status, result, error = 500, None, None
+        try:
+            with self.app.test_request_context(
+                job["path"], method="POST",
+                json=json.loads(job["body"]),
+                query_string=json.loads(job["query"]),
+                environ_overrides={_ENVIRON_FLAG: job["id"], _ENVIRON_USER: job["auth_user"]},
+            ):
+                # the same pipeline as a live request: auth, attribution, error handlers
+                resp = self.app.full_dispatch_request()
+                status = resp.status_code
+                result = resp.get_data(as_text=True)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            result = json.dumps({"error": error})
+        if result:
+            try:
+                json.loads(result)
+            except ValueError:
+                result = json.dumps(result)
+        _db().execute(
+            "UPDATE jobs SET status=?, http_status=?, result=?, error=?, finished_at=? WHERE id=?",
+            ("done" if status < 400 else "failed", status, result, error, time.time(), job["id"]),
+        )
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def start(app) -> JobQueue:
+    """Start this process's workers (once), resuming the jobs left queued or orphaned."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(app)
+            _queue.start()
+    return _queue
+
+
+def _get_queue() -> JobQueue:
+    # app.py starts the queue at boot; this covers apps built without it
+    return _queue or start(current_app._get_current_object())
+
+
+def get(job_id: str, username: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """The job, or None; with `username`, None too when someone else submitted it."""
+    row = _db().execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+    if row is None or (username and row["username"] != username):
+        return None
+    return _public(row)
+
+
+def metrics(last_n: int = 1000) -> Dict[str, Any]:
+    """Queue depth plus queue-wait and service-time stats over the last N finished jobs."""
+    db = _db()
+    counts = {r["status"]: r["n"] for r in db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+    rows = db.execute(
+        "SELECT endpoint, started_at - created_at AS wait, finished_at - started_at AS service "
+        "FROM jobs WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT ?",
+        (last_n,),
+    ).fetchall()
+
+    def _stats(xs):
+        xs = sorted(x for x in xs if x is not None)
+        if not xs:
+            return {"count": 0}
+        q = statistics.quantiles(xs, n=100) if len(xs) > 1 else xs * 99
+        return {"count": len(xs), "mean": round(statistics.fmean(xs), 3),
+                "p50": round(q[49], 3), "p95": round(q[94], 3), "max": round(xs[-1], 3)}
+
+    by_endpoint: Dict[str, Dict[str, list]] = {}
+    for r in rows:
+        e = by_endpoint.setdefault(r["endpoint"], {"wait": [], "service": []})
+        e["wait"].append(r["wait"]); e["service"].append(r["service"])
+
+    return {
+        "counts": counts,
+        "workers": JOB_WORKERS,
+        "queue_wait_s": _stats([r["wait"] for r in rows]),
+        "service_s": _stats([r["service"] for r in rows]),
+        "by_endpoint": {
+            ep: {"queue_wait_s": _stats(v["wait"]), "service_s": _stats(v["service"])}
+            for ep, v in by_endpoint.items()
+        },
+    }
+
+
+def in_job() -> bool:
+    """True while a worker is replaying a queued request."""
+    return bool(request.environ.get(_ENVIRON_FLAG))
+
+
+def job_user() -> Optional[str]:
+    """The token user the replayed job was submitted under (None if it was submitted without one)."""
+    return request.environ.get(_ENVIRON_USER) or None
+
+
+def wants_job(headers, args, body: dict) -> bool:
+    """Whether a request opted into job mode (works on Flask and Quart requests alike)."""
+    if "respond-async" in (headers.get("Prefer") or "").lower():
+        return True
+    if (args.get("mode") or "").lower() == "job":
+        return True
+    return body.get("Job") is True or str(body.get("Job", "")).lower() == "true"
+
+
+def _claimed(body: dict, query: dict) -> str:
+    # same lookup as routes._claimed_username, on the stored request
+    for k in ("Username", "username", "user", "name"):
+        v = body.get(k)
+        if isinstance(v, str) and v.strip():
+            return v.strip()
+    return (query.get("Username") or query.get("username") or "").strip()
+
+
+def enqueue(endpoint: str, path: str, body: dict, args, username: Optional[str]):
+    """
+    Queue a request for the Flask view `endpoint`; returns (body, status, headers)
+    for the 202 (the 403 for another user's Username, as the view would
+    answer, or the 503 when the queue is full). `username` is the token
+    user, if any: it is pinned into the body and recorded as the job's
+    auth_user, since the replayed request carries no Authorization header.
+    """
+    body = {k: v for k, v in body.items() if k != "Job"}
+    query = {k: v for k, v in args.items() if k != "mode"}
+    if username:
+        claimed = _claimed(body, query)
+        if claimed and claimed != username:
+            return {"error": "Username does not match session token"}, 403, {}
+        body["Username"] = username
+    try:
+        job, created = _get_queue().submit(endpoint, path, body, query,
+                                           username or _claimed(body, query), auth_user=username)
+    except OverflowError as e:
+        return {"error": str(e)}, 503, {}
+    return {**job, "deduplicated": not created}, 202, {"Location": job["status_url"]}
+
+
+def job_mode(view):
+    """
+    Let a POST view run as a background job when the client opts in.
+    Inside the worker the flag in the WSGI environ makes this a pass-through.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.environ.get(_ENVIRON_FLAG):
+            return view(*args, **kwargs)
+        body = request.get_json(force=True, silent=True)
+        body = body if isinstance(body, dict) else {}
+        if not wants_job(request.headers, request.args, body):
+            return view(*args, **kwargs)
+        payload, status, headers = enqueue(request.endpoint, request.path, body, request.args, g.get("username"))
+        resp = jsonify(payload)
+        resp.status_code = status
+        resp.headers.update(headers)
+        return resp
+    return wrapper
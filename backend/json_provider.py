@@ -0,0 +1,40 @@
+# backend/json_provider.py
+"""
+Flask/Quart JSON provider backed by diet_app_ai/json_codec.py (orjson when
+installed, stdlib otherwise).
+
+Responses are byte-identical to Flask's DefaultJSONProvider outside debug
+mode: compact separators, sorted keys, ASCII escapes and the same `default`
+for dates, UUIDs and dataclasses. Calls the fast path does not cover
+(indent, other separators, extra json.dumps kwargs) go to the stdlib
+provider unchanged.
+
+    app.json = FastJSONProvider(app)
+"""
+from __future__ import annotations
+
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+from diet_app_ai.json_codec import dumps as _dumps, loads as _loads
+
+_COMPACT = (",", ":")
+_FAST_KWARGS = {"separators", "sort_keys", "ensure_ascii", "default"}
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if (kwargs.get("separators") != _COMPACT or not kwargs.get("ensure_ascii", self.ensure_ascii)
+                or kwargs.keys() - _FAST_KWARGS):
+            return super().dumps(obj, **kwargs)
+        return _dumps(
+            obj,
+            sort_keys=kwargs.get("sort_keys", self.sort_keys),
+            default=kwargs.get("default", self.default),
+        )
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return _loads(s)
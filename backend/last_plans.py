@@ -0,0 +1,69 @@
+# backend/last_plans.py
+"""
+Each user's most recent daily plan, kept locally (local_store "plans").
+
+/meals/daily saves every plan it serves and /meals/swap patches the swapped
+meal into it. When Sheets or the model is
+unavailable (a circuit breaker is open, see diet_app_ai/circuit_breaker.py)
+it answers with the stored plan right away instead of failing, since that
+needs neither dependency.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import local_store
+from diet_app_ai import json_codec
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
+def _conn():
+    global _schema_ready
+    conn = local_store.connect("plans")
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                conn.execute("CREATE TABLE IF NOT EXISTS plans (username TEXT PRIMARY KEY, "
+                             "date TEXT NOT NULL, plan TEXT NOT NULL)")
+                _schema_ready = True
+    return conn
+
+
+def save(username: str, date: str, plan: Dict[str, Any]) -> None:
+    try:
+        _conn().execute("INSERT OR REPLACE INTO plans (username, date, plan) VALUES (?, ?, ?)",
+                        (username, date, json_codec.dumps(plan)))
+    except Exception as e:  # the fallback copy must never fail the request that produced it
+        print(f"[last_plans] save failed for {username}: {e}")
+
+
+def get(username: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """(date, plan) of the user's last served plan, or None."""
+    row = _conn().execute("SELECT date, plan FROM plans WHERE username = ?", (username,)).fetchone()
+    return (row["date"], json_codec.loads(row["plan"])) if row else None
+
+
+def swap(username: str, meal_type: str, old_code: str, meal: Dict[str, Any]) -> None:
+    """Replace `old_code` in the stored plan's `meal_type` section with `meal` ({slug: meta})."""
+    try:
+        db = _conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT plan FROM plans WHERE username = ?", (username,)).fetchone()
+            plan = json_codec.loads(row["plan"]) if row else None
+            section = plan.get(meal_type) if isinstance(plan, dict) else None
+            if isinstance(section, dict) and old_code in section:
+                # same position in the section, so the plan keeps its order
+                plan[meal_type] = {k2: v2 for k, v in section.items()
+                                   for k2, v2 in (meal.items() if k == old_code else [(k, v)])}
+                db.execute("UPDATE plans SET plan = ? WHERE username = ?", (json_codec.dumps(plan), username))
+            db.execute("COMMIT")
+        except Exception:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            raise
+    except Exception as e:  # like save(): never fail the swap over the fallback copy
+        print(f"[last_plans] swap failed for {username}: {e}")
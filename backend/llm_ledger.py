@@ -0,0 +1,209 @@
+# backend/llm_ledger.py
+"""
+Append-only ledger of every model call: who asked (endpoint, user), which
+workflow and model served it, prompt / completion / cached tokens, latency,
+outcome and cost.
+
+Records arrive from model_routing's usage listener, are buffered in memory
+and written to local_store ("ledger") in batches, every LEDGER_FLUSH_S
+seconds or LEDGER_BATCH records, whichever comes first. Nothing goes to
+Sheets. Rows are never updated or deleted.
+
+Cost uses LLM_PRICES, USD per 1M tokens per model (self-hosted models
+default to 0), and is fixed when the row is written:
+
+    LLM_PRICES='{"gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.6}}'
+
+Rollups (also GET /llm/ledger: every user with X-Admin-Token, else the
+session user's own rows):
+
+    python llm_ledger.py --by endpoint
+    python llm_ledger.py --by day --since 2026-10-01 --username alice
+"""
+from __future__ import annotations
+
+import argparse
+import atexit
+import datetime as dt
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import local_store
+
+LEDGER_BATCH = int(os.environ.get("LEDGER_BATCH", "200"))
+LEDGER_FLUSH_S = float(os.environ.get("LEDGER_FLUSH_S", "2.0"))
+PRICES: Dict[str, Dict[str, float]] = json.loads(os.environ.get("LLM_PRICES") or "{}")
+
+GROUPS = ("endpoint", "username", "day", "workflow", "model")
+_COLUMNS = ("ts", "day", "endpoint", "username", "workflow", "model", "prompt_tokens",
+            "completion_tokens", "cached_tokens", "latency_ms", "outcome", "hedge", "cost_usd")
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+_buf_lock = threading.Lock()
+_buffer: List[tuple] = []
+_flush_lock = threading.Lock()
+_flusher: Optional[threading.Thread] = None
+
+
+def _conn():
+    global _schema_ready
+    conn = local_store.connect("ledger")
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS calls ("
+                    " ts REAL NOT NULL, day TEXT NOT NULL, endpoint TEXT NOT NULL, username TEXT NOT NULL,"
+                    " workflow TEXT NOT NULL, model TEXT NOT NULL, prompt_tokens INTEGER NOT NULL,"
+                    " completion_tokens INTEGER NOT NULL, cached_tokens INTEGER NOT NULL,"
+                    " latency_ms REAL NOT NULL, outcome TEXT NOT NULL, hedge INTEGER NOT NULL,"
+                    " cost_usd REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS calls_day ON calls (day)")
+                _schema_ready = True
+    return conn
+
+
+def cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int) -> float:
+    p = PRICES.get(model) or {}
+    cached_price = p.get("cached_input", p.get("input", 0.0))
+    return ((prompt_tokens - cached_tokens) * p.get("input", 0.0) + cached_tokens * cached_price
+            + completion_tokens * p.get("output", 0.0)) / 1e6
+
+
+def _attribution() -> tuple[str, str]:
+    """(endpoint path, username) of the request that made the call, if any."""
+    from flask import g, has_request_context, request
+    if has_request_context():
+        return request.path, g.get("request_user") or g.get("username") or ""
+    try:
+        from quart import g as qg, has_request_context as q_has, request as q_request
+    except ImportError:
+        return "(none)", ""
+    if q_has():
+        return q_request.path, qg.get("request_user") or qg.get("username") or ""
+    return "(none)", ""
+
+
+def record(rec: Dict[str, Any]) -> None:
+    """model_routing usage listener: buffer one attempt."""
+    endpoint, username = _attribution()
+    now = time.time()
+    row = (
+        now, dt.datetime.fromtimestamp(now).strftime("%Y-%m-%d"), endpoint, username,
+        rec["workflow"], rec["model"], rec["prompt_tokens"], rec["completion_tokens"], rec["cached_tokens"],
+        round(rec["latency_s"] * 1000.0, 1), rec["outcome"], int(rec["hedge"]),
+        cost(rec["model"], rec["prompt_tokens"], rec["completion_tokens"], rec["cached_tokens"]),
+    )
+    with _buf_lock:
+        _buffer.append(row)
+        full = len(_buffer) >= LEDGER_BATCH
+    _ensure_flusher()
+    if full:
+        flush()
+
+
+def flush() -> int:
+    """Write buffered rows in one transaction; returns how many were written."""
+    with _flush_lock:
+        with _buf_lock:
+            rows = _buffer[:]
+            del _buffer[:]
+        if not rows:
+            return 0
+        db = _conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(f"INSERT INTO calls ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})", rows)
+            db.execute("COMMIT")
+        except Exception:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            with _buf_lock:
+                _buffer[:0] = rows  # keep them for the next attempt
+            raise
+        return len(rows)
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(LEDGER_FLUSH_S)
+        try:
+            flush()
+        except Exception as e:
+            print(f"[llm_ledger] flush failed: {e}")
+
+
+def _ensure_flusher() -> None:
+    global _flusher
+    if _flusher is None:
+        with _flush_lock:
+            if _flusher is None:
+                _flusher = threading.Thread(target=_flush_loop, name="llm-ledger", daemon=True)
+                _flusher.start()
+
+
+def rollup(by: str = "endpoint", since: Optional[str] = None, until: Optional[str] = None,
+           username: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Totals grouped by one of GROUPS; `since` / `until` are inclusive YYYY-MM-DD days."""
+    if by not in GROUPS:
+        raise ValueError(f"by must be one of {', '.join(GROUPS)}")
+    flush()
+    where, args = [], []
+    if since:
+        where.append("day >= ?")
+        args.append(since)
+    if until:
+        where.append("day <= ?")
+        args.append(until)
+    if username:
+        where.append("username = ?")
+        args.append(username)
+    sql = (
+        f"SELECT {by} AS key, COUNT(*) AS calls, SUM(outcome != 'ok') AS failed, SUM(hedge) AS hedges,"
+        " SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens,"
+        " SUM(cached_tokens) AS cached_tokens, AVG(latency_ms) AS avg_latency_ms,"
+        " MAX(latency_ms) AS max_latency_ms, SUM(cost_usd) AS cost_usd"
+        f" FROM calls {'WHERE ' + ' AND '.join(where) if where else ''} GROUP BY {by} ORDER BY {by}"
+    )
+    out = []
+    for row in _conn().execute(sql, args):
+        r = dict(row)
+        r[by] = r.pop("key")
+        r["cache_hit_rate"] = round(r["cached_tokens"] / r["prompt_tokens"], 3) if r["prompt_tokens"] else 0.0
+        r["avg_latency_ms"] = round(r["avg_latency_ms"] or 0.0, 1)
+        r["cost_usd"] = round(r["cost_usd"] or 0.0, 6)
+        out.append(r)
+    return out
+
+
+atexit.register(flush)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--by", choices=GROUPS, default="endpoint")
+    ap.add_argument("--since", help="YYYY-MM-DD (inclusive)")
+    ap.add_argument("--until", help="YYYY-MM-DD (inclusive)")
+    ap.add_argument("--username")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    rows = rollup(args.by, args.since, args.until, args.username)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{args.by:<28}{'calls':>7}{'failed':>7}{'prompt':>10}{'cached':>9}{'hit %':>7}"
+          f"{'completion':>11}{'avg ms':>9}{'max ms':>9}{'cost $':>10}")
+    for r in rows:
+        print(f"{str(r[args.by])[:27]:<28}{r['calls']:>7}{r['failed']:>7}{r['prompt_tokens']:>10}"
+              f"{r['cached_tokens']:>9}{100 * r['cache_hit_rate']:>7.1f}{r['completion_tokens']:>11}"
+              f"{r['avg_latency_ms']:>9.0f}{r['max_latency_ms']:>9.0f}{r['cost_usd']:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+# backend/llm_stub_server.py
+"""
+Local OpenAI-compatible stub for benchmarks and load tests.
+
+    python llm_stub_server.py --port 8900 --latency-ms 800 --jitter-ms 200
+
+Point the workflows at it with GENAI_BASE_URL=http://127.0.0.1:8900.
+POST .../chat/completions returns a canned answer shaped for whichever
+workflow sent the prompt (initial plan, daily plan, single meal, summary),
+after sleeping for the configured latency.
+
+With --prefix-cache it also mimics provider-side prompt caching: the
+conversation (role + content of each message, in order) is hashed in
+fixed-size blocks; blocks already seen are "cached" and cost nothing, the
+rest cost --per-prompt-token-ms of prefill each. The cached share is
+reported the way OpenAI does, as usage.prompt_tokens_details.cached_tokens.
+
+--malformed-rate makes that share of JSON answers unparseable (the way
+models break JSON: a truncated object, an unclosed string), except for
+requests that set response_format, which the stub treats as constrained
+decoding and always answers with valid JSON.
+
+--error-rate answers that share of requests with HTTP 503 after the usual
+latency (outage drills for the circuit breakers); settable at runtime via
+server.error_rate.
+"""
+from __future__ import annotations
+
+import argparse
+import collections
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _meal(name: str) -> Dict[str, Any]:
+    return {
+        "long_name": name.replace("-", " ").title(),
+        "description": "A simple, balanced stub meal.",
+        "ingredients": {"rolled oats": "1 cup", "banana": "1", "spinach": "1 cup"},
+        "instructions": "1) Prepare the ingredients.\n2) Cook and serve.",
+    }
+
+
+def canned_reply(prompt: str) -> str:
+    """Pick a response shape from the prompt text."""
+    if "Fix the JSON" in prompt:  # json_repair: answer in the shape being repaired
+        for title, marker in (("single_meal", "Generate exactly ONE"), ("daily_meal_plan", "3 sections"),
+                              ("initial_meals", "Generate 10 diverse")):
+            if f"({title})" in prompt:
+                return canned_reply(marker)
+    if "Generate exactly ONE" in prompt:
+        return json.dumps({f"stub-meal-{uuid.uuid4().hex[:6]}": _meal("stub-meal")})
+    if "3 sections" in prompt:
+        return json.dumps({
+            section: {f"{section}-stub-{i}": _meal(f"{section}-stub-{i}") for i in range(1, 6)}
+            for section in ("breakfast", "lunch", "dinner")
+        })
+    if "Generate 10 diverse" in prompt:
+        return json.dumps({f"initial-stub-{i}": _meal(f"initial-stub-{i}") for i in range(1, 11)})
+    return "They may feel steadier energy after fiber-rich breakfasts."
+
+
+def _malformed(content: str, rng: random.Random) -> str:
+    if rng.random() < 0.5:
+        return content[: rng.randint(len(content) // 2, len(content) - 1)]  # cut off mid-object
+    return content.replace('."', '.', 1)  # an unclosed string
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class LatencyModel:
+    """
+    Latency in milliseconds. dist="uniform": latency_ms +/- jitter_ms.
+    dist="lognormal": median latency_ms with shape `sigma` (a long right
+    tail, like a real model endpoint under load). `per_token_ms` adds time
+    per completion token on top of either, `per_prompt_token_ms` per
+    prompt token that had to be processed (i.e. was not prefix-cached).
+    """
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, seed: Optional[int] = None,
+                 dist: str = "uniform", sigma: float = 0.5, per_token_ms: float = 0.0,
+                 per_prompt_token_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.dist = dist
+        self.sigma = sigma
+        self.per_token_ms = per_token_ms
+        self.per_prompt_token_ms = per_prompt_token_ms
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self, prompt_tokens: int, completion_tokens: int) -> float:
+        with self._lock:
+            if self.dist == "lognormal" and self.latency_ms > 0:
+                ms = self.latency_ms * self._rng.lognormvariate(0.0, self.sigma)
+            else:
+                ms = self.latency_ms + (self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+        ms += self.per_token_ms * completion_tokens + self.per_prompt_token_ms * prompt_tokens
+        return max(0.0, ms) / 1000.0
+
+
+class PrefixCache:
+    """
+    LRU of prompt-prefix blocks. Block i's key hashes blocks 0..i, so a
+    block only hits when everything before it matched too (as with KV
+    caches and OpenAI prompt caching). Sizes are in characters; the stub
+    counts ~4 characters per token.
+    """
+
+    def __init__(self, block_chars: int = 256, capacity_blocks: int = 65536):
+        self.block_chars = block_chars
+        self.capacity = capacity_blocks
+        self._blocks: "collections.OrderedDict[bytes, None]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, text: str) -> int:
+        """Characters of `text` served from cache; all of its full blocks are cached afterwards."""
+        raw = text.encode("utf-8")
+        h = hashlib.blake2b(digest_size=16)
+        keys = []
+        for i in range(0, len(raw) - self.block_chars + 1, self.block_chars):
+            h.update(raw[i:i + self.block_chars])
+            keys.append(h.copy().digest())
+        hit = 0
+        with self._lock:
+            for key in keys:
+                if key not in self._blocks:
+                    break
+                self._blocks.move_to_end(key)
+                hit += 1
+            for key in keys[hit:]:
+                self._blocks[key] = None
+            while len(self._blocks) > self.capacity:
+                self._blocks.popitem(last=False)
+        return min(len(text), hit * self.block_chars)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: "StubServer"
+
+    def log_message(self, fmt, *args):  # keep benchmark output clean
+        pass
+
+    def _send(self, code: int, body: Dict[str, Any]) -> None:
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        req = json.loads(self.rfile.read(length) or b"{}")
+        messages: List[Dict[str, Any]] = req.get("messages") or []
+        prompt = "\n".join(str(m.get("content") or "") for m in messages)
+
+        if self.server.error_rate and self.server.rng.random() < self.server.error_rate:
+            time.sleep(self.server.latency.sample(0, 0))
+            self._send(503, {"error": {"message": "stub outage", "type": "server_error"}})
+            return
+        content = canned_reply(prompt)
+        if (content.startswith("{") and not req.get("response_format")
+                and self.server.malformed_rate and self.server.rng.random() < self.server.malformed_rate):
+            content = _malformed(content, self.server.rng)
+        prompt_tokens, completion_tokens = _approx_tokens(prompt), _approx_tokens(content)
+        cached_tokens = 0
+        if self.server.prefix_cache is not None:
+            conversation = "".join(f"<|{m.get('role')}|>{m.get('content') or ''}" for m in messages)
+            cached_tokens = min(prompt_tokens, self.server.prefix_cache.lookup(conversation) // 4)
+        time.sleep(self.server.latency.sample(prompt_tokens - cached_tokens, completion_tokens))
+        self.server.count(prompt_tokens, cached_tokens)
+
+        self._send(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": req.get("model") or "stub",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            },
+        })
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, addr: Tuple[str, int], latency: LatencyModel, prefix_cache: Optional[PrefixCache] = None):
+        super().__init__(addr, StubHandler)
+        self.latency = latency
+        self.prefix_cache = prefix_cache
+        self.malformed_rate = 0.0
+        self.error_rate = 0.0
+        self.rng = random.Random()
+        self.requests_served = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._lock = threading.Lock()
+
+    def count(self, prompt_tokens: int = 0, cached_tokens: int = 0) -> None:
+        with self._lock:
+            self.requests_served += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+
+
+def start_stub(port: int = 0, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+               latency: Optional[LatencyModel] = None, prefix_cache: Optional[PrefixCache] = None,
+               malformed_rate: float = 0.0, error_rate: float = 0.0) -> StubServer:
+    """Start the stub on a daemon thread; port 0 picks a free port (see server.server_port)."""
+    server = StubServer(("127.0.0.1", port), latency or LatencyModel(latency_ms, jitter_ms), prefix_cache)
+    server.malformed_rate = malformed_rate
+    server.error_rate = error_rate
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port", type=int, default=8900)
+    ap.add_argument("--latency-ms", type=float, default=800.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--dist", choices=("uniform", "lognormal"), default="uniform")
+    ap.add_argument("--sigma", type=float, default=0.5, help="lognormal shape")
+    ap.add_argument("--per-token-ms", type=float, default=0.0)
+    ap.add_argument("--per-prompt-token-ms", type=float, default=0.0, help="prefill cost of uncached prompt tokens")
+    ap.add_argument("--prefix-cache", action="store_true", help="simulate provider-side prompt prefix caching")
+    ap.add_argument("--malformed-rate", type=float, default=0.0, help="share of broken JSON without response_format")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with HTTP 503")
+    args = ap.parse_args()
+    latency = LatencyModel(args.latency_ms, args.jitter_ms, dist=args.dist, sigma=args.sigma,
+                           per_token_ms=args.per_token_ms, per_prompt_token_ms=args.per_prompt_token_ms)
+    srv = StubServer(("127.0.0.1", args.port), latency, PrefixCache() if args.prefix_cache else None)
+    srv.malformed_rate = args.malformed_rate
+    srv.error_rate = args.error_rate
+    print(f"LLM stub listening on http://127.0.0.1:{args.port}")
+    srv.serve_forever()
@@ -0,0 +1,327 @@
+# backend/loadgen.py
+"""
+Load generator: N virtual users living D simulated days against the backend.
+
+    python loadgen.py --users 200 --days 5 --latency-ms 800 --dist lognormal
+    python loadgen.py --users 50 --days 3 --mode async --json report.json
+
+Everything runs in-process: the app (sync Flask, or asgi.py with --mode
+async) is served on a local port, the model is the OpenAI-compatible stub
+(llm_stub_server.py) and Sheets is the in-memory backend with simulated API
+latency. Every API round trip is tagged with the request path, so the report
+shows Sheets calls per request (amplification) next to throughput, latency
+percentiles and error rate per endpoint. --shards N splits users over N
+in-memory spreadsheets (shard_map.py); with --sheets-qps each one has its
+own request quota, as separate spreadsheets do.
+
+A virtual user's day 0 is onboarding (register, login, profile, initial
+plan, rate the 10 initial meals). Every later day: status, biomarkers,
+daily plan, rate some meals, open the ingredients view twice (the second
+time with If-None-Match), sometimes swap a meal, log in again, refresh
+summaries, or page through the meal / feedback history. Users advance in lockstep; the server's clock (routes.dt,
+summary_delta.dt) is shifted so rows carry the simulated day.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import datetime as dt
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import types
+from typing import Any, Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PASSWORD = "load-test"
+
+
+class _SimClock(types.ModuleType):
+    """Stand-in for the `datetime` module whose today is `start + day`."""
+
+    def __init__(self):
+        super().__init__("datetime")
+        self.offset = dt.timedelta(0)
+        clock = self
+
+        class SimDateTime(dt.datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return dt.datetime.now(tz) + clock.offset
+
+        class SimDate(dt.date):
+            @classmethod
+            def today(cls):
+                return (dt.datetime.now() + clock.offset).date()
+
+        self.datetime, self.date = SimDateTime, SimDate
+
+    def __getattr__(self, name):
+        return getattr(dt, name)
+
+
+class Recorder:
+    def __init__(self):
+        self.latency: Dict[str, List[float]] = collections.defaultdict(list)
+        self.errors: Dict[str, int] = collections.Counter()
+        self.status: Dict[str, collections.Counter] = collections.defaultdict(collections.Counter)
+
+    def add(self, endpoint: str, seconds: float, status: Optional[int]) -> None:
+        self.latency[endpoint].append(seconds)
+        self.status[endpoint][status or "exc"] += 1
+        if status is None or status >= 400:
+            self.errors[endpoint] += 1
+
+
+def _seed_file(users: List[str]) -> str:
+    seed = {"Users": [["Username", "PasswordHash", "CreatedAt"]] + [[u, "", ""] for u in users]}
+    fd, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w") as f:
+        json.dump(seed, f)
+    return path
+
+
+def _shard_map_file(n: int) -> str:
+    fd, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w") as f:
+        json.dump({"shards": [f"loadgen-shard-{i}" for i in range(n)]}, f)
+    return path
+
+
+class VirtualUser:
+    def __init__(self, name: str, client, rec: Recorder, rng: random.Random, think_ms: float):
+        self.name, self.client, self.rec, self.rng, self.think_ms = name, client, rec, rng, think_ms
+        self.token: Optional[str] = None
+        self.plan_codes: Dict[str, List[str]] = {}
+        self.etag: Optional[str] = None
+
+    async def _think(self) -> None:
+        if self.think_ms:
+            await asyncio.sleep(self.rng.uniform(0, self.think_ms) / 1000.0)
+
+    async def call(self, method: str, path: str, label: Optional[str] = None, **kwargs) -> Optional[Any]:
+        await self._think()
+        headers = dict(kwargs.pop("headers", {}) or {})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        t0 = time.perf_counter()
+        try:
+            r = await self.client.request(method, path, headers=headers, **kwargs)
+        except Exception:
+            self.rec.add(label or f"{method} {path}", time.perf_counter() - t0, None)
+            return None
+        self.rec.add(label or f"{method} {path}", time.perf_counter() - t0, r.status_code)
+        return r
+
+    async def login(self) -> None:
+        r = await self.call("POST", "/auth/login", json={"username": self.name, "password": PASSWORD})
+        if r is not None and r.status_code == 200:
+            self.token = r.json().get("token")
+
+    async def onboard(self) -> None:
+        await self.call("POST", "/auth/register", json={"username": self.name, "password": PASSWORD})
+        await self.login()
+        await self.call("POST", "/setup_user", json={
+            "Username": self.name, "Height": self.rng.randint(150, 195),
+            "Weight": self.rng.randint(50, 110),
+            "DietaryRestrictions": self.rng.choice(["", "vegetarian", "gluten-free", "no pork"]),
+        })
+        await self.call("GET", "/user/status", params={"username": self.name})
+        r = await self.call("POST", "/meals/initial", json={"Username": self.name})
+        codes = list(r.json()) if r is not None and r.status_code == 200 else []
+        for code in codes:
+            await self.call("POST", "/meals/feedback", json={
+                "Username": self.name, "MealCode": code, "Like": self.rng.random() < 0.6, "Initial": True,
+            })
+
+    async def day(self) -> None:
+        if self.rng.random() < 0.3:
+            await self.login()
+        await self.call("GET", "/user/status", params={"username": self.name})
+        await self.call("POST", "/biomarkers", json={
+            "Username": self.name, "Mood": self.rng.randint(1, 10),
+            "Energy": self.rng.randint(1, 10), "Fullness": self.rng.randint(1, 10),
+        })
+        await self.call("GET", "/biomarkers/trends", params={"username": self.name})
+        r = await self.call("POST", "/meals/daily", json={"Username": self.name})
+        if r is not None and r.status_code == 200:
+            plan = r.json()
+            self.plan_codes = {s: list((plan.get(s) or {}).keys()) for s in ("breakfast", "lunch", "dinner")}
+        chosen = [codes[0] for codes in self.plan_codes.values() if codes]
+        for code in chosen:
+            await self.call("POST", "/meals/feedback", json={
+                "Username": self.name, "MealCode": code, "Like": self.rng.random() < 0.7, "Initial": False,
+            })
+        if chosen and self.rng.random() < 0.2:
+            section = self.rng.choice([s for s, c in self.plan_codes.items() if c])
+            await self.call("POST", "/meals/swap", json={
+                "Username": self.name, "MealType": section, "MealCode": self.plan_codes[section][0],
+                "ExistingCodes": [c for cs in self.plan_codes.values() for c in cs],
+            })
+        if chosen:
+            params = {"username": self.name, "MealCodes": ",".join(chosen)}
+            r = await self.call("GET", "/meals/ingredients", params=params)
+            etag = r.headers.get("ETag") if r is not None else None
+            await self.call("GET", "/meals/ingredients", label="GET /meals/ingredients (revalidate)",
+                            params=params, headers={"If-None-Match": etag} if etag else {})
+        if self.rng.random() < 0.3:
+            await self.call("POST", "/summaries/run", json={"Username": self.name})
+        if self.rng.random() < 0.3:
+            path = self.rng.choice(("/history/meals", "/history/feedback"))
+            r = await self.call("GET", path, params={"username": self.name, "limit": 10})
+            cursor = r.json().get("next_cursor") if r is not None and r.status_code == 200 else None
+            if cursor:
+                await self.call("GET", path, label=f"GET {path} (next page)",
+                                params={"username": self.name, "limit": 10, "cursor": cursor})
+
+
+def _pct(values: List[float], p: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100)[p - 1]
+
+
+def _report(rec: Recorder, wall: float, sheet_calls: Dict[str, int], llm_calls: int) -> Dict[str, Any]:
+    rows = {}
+    for endpoint, lat in sorted(rec.latency.items()):
+        path = endpoint.split(" ")[1]
+        n = len(lat)
+        # Sheets calls are tagged by path; split them over every label that shares it
+        same_path = sum(len(v) for k, v in rec.latency.items() if k.split(" ")[1] == path)
+        rows[endpoint] = {
+            "requests": n,
+            "rps": n / wall,
+            "p50_s": _pct(lat, 50),
+            "p95_s": _pct(lat, 95),
+            "p99_s": _pct(lat, 99),
+            "error_rate": rec.errors[endpoint] / n,
+            "status": {str(k): v for k, v in rec.status[endpoint].items()},
+            "sheets_calls_per_request": sheet_calls.get(path, 0) / same_path if same_path else 0.0,
+        }
+    total = sum(len(v) for v in rec.latency.values())
+    return {
+        "wall_s": wall,
+        "requests": total,
+        "rps": total / wall if wall else 0.0,
+        "llm_calls": llm_calls,
+        "sheets_calls": sum(sheet_calls.values()),
+        "sheets_calls_background": sheet_calls.get("(background)", 0),
+        "endpoints": rows,
+    }
+
+
+def _print(report: Dict[str, Any], args) -> None:
+    print(f"\n{args.users} users x {args.days} days, mode {args.mode}, LLM {args.dist} "
+          f"{args.latency_ms:.0f} ms, Sheets {args.sheets_latency_ms:.0f} ms/call"
+          + (f", {args.sheets_qps:g} calls/s per spreadsheet" if args.sheets_qps else "")
+          + (f", {args.shards} shards" if args.shards > 1 else ""))
+    print(f"{'endpoint':<40}{'n':>7}{'req/s':>8}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'err %':>7}{'sheets/req':>11}")
+    for endpoint, r in report["endpoints"].items():
+        print(f"{endpoint:<40}{r['requests']:>7}{r['rps']:>8.1f}{r['p50_s']:>8.3f}{r['p95_s']:>8.3f}"
+              f"{r['p99_s']:>8.3f}{100 * r['error_rate']:>7.1f}{r['sheets_calls_per_request']:>11.2f}")
+    print(f"\ntotal {report['requests']} requests in {report['wall_s']:.1f} s ({report['rps']:.1f} req/s), "
+          f"{report['llm_calls']} LLM calls, {report['sheets_calls']} Sheets calls "
+          f"({report['sheets_calls_background']} outside requests)")
+
+
+async def _run(base: str, users: List[str], args, rec: Recorder, clock: _SimClock) -> float:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(base_url=base, timeout=args.timeout_s, limits=limits) as client:
+        vus = [VirtualUser(u, client, rec, random.Random(f"{args.seed}-{u}"), args.think_ms) for u in users]
+        t0 = time.perf_counter()
+        for day in range(args.days):
+            clock.offset = dt.timedelta(days=day)
+            await asyncio.gather(*((vu.onboard() if day == 0 else vu.day()) for vu in vus))
+            print(f"  day {day} done at {time.perf_counter() - t0:.1f} s")
+        return time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=100)
+    ap.add_argument("--days", type=int, default=3, help="day 0 is onboarding")
+    ap.add_argument("--mode", choices=("sync", "async"), default="sync")
+    ap.add_argument("--sync-threads", type=int, default=32)
+    ap.add_argument("--connections", type=int, default=256)
+    ap.add_argument("--latency-ms", type=float, default=800.0)
+    ap.add_argument("--jitter-ms", type=float, default=200.0)
+    ap.add_argument("--dist", choices=("uniform", "lognormal"), default="lognormal")
+    ap.add_argument("--sigma", type=float, default=0.5)
+    ap.add_argument("--sheets-latency-ms", type=float, default=50.0)
+    ap.add_argument("--sheets-qps", type=float, default=0.0, help="request quota per spreadsheet (0: none)")
+    ap.add_argument("--shards", type=int, default=1, help="spreadsheets to split users over")
+    ap.add_argument("--think-ms", type=float, default=200.0, help="max random pause before each request")
+    ap.add_argument("--bcrypt-rounds", type=int, default=4, help="12 is the production cost")
+    ap.add_argument("--timeout-s", type=float, default=600.0)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", help="also write the report here")
+    args = ap.parse_args()
+
+    from llm_stub_server import LatencyModel, start_stub
+    stub = start_stub(latency=LatencyModel(args.latency_ms, args.jitter_ms, seed=args.seed,
+                                           dist=args.dist, sigma=args.sigma))
+
+    users = [f"vu-{i:04d}" for i in range(args.users)]
+    # must be set before sheets_client / the workflows are imported
+    os.environ["GENAI_BASE_URL"] = f"http://127.0.0.1:{stub.server_port}"
+    os.environ.setdefault("GENAI_STUDIO_API_KEY", "stub")  # the stub ignores it
+    os.environ["SHEETS_BACKEND"] = "memory"
+    os.environ["SHEETS_MEMORY_SEED"] = _seed_file(users)
+    os.environ["SHEETS_MEMORY_LATENCY_MS"] = str(args.sheets_latency_ms)
+    os.environ["SHEETS_MEMORY_QPS"] = str(args.sheets_qps)
+    if args.shards > 1:
+        os.environ["SHEETS_SHARD_MAP"] = _shard_map_file(args.shards)
+    os.environ.setdefault("BACKEND_STATE_DIR", tempfile.mkdtemp(prefix="loadgen-state-"))
+    sys.path[:0] = [HERE, os.path.join(HERE, "diet_app_ai")]
+
+    import routes
+    import sheets_client
+    import summary_delta
+    from bench_async import _start_async, _start_sync
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    clock = _SimClock()
+    routes.dt = summary_delta.dt = clock
+    routes.bcrypt._log_rounds = args.bcrypt_rounds
+
+    def tag() -> str:
+        from flask import has_request_context, request
+        if has_request_context():
+            return request.path.rstrip("/") or "/"
+        if args.mode == "async":
+            from quart import has_request_context as q_has, request as q_request
+            if q_has():
+                return q_request.path.rstrip("/") or "/"
+        return "(background)"
+
+    books = sheets_client.books()
+    port = 8921
+    if args.mode == "sync":
+        _start_sync(port, args.sync_threads)
+    else:
+        _start_async(port)
+    for book in books:
+        book.api_calls.clear()  # drop the boot-time index warm-up
+        book.call_tag = tag
+
+    rec = Recorder()
+    wall = asyncio.run(_run(f"http://127.0.0.1:{port}", users, args, rec, clock))
+    report = _report(rec, wall, dict(sum((b.api_calls for b in books), collections.Counter())),
+                     stub.requests_served)
+    _print(report, args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# backend/local_store.py
+"""
+Local SQLite files for backend state that must survive restarts and be
+shared by every worker on the host (job queue, locks, ledgers, ...).
+
+    conn = connect("jobs")    # -> <BACKEND_STATE_DIR>/jobs.sqlite3
+
+Connections are cached per thread and opened in WAL mode so readers never
+block the single writer.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+
+STATE_DIR = os.environ.get(
+    "BACKEND_STATE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".state"),
+)
+
+_local = threading.local()
+
+
+def path(name: str) -> str:
+    os.makedirs(STATE_DIR, exist_ok=True)
+    return os.path.join(STATE_DIR, f"{name}.sqlite3")
+
+
+def connect(name: str) -> sqlite3.Connection:
+    """Per-thread connection to <STATE_DIR>/<name>.sqlite3 (autocommit, WAL)."""
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(name)
+    if conn is None:
+        conn = sqlite3.connect(path(name), timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.row_factory = sqlite3.Row
+        conns[name] = conn
+    return conn
@@ -0,0 +1,94 @@
+# backend/meal_index.py
+"""
+(Username, MealCode) -> latest plan rows, for /meals/ingredients.
+
+For every user and meal code the index remembers the latest Date the meal
+was generated and the sheet row runs holding that date's MealIngredients
+and MealSteps rows. It is maintained on append, so answering a request means
+fetching just those row ranges (one values_batch_get) instead of scanning
+both tabs and parsing every row's date.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from tab_index import TabIndex, Col
+
+Run = List[int]  # [first_row, last_row], 1-based inclusive
+
+
+
+def _iso(s: str) -> Optional[str]:
+    try:
+        return datetime.strptime(s, "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        return None
+
+
+@dataclass
+class _Latest:
+    date: str = ""
+    runs: List[Run] = field(default_factory=list)
+
+    def add(self, date: str, row: int) -> None:
+        if date > self.date:
+            self.date, self.runs = date, [[row, row]]
+        elif date == self.date:
+            if self.runs and self.runs[-1][1] == row - 1:
+                self.runs[-1][1] = row
+            else:
+                self.runs.append([row, row])
+
+
+@dataclass(frozen=True)
+class MealRows:
+    date: str
+    ingredient_runs: Tuple[Tuple[int, int], ...]
+    step_runs: Tuple[Tuple[int, int], ...]
+
+
+class MealIndex(TabIndex):
+    TABS = ("MealIngredients", "MealSteps")
+
+    def _reset(self) -> None:
+        self._ingredients: Dict[Tuple[str, str], _Latest] = {}
+        self._steps: Dict[Tuple[str, str], _Latest] = {}
+
+    def _apply(self, tab: str, col: Col, first_row: int, rows: List[List[Any]]) -> None:
+        target = self._ingredients if tab == "MealIngredients" else self._steps
+        for offset, r in enumerate(rows):
+            username, code, date = col(r, "Username"), col(r, "MealCode"), _iso(col(r, "Date"))
+            if not username or not code or not date:
+                continue
+            key = (username, code)
+            entry = target.get(key)
+            if entry is None:
+                entry = target[key] = _Latest()
+            entry.add(date, first_row + offset)
+
+    def columns(self, tab: str) -> Col:
+        self.ensure_built()
+        return self._cols[tab]
+
+    def lookup(self, username: str, codes: Iterable[str]) -> Dict[str, MealRows]:
+        """Row runs of the latest date for each known code (unknown codes are omitted)."""
+        self.ensure_built()
+        out: Dict[str, MealRows] = {}
+        with self._lock:
+            for code in codes:
+                ing = self._ingredients.get((username, code))
+                if ing is None:
+                    continue
+                steps = self._steps.get((username, code))
+                step_runs = steps.runs if steps is not None and steps.date == ing.date else []
+                out[code] = MealRows(
+                    date=ing.date,
+                    ingredient_runs=tuple((a, b) for a, b in ing.runs),
+                    step_runs=tuple((a, b) for a, b in step_runs),
+                )
+        return out
+
+
+MEALS = MealIndex()
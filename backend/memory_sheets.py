@@ -0,0 +1,185 @@
+# backend/memory_sheets.py
+"""
+In-process stand-in for a gspread Spreadsheet, selected with
+SHEETS_BACKEND=memory. Implements only the calls sheets_client makes, so
+benchmarks and load tests can drive the real routes without touching the
+Google Sheets API.
+
+    SHEETS_MEMORY_SEED=seed.json        # optional {tab: [[header...], [row...], ...]}
+    SHEETS_MEMORY_LATENCY_MS=120        # optional simulated API round trip
+    SHEETS_MEMORY_FAIL_RATE=0.5         # optional share of calls that fail (outage drills)
+    SHEETS_MEMORY_QPS=5                 # optional per-spreadsheet request rate limit
+    SHEETS_MEMORY_ROW_US=20             # optional transfer time per row returned by a read
+
+With a shard map (sheets_client / shard_map.py) every shard is its own
+MemorySpreadsheet, seeded with the seed rows that belong on it.
+"""
+from __future__ import annotations
+
+import collections
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Header rows as they exist in the production spreadsheet.
+DEFAULT_TABS: Dict[str, List[str]] = {
+    "Users": ["Username", "PasswordHash", "CreatedAt"],
+    "UserPreferences": ["Username", "Height", "Weight", "DietaryRestrictions", "CreatedAt"],
+    "UserMealPreferences": ["Date", "Username", "MealCode", "Like", "Initial"],
+    "UserBiomarker": ["Date", "Username", "Mood", "Energy", "Fullness"],
+    "MealIngredients": ["Date", "Username", "MealType", "MealCode", "Description",
+                        "Ingredients", "Amount", "Model", "Temperature"],
+    "MealSteps": ["Date", "Username", "MealType", "MealCode", "Step", "Instruction",
+                  "Model", "Temperature"],
+    "UserSummarization": ["Date", "Username", "PreferenceSummary", "BiomarkerSummary",
+                          "Model", "Temperature"],
+}
+
+_A1_ROWS = re.compile(r"^[A-Z]+(\d+)?(?::[A-Z]+(\d+)?)?$")
+
+
+def _cell(v: Any) -> str:
+    # Sheets hands every value back as a string
+    if isinstance(v, bool):
+        return "TRUE" if v else "FALSE"
+    return "" if v is None else str(v)
+
+
+class MemoryWorksheet:
+    def __init__(self, book: "MemorySpreadsheet", title: str, rows: List[List[Any]]):
+        self._book = book
+        self.title = title
+        self._rows = [[_cell(v) for v in r] for r in rows]
+
+    def get_all_values(self) -> List[List[str]]:
+        self._book._delay()
+        with self._book._lock:
+            values = [list(r) for r in self._rows]
+        return self._book._transfer(values)
+
+    def row_values(self, row: int) -> List[str]:
+        self._book._delay()
+        with self._book._lock:
+            return list(self._rows[row - 1]) if 0 < row <= len(self._rows) else []
+
+    def get(self, a1: str) -> List[List[str]]:
+        """Row-bounded reads such as 'A10:Z' or 'A10:Z42'."""
+        self._book._delay()
+        m = _A1_ROWS.match(a1.split("!")[-1])
+        first = int(m.group(1)) if m and m.group(1) else 1
+        last = int(m.group(2)) if m and m.group(2) else None
+        with self._book._lock:
+            return [list(r) for r in self._rows[first - 1:last]]
+
+    def _range(self, first: int, count: int) -> Dict[str, Any]:
+        return {"updates": {"updatedRange": f"'{self.title}'!A{first}:Z{first + count - 1}",
+                            "updatedRows": count}}
+
+    def append_row(self, values: List[Any], value_input_option: str = "RAW") -> Dict[str, Any]:
+        return self.append_rows([values], value_input_option)
+
+    def append_rows(self, rows: List[List[Any]], value_input_option: str = "RAW") -> Dict[str, Any]:
+        self._book._delay()
+        with self._book._lock:
+            first = len(self._rows) + 1
+            self._rows.extend([_cell(v) for v in r] for r in rows)
+        return self._range(first, len(rows))
+
+    def update(self, rng: str, values: List[List[Any]], value_input_option: str = "RAW") -> None:
+        self._book._delay()
+        m = _A1_ROWS.match(rng)
+        row = int(m.group(1)) if m and m.group(1) else 1
+        with self._book._lock:
+            for offset, vals in enumerate(values):
+                i = row - 1 + offset
+                while len(self._rows) <= i:
+                    self._rows.append([])
+                self._rows[i] = [_cell(v) for v in vals]
+
+    def delete_rows(self, start_index: int, end_index: Optional[int] = None) -> None:
+        self._book._delay()
+        with self._book._lock:
+            del self._rows[start_index - 1:(end_index or start_index)]
+
+
+class MemorySpreadsheet:
+    def __init__(self, seed: Optional[Dict[str, List[List[Any]]]] = None, latency_ms: float = 0.0,
+                 fail_rate: float = 0.0, qps: float = 0.0, row_us: float = 0.0):
+        self._lock = threading.RLock()
+        self._latency = max(0.0, latency_ms) / 1000.0
+        # quota: calls are spaced 1/qps apart, queued in arrival order
+        self._interval = 1.0 / qps if qps > 0 else 0.0
+        self._slot_lock = threading.Lock()
+        self._next_slot = 0.0
+        self._row_s = max(0.0, row_us) / 1e6
+        self.fail_rate = fail_rate  # may be changed at runtime to start/end an outage
+        # API round trips, keyed by call_tag() (e.g. the request path; see loadgen.py)
+        self.api_calls: collections.Counter = collections.Counter()
+        self.call_tag: Callable[[], str] = lambda: ""
+        tabs = {t: [h] for t, h in DEFAULT_TABS.items()}
+        tabs.update(seed or {})
+        self._tabs = {t: MemoryWorksheet(self, t, rows) for t, rows in tabs.items()}
+
+    @classmethod
+    def from_env(cls, keep: Optional[Callable[[str, List[Any], List[Any]], bool]] = None) -> "MemorySpreadsheet":
+        """keep(tab, header, row) selects the seed rows for this spreadsheet (default: all)."""
+        seed_path = os.environ.get("SHEETS_MEMORY_SEED")
+        seed = None
+        if seed_path:
+            with open(seed_path, encoding="utf-8") as f:
+                seed = json.load(f)
+            if keep is not None:
+                seed = {t: rows[:1] + [r for r in rows[1:] if keep(t, rows[0], r)]
+                        for t, rows in seed.items() if rows}
+        return cls(seed, float(os.environ.get("SHEETS_MEMORY_LATENCY_MS", "0") or 0),
+                   float(os.environ.get("SHEETS_MEMORY_FAIL_RATE", "0") or 0),
+                   float(os.environ.get("SHEETS_MEMORY_QPS", "0") or 0),
+                   float(os.environ.get("SHEETS_MEMORY_ROW_US", "0") or 0))
+
+    def _delay(self) -> None:
+        # every simulated API round trip passes through here
+        tag = self.call_tag()
+        with self._lock:
+            self.api_calls[tag] += 1
+        if self._interval:
+            with self._slot_lock:
+                now = time.monotonic()
+                slot = max(now, self._next_slot)
+                self._next_slot = slot + self._interval
+            if slot > now:
+                time.sleep(slot - now)
+        if self._latency:
+            time.sleep(self._latency)
+        if self.fail_rate and random.random() < self.fail_rate:
+            raise ConnectionError("simulated Sheets outage")
+
+    def _transfer(self, values: List[List[str]]) -> List[List[str]]:
+        # big reads take longer to download
+        if self._row_s and values:
+            time.sleep(self._row_s * len(values))
+        return values
+
+    def worksheet(self, tab: str) -> MemoryWorksheet:
+        with self._lock:
+            if tab not in self._tabs:
+                self._tabs[tab] = MemoryWorksheet(self, tab, [])
+            return self._tabs[tab]
+
+    def values_batch_get(self, ranges: List[str]) -> Dict[str, Any]:
+        self._delay()
+        out = []
+        for rng in ranges:
+            tab, _, a1 = rng.partition("!")
+            tab = tab.strip("'")
+            m = _A1_ROWS.match(a1 or "A1:Z")
+            first = int(m.group(1)) if m and m.group(1) else 1
+            last = int(m.group(2)) if m and m.group(2) else None
+            with self._lock:
+                values = [list(r) for r in self.worksheet(tab)._rows[first - 1:last]]
+            out.append({"range": f"'{tab}'!{a1 or 'A1:Z'}", "values": values})
+        self._transfer([r for o in out for r in o["values"]])
+        return {"valueRanges": out}
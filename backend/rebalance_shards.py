@@ -0,0 +1,141 @@
+# backend/rebalance_shards.py
+"""
+Move users' rows between spreadsheets after a shard map change (shard_map.py).
+
+    python rebalance_shards.py --to shards.new.json            # dry run: who moves where
+    python rebalance_shards.py --to shards.new.json --apply
+
+The current map is the one the backend runs with (SHEETS_SHARD_MAP, or the
+single SPREADSHEET_ID). Every sharded tab is read from every current shard
+(one batch read per shard, concurrently), and each user whose shard differs
+under the new map has their rows moved:
+
+    1. appended to the new shard, one call per tab (tabs and headers are
+       created on a new spreadsheet first)
+    2. removed from the old shard: the remaining rows are written back over
+       the top of the tab and the leftover tail is deleted
+
+Then the new map is written to SHEETS_SHARD_MAP (or --write-map) and the
+summary marks of every user on a shard that lost rows are dropped, since
+their row numbers moved (summary_delta.py falls back to its window once).
+The home shard (first id) cannot change; Users and other shared tabs stay
+there.
+
+Run it with the backend stopped (writes in between could be lost), make a
+copy of the spreadsheets first, and start the workers again afterwards so
+the tab indexes rebuild from the new layout.
+"""
+from __future__ import annotations
+
+import argparse
+import collections
+import json
+import os
+from typing import Any, Dict, List, Tuple
+
+import gspread
+
+import sheets_client
+import summary_delta
+from data_versions import USER_TABS
+from shard_map import SHARED_TABS, ShardMap
+
+SHARDED_TABS = tuple(t for t in USER_TABS if t not in SHARED_TABS)
+
+# (old shard id, new shard id) -> tab -> rows
+Moves = Dict[Tuple[str, str], Dict[str, List[List[str]]]]
+
+
+def plan(old: ShardMap, new: ShardMap, tabs=SHARDED_TABS) -> Tuple[Moves, Dict[str, Dict[str, List[List[str]]]]]:
+    """(rows to move, every shard's current values {shard id: {tab: values}})."""
+    if old.home.id != new.home.id:
+        raise SystemExit(f"the home shard cannot change ({old.home.id} -> {new.home.id})")
+    current = {old.shards[i].id: data for i, data in enumerate(sheets_client.batch_get_shards(list(tabs)))}
+    moves: Moves = collections.defaultdict(lambda: collections.defaultdict(list))
+    for src, data in current.items():
+        for tab in tabs:
+            values = data.get(tab) or []
+            if not values or "Username" not in values[0]:
+                continue
+            u = values[0].index("Username")
+            for row in values[1:]:
+                dst = new.shards[new.shard_of(row[u] if u < len(row) else "")].id
+                if dst != src:
+                    moves[(src, dst)][tab].append(row)
+    return moves, current
+
+
+def _worksheet(book: Any, tab: str, header: List[str]) -> Any:
+    try:
+        ws = book.worksheet(tab)
+    except gspread.exceptions.WorksheetNotFound:
+        ws = book.add_worksheet(title=tab, rows=1000, cols=max(len(header), 26))
+    if not ws.row_values(1):
+        ws.update("A1", [header], value_input_option="RAW")
+    return ws
+
+
+def apply(old: ShardMap, new: ShardMap, moves: Moves, current: Dict[str, Dict[str, List[List[str]]]]) -> List[str]:
+    """Copy, then prune; returns the users whose row numbers changed."""
+    headers = {tab: values[0] for data in current.values() for tab, values in data.items() if values}
+    by_id = {s.id: s for s in new.shards}
+    for (_src, dst), tabs in moves.items():
+        book = sheets_client.open_spreadsheet(by_id[dst])
+        for tab, rows in tabs.items():
+            _worksheet(book, tab, headers[tab]).append_rows(rows, value_input_option="RAW")
+
+    moved_rows = collections.defaultdict(set)   # (src, tab) -> ids of the moved row lists
+    for (src, _dst), tabs in moves.items():
+        for tab, rows in tabs.items():
+            moved_rows[(src, tab)].update(map(id, rows))
+    touched: List[str] = []
+    for (src, tab), gone in moved_rows.items():
+        values = current[src][tab]
+        kept = [values[0]] + [r for r in values[1:] if id(r) not in gone]
+        ws = sheets_client.open_spreadsheet(old.shards[old.index(src)]).worksheet(tab)
+        ws.update("A1", kept, value_input_option="RAW")
+        ws.delete_rows(len(kept) + 1, len(values))
+        u = values[0].index("Username")
+        touched.extend(r[u] for r in values[1:] if u < len(r))
+    return sorted(set(touched))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--to", required=True, help="the new shard map (JSON, see shard_map.py)")
+    ap.add_argument("--apply", action="store_true", help="move the rows (default: only print the plan)")
+    ap.add_argument("--write-map", help="where to save the new map (default: SHEETS_SHARD_MAP)")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    old, new = sheets_client.SHARDS, ShardMap.load(args.to)
+    moves, current = plan(old, new)
+    summary = [
+        {"from": src, "to": dst, "users": len({r[current[src][t][0].index("Username")] for t, rows in tabs.items()
+                                               for r in rows}),
+         "rows": {t: len(rows) for t, rows in tabs.items()}}
+        for (src, dst), tabs in sorted(moves.items())
+    ]
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        for m in summary or [{"from": "-", "to": "-", "users": 0, "rows": {}}]:
+            rows = ", ".join(f"{t} {n}" for t, n in m["rows"].items()) or "nothing to move"
+            print(f"{m['from']} -> {m['to']}: {m['users']} users ({rows})")
+    if not args.apply:
+        return
+
+    touched = apply(old, new, moves, current)
+    summary_delta.forget(touched)
+    target = args.write_map or os.environ.get("SHEETS_SHARD_MAP")
+    if target:
+        new.save(target)
+        print(f"new shard map written to {target}")
+    else:
+        print("SHEETS_SHARD_MAP is not set: point it at the new map before restarting the backend")
+    print(f"moved {sum(len(r) for tabs in moves.values() for r in tabs.values())} rows; "
+          f"reset summary marks of {len(touched)} users; restart the workers")
+
+
+if __name__ == "__main__":
+    main()
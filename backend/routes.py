@@ -1,24 +1,63 @@
 import datetime as dt
-import json
+import functools
+import hmac
+import os
 from typing import Any
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g, abort, make_response
 from flask_bcrypt import Bcrypt
 
 from models import UserPreferences, UserMealPreference, UserBiomarker, MealIngredientRow, MealStepRow, UserSummarization
 
-from sheets_client import batch_get, append_row, get_values, find_row_by_header_value, update_row, append_rows
+from sheets_client import batch_get, batch_get_rows, append_row, get_values, find_row_by_header_value, update_row, append_rows
+import jobs
+import auth_tokens
+from status_index import STATUS
+from summary_index import SUMMARIES
+from meal_index import MEALS
+from biomarker_series import BIOMARKER_SERIES
+from history_index import HISTORY
+import summary_delta
+import data_versions  # after the indexes: stamps move only once they are current
+from http_cache import conditional, compress
+from jobs import job_mode
+from singleflight import coalesce
+import singleflight
+import llm_ledger
+import last_plans
+import sheets_client
 
 bcrypt = Bcrypt()
 
 # ——— import LangChain workflows ———
-from diet_app_ai.initial_meal_generation_workflow import generate_initial_meals
+from diet_app_ai import json_codec
+from diet_app_ai.initial_meal_generation_workflow import generate_initial_meals, model_routing, meal_schema
 from diet_app_ai.daily_meal_generation_workflow   import generate_daily_meals
 from diet_app_ai.biomarker_summary_workflow       import update_biomarker_summary
 from diet_app_ai.preference_summary_workflow      import update_taste_summary
+from diet_app_ai.single_meal_generation_workflow  import enforce_restrictions, generate_single_meal, RestrictionUnmetError
+
+model_routing.on_usage(llm_ledger.record)  # token/cost ledger for every model call
 
 bp = Blueprint("api", __name__)
+bp.after_request(compress)  # gzip/brotli for large JSON bodies (http_cache.py)
 TODAY = lambda: dt.datetime.now().strftime("%Y-%m-%d")
 
+# Every route except login/register needs a bearer token. REQUIRE_AUTH=0
+# still accepts a bare Username for older clients, which lets anyone act as
+# any user; only for local development and benchmarks.
+REQUIRE_AUTH = os.environ.get("REQUIRE_AUTH", "1") == "1"
+if not REQUIRE_AUTH:
+    print("[auth] WARNING: REQUIRE_AUTH=0 - requests may claim any Username without a session token")
+_PUBLIC_ENDPOINTS = {"api.auth_login", "api.auth_register"}
+
+# Operator routes (metrics, breaker state, the LLM cost ledger) need the
+# X-Admin-Token header to equal ADMIN_TOKEN; without ADMIN_TOKEN they are off.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+_ADMIN_ENDPOINTS = {"api.job_metrics", "api.llm_metrics", "api.breaker_health", "api.llm_ledger_rollup"}
+
+DEFAULT_BIOMARKER_SUMMARY = "No recent biomarker data; default to balanced meals, steady energy, and moderate sodium."
+DEFAULT_TASTE_SUMMARY = "No strong preferences recorded; include variety, moderate spice, and familiar flavors."
+
 def _safe_json() -> dict:
     """
     Parse JSON from the request body *very* defensively:
@@ -32,14 +71,14 @@ def _safe_json() -> dict:
     raw = request.get_data(cache=False, as_text=True) or ""
     if raw:
         try:
-            j = json.loads(raw)
+            j = json_codec.loads(raw)
             if isinstance(j, dict):
                 return j
         except Exception:
             pass
     return {}
 
-def _extract_username(data: dict) -> str:
+def _claimed_username(data: dict) -> str:
     # Try body first
     for k in ("Username", "username", "user", "name"):
         v = data.get(k)
@@ -49,6 +88,46 @@ def _extract_username(data: dict) -> str:
     v = request.args.get("Username") or request.args.get("username") or ""
     return v.strip()
 
+def _extract_username(data: dict) -> str:
+    """The token's user when one was presented, else the claimed Username."""
+    claimed = _claimed_username(data)
+    token_user = g.get("username")
+    if token_user:
+        if claimed and claimed != token_user:
+            abort(make_response(jsonify({"error": "Username does not match session token"}), 403))
+        return token_user
+    g.request_user = claimed  # attribution for llm_ledger
+    return claimed
+
+@bp.before_request
+def _authenticate():
+    g.username = None
+    if request.method == "OPTIONS":
+        return None
+    if jobs.in_job():
+        # the submitter's token was checked when the job was queued
+        username, err = jobs.job_user(), None
+    else:
+        username, err = auth_tokens.authenticate(request.headers.get("Authorization"))
+    if err:
+        return jsonify({"error": err}), 401
+    g.username = username
+    if REQUIRE_AUTH and not username and request.endpoint not in _PUBLIC_ENDPOINTS | _ADMIN_ENDPOINTS:
+        return jsonify({"error": "authentication required"}), 401
+    return None
+
+def _is_admin() -> bool:
+    given = request.headers.get("X-Admin-Token") or ""
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(given.encode("utf-8"), ADMIN_TOKEN.encode("utf-8"))
+
+def _admin_only(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _is_admin():
+            return jsonify({"error": "admin token required"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
 # ---------- Summaries: collect + run ----------
 
 from collections import defaultdict
@@ -79,10 +158,11 @@ def auth_login():
     if not pwd_hash:
         return jsonify({"needsPassword": True}), 409
 
-    if not bcrypt.check_password_hash(pwd_hash, password):
+    if not auth_tokens.check_password(bcrypt, pwd_hash, password):
         return jsonify({"error": "bad credentials"}), 401
 
-    return jsonify({"ok": True}), 200
+    token, expires_at = auth_tokens.issue(username)
+    return jsonify({"ok": True, "token": token, "expires_at": expires_at}), 200
 
 
 
@@ -117,47 +197,49 @@ def auth_register():
 
 # GET /user/status?username=alice
 @bp.get("/user/status")
+@conditional
 def user_status():
-    username = request.args.get("username", "").strip()
+    username = _extract_username({})
+    # O(1): served from the materialized status record (status_index.py)
+    return jsonify(STATUS.get(username).to_dict()), 200
 
-    # has_profile?
-    prefs = get_values("UserPreferences")
-    has_profile = any(r and r[0] == username for r in prefs[1:])
-
-    # has_initial_feedback?
-    ump = get_values("UserMealPreferences")
-    # Expect headers include: Date, Username, MealCode, Like, Initial
-    try:
-        hdr = ump[0]
-        u_i, init_i = hdr.index("Username"), hdr.index("Initial")
-        has_initial = any(len(r) > max(u_i, init_i) and r[u_i] == username and r[init_i].upper() == "TRUE"
-                          for r in ump[1:])
-    except Exception:
-        has_initial = False
-
-    return jsonify({"has_profile": has_profile, "has_initial_feedback": has_initial}), 200
+def _meal_rows(username: str, meal_type: str, slug: str, meta: dict, used: tuple) -> tuple[list, list]:
+    """
+    Build the MealIngredients and MealSteps rows (with Description) for one
+    meal. `used` is the (Model, Temperature) that generated it (model_routing.used).
+    """
+    model, temperature = used
+    desc = (meta.get("description") or "").strip()
+    rows_ing = [
+        [TODAY(), username, meal_type, slug, desc, ing, str(amt), model, temperature]
+        for ing, amt in (meta.get("ingredients") or {}).items()
+    ]
+    instr = (meta.get("instructions") or "").replace("\r", "")
+    parts = [p.strip() for p in instr.split("\n") if p.strip()] or \
+            [p.strip() for p in instr.split(".") if p.strip()]
+    rows_steps = [
+        [TODAY(), username, meal_type, slug, i, step, model, temperature]
+        for i, step in enumerate(parts, 1)
+    ]
+    return rows_ing, rows_steps
 
 # ---------- 1. Initial preference intake ----------
 @bp.post("/setup_user")
 def setup_user():
     data = request.get_json()
+    data["Username"] = _extract_username(data)
     prefs = UserPreferences(**data)
     prefs.save()
     return {"status": "ok"}, 201
 
 
 # ---------- 2. Initial meal generation ----------
-@bp.post("/meals/initial")
-def meals_initial():
-    req = _safe_json()
-    username = _extract_username(req)
-    if not username:
-        return {"error": "Username is required"}, 400
-
+def _initial_profile(username: str) -> tuple[dict | None, dict | None, int]:
+    """Return (user_profile, error_body, status) for initial generation."""
     # ----- read UserPreferences safely -----
-    vals = get_values("UserPreferences")  # [['Username','Height','Weight','DietaryRestrictions', ...], [..], ...]
+    vals = get_values("UserPreferences", username)  # [['Username','Height','Weight','DietaryRestrictions', ...], [..], ...]
     if not vals:
-        return jsonify({"error": "UserPreferences tab is empty or missing"}), 400
+        return None, {"error": "UserPreferences tab is empty or missing"}, 400
 
     header = vals[0]
     def idx(col): 
@@ -168,16 +250,16 @@ def meals_initial():
     dr_i = idx("DietaryRestrictions")
 
     if None in (u_i, h_i, w_i, dr_i):
-        return jsonify({"error": f"UserPreferences header must include "
-                                 f"[Username, Height, Weight, DietaryRestrictions, CreatedAt]. "
-                                 f"Found: {header}"}), 400
+        return None, {"error": f"UserPreferences header must include "
+                      f"[Username, Height, Weight, DietaryRestrictions, CreatedAt]. "
+                      f"Found: {header}"}, 400
 
     row = None
     if u_i is not None:
         row = next((r for r in vals[1:] if len(r) > u_i and r[u_i] == username), None)
     if not row:
         # Friendly error instead of StopIteration
-        return jsonify({"error": f"No profile found for username '{username}' in UserPreferences"}), 404
+        return None, {"error": f"No profile found for username '{username}' in UserPreferences"}, 404
 
     # Extract and coerce values
     try:
@@ -186,36 +268,38 @@ def meals_initial():
         height = int(row[h_i])
         weight = int(row[w_i])
     except (ValueError, IndexError, TypeError):
-        return jsonify({"error": "Height/Weight must be integers in UserPreferences"}), 400
+        return None, {"error": "Height/Weight must be integers in UserPreferences"}, 400
 
     restrictions = [s.strip() for s in (row[dr_i] if dr_i is not None and len(row) > dr_i else "").split(",") if s.strip()]
 
+    return {"height": height, "weight": weight, "dietary_restrictions": restrictions}, None, 200
+
+# POST /meals/initial
+@bp.post("/meals/initial")
+@job_mode
+@coalesce
+def meals_initial():
+    req = _safe_json()
+    username = _extract_username(req)
+    if not username:
+        return {"error": "Username is required"}, 400
+
+    profile, err, status = _initial_profile(username)
+    if err:
+        return jsonify(err), status
+
     # ----- call LLM -----
-    meals = generate_initial_meals(
-        user_profile={
-            "height": height,
-            "weight": weight,
-            "dietary_restrictions": restrictions,
-        }
-    )
+    with model_routing.collect() as calls:
+        meals = generate_initial_meals(user_profile=profile)
+        # only violating meals are regenerated, one at a time
+        meals = enforce_restrictions(meals, profile["dietary_restrictions"])
+    used = model_routing.used(calls, "initial", "single")
 
     # ----- persist ingredients & steps in batches -----
     rows_ing, rows_steps = [], []
     for slug, meta in meals.items():
-        desc = (meta.get("description") or "").strip()
-        for ing, amt in meta["ingredients"].items():
-            rows_ing.append([
-                TODAY(), username, "Initial", slug,
-                desc, ing, amt, "llama", 0.7  # DESCRIPTION inserted
-            ])
-        raw = meta["instructions"].replace("\r", "").split("\n")
-        parts = [p for p in raw if p.strip()] or [s for s in meta["instructions"].split(".") if s.strip()]
-        for i, step in enumerate(parts, 1):
-            rows_steps.append([
-                TODAY(), username, "Initial", slug,
-                i, step.strip(), "llama", 0.7
-            ])
-
+        ing, steps = _meal_rows(username, "Initial", slug, meta, used)
+        rows_ing += ing; rows_steps += steps
 
     if rows_ing:
         append_rows("MealIngredients", rows_ing)
@@ -229,7 +313,7 @@ def meals_initial():
 @bp.post("/biomarkers")
 def biomarkers():
     data = request.get_json(silent=True) or {}
-    username = (data.get("Username") or "").strip()
+    username = _extract_username(data)
     if not username:
         return {"error": "Username is required"}, 400
 
@@ -263,10 +347,62 @@ def biomarkers():
     row.save()
     return {"ok": True}, 201
 
+# GET /biomarkers/trends?username=alice
+# Rolling 7/30/90-day means, deltas vs. the previous window, and streaks, from
+# the per-user series kept current on every write (biomarker_series.py).
+@bp.get("/biomarkers/trends")
+def biomarker_trends():
+    username = _extract_username({})
+    if not username:
+        return {"error": "Username is required"}, 400
+    return jsonify(BIOMARKER_SERIES.trends(username, dt.date.today())), 200
+
+# GET /history/meals?username=alice&limit=20&cursor=...&since=2026-09-01&until=2026-09-30
+# GET /history/feedback?...   (same parameters)
+# Newest first; next_cursor fetches the following page (null on the last one).
+# Served from the per-user history index (history_index.py): O(page size).
+HISTORY_PAGE_DEFAULT = 20
+HISTORY_PAGE_MAX = 100
+
+def _history_page(tab: str):
+    username = _extract_username({})
+    if not username:
+        return {"error": "Username is required"}, 400
+    try:
+        limit = int(request.args.get("limit", HISTORY_PAGE_DEFAULT))
+    except ValueError:
+        return {"error": "limit must be an integer"}, 400
+    if not 1 <= limit <= HISTORY_PAGE_MAX:
+        return {"error": f"limit must be between 1 and {HISTORY_PAGE_MAX}"}, 400
+    bounds = {}
+    for name in ("since", "until"):
+        value = (request.args.get(name) or "").strip()
+        if value:
+            try:
+                bounds[name] = dt.date.fromisoformat(value).isoformat()
+            except ValueError:
+                return {"error": f"{name} must be YYYY-MM-DD"}, 400
+    try:
+        page = HISTORY.page(username, tab, limit, request.args.get("cursor") or None, **bounds)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    return jsonify(page), 200
+
+@bp.get("/history/meals")
+@conditional
+def meal_history():
+    return _history_page("MealIngredients")
+
+@bp.get("/history/feedback")
+@conditional
+def feedback_history():
+    return _history_page("UserMealPreferences")
+
 # ---------- 6. Save daily summaries ----------
 @bp.post("/summaries")
 def summaries():
     data = request.get_json()
+    data["Username"] = _extract_username(data)
     row = UserSummarization(Date=TODAY(), **data)
     row.save()
     return {"status": "ok"}, 201
@@ -276,20 +412,22 @@ def meal_feedback():
     data = request.get_json()
     append_row("UserMealPreferences", [
         dt.datetime.now().strftime("%Y-%m-%d"),
-        data["Username"],
+        _extract_username(data),
         data["MealCode"],
         str(bool(data.get("Like", False))).upper(),
         str(bool(data.get("Initial", False))).upper(),   # NEW COLUMN
     ])
     return {"status": "ok"}, 201
 
-@bp.post("/meals/ingredients")
+@bp.route("/meals/ingredients", methods=["GET", "POST"])
+@conditional
 def meals_ingredients():
     """
     Body: {
       "Username": "alice",
       "MealCodes": ["burrito-bowl", "tofu-scramble", "pasta-primavera"]
     }
+    or GET /meals/ingredients?username=alice&MealCodes=burrito-bowl,tofu-scramble
 
     Returns grouped details for the latest entry per code:
     {
@@ -305,131 +443,78 @@ def meals_ingredients():
     }
     """
     data = request.get_json(silent=True) or {}
-    username = (data.get("Username") or data.get("username") or "").strip()
+    username = _extract_username(data)
     meal_codes = data.get("MealCodes") or []
+    if request.method == "GET":
+        # GET /meals/ingredients?username=alice&MealCodes=a,b,c (cacheable, see @conditional)
+        meal_codes = [c for v in request.args.getlist("MealCodes") for c in v.split(",") if c]
     if not username:
         return {"error": "Username is required"}, 400
     if not isinstance(meal_codes, list) or not meal_codes:
         return {"error": "MealCodes must be a non-empty list"}, 400
 
-    from datetime import datetime
-    def parse_date(s):
-        try: return datetime.strptime(s, "%Y-%m-%d").date()
-        except Exception: return None
-
-    # ---------- INGREDIENTS ----------
-    rows = get_values("MealIngredients")
     out = {"breakfast": {}, "lunch": {}, "dinner": {}}
-    if not rows:
-        return jsonify(out), 200
-
-    hdr = rows[0]
-    def col(name):
-        try: return hdr.index(name)
-        except ValueError: return None
-
-    d_i  = col("Date")
-    u_i  = col("Username")
-    t_i  = col("MealType")
-    c_i  = col("MealCode")
-    desc_i = col("Description")
-    ing_i  = col("Ingredients")
-    amt_i  = col("Amount")
-
-    target_codes = set(map(str, meal_codes))
-
-    # Track latest date per code
-    latest_date_per_code = {}  # code -> date
-    # Aggregate by (code, date)
-    by_code_date = {}  # (code, date_iso) -> { meal_type, description, ingredients{} }
-
-    for r in rows[1:]:
-        if any(x is None for x in (d_i,u_i,t_i,c_i,ing_i,amt_i,desc_i)): 
-            continue
-        if len(r) <= max(d_i,u_i,t_i,c_i,ing_i,amt_i,desc_i): 
-            continue
-        if r[u_i] != username: 
-            continue
-        code = r[c_i]
-        if code not in target_codes: 
-            continue
-        d = parse_date(r[d_i])
-        if not d: 
-            continue
-
-        # keep only latest date per code
-        if (code not in latest_date_per_code) or (d > latest_date_per_code[code]):
-            latest_date_per_code[code] = d
-
-        key = (code, d.isoformat())
-        if key not in by_code_date:
-            by_code_date[key] = {
-                "meal_type": (r[t_i] or "").strip().lower(),
-                "description": (r[desc_i] or "").strip(),
-                "ingredients": {}
-            }
-        ing = str(r[ing_i]).strip()
-        amt = str(r[amt_i]).strip()
-        if ing:
-            by_code_date[key]["ingredients"][ing] = amt
-
-    # ---------- STEPS (optional but recommended) ----------
-    steps_rows = get_values("MealSteps")
-    steps_by_key = {}  # (code, date_iso) -> [steps...]
-
-    if steps_rows:
-        sh = steps_rows[0]
-        def scol(name):
-            try: return sh.index(name)
-            except ValueError: return None
-
-        sd_i = scol("Date")
-        su_i = scol("Username")
-        st_i = scol("MealType")
-        sc_i = scol("MealCode")
-        step_i = scol("Step")
-        instr_i = scol("Instruction")
-
-        for r in steps_rows[1:]:
-            if any(x is None for x in (sd_i, su_i, st_i, sc_i, step_i, instr_i)):
-                continue
-            if len(r) <= max(sd_i, su_i, st_i, sc_i, step_i, instr_i):
-                continue
-            if r[su_i] != username:
-                continue
-            code = r[sc_i]
-            if code not in target_codes:
-                continue
-            d = parse_date(r[sd_i])
-            if not d:
-                continue
-
-            # we only care about steps on the latest date for that code
-            if code not in latest_date_per_code or d != latest_date_per_code[code]:
-                continue
-
-            key = (code, d.isoformat())
-            steps_by_key.setdefault(key, [])
-            txt = str(r[instr_i]).strip()
-            if txt:
-                steps_by_key[key].append((int(r[step_i]) if str(r[step_i]).isdigit() else 9999, txt))
-
-    # ---------- Build final output ----------
-    for code, latest in latest_date_per_code.items():
-        key = (code, latest.isoformat())
-        agg = by_code_date.get(key)
-        if not agg:
+    target_codes = list(dict.fromkeys(map(str, meal_codes)))
+
+    # (Username, MealCode) -> row runs of the latest date (meal_index.py);
+    # only those rows are fetched, both tabs in one batch read
+    for attempt in (0, 1):
+        located = MEALS.lookup(username, target_codes)
+        fetched = batch_get_rows({
+            "MealIngredients": [run for m in located.values() for run in m.ingredient_runs],
+            "MealSteps":       [run for m in located.values() for run in m.step_runs],
+        }, username=username)
+        ing_col, step_col = MEALS.columns("MealIngredients"), MEALS.columns("MealSteps")
+        ing_chunks = iter(fetched["MealIngredients"])
+        step_chunks = iter(fetched["MealSteps"])
+        per_code = {}
+        stale = False
+        for code, m in located.items():
+            ing_rows = [r for _ in m.ingredient_runs for r in next(ing_chunks)]
+            step_rows = [r for _ in m.step_runs for r in next(step_chunks)]
+            # the sheet was edited behind our back: rebuild once and retry
+            if any(ing_col(r, "Username") != username or ing_col(r, "MealCode") != code
+                   for r in ing_rows) or \
+               any(step_col(r, "Username") != username or step_col(r, "MealCode") != code
+                   for r in step_rows):
+                stale = True
+                break
+            per_code[code] = (ing_rows, step_rows)
+        if not stale:
+            break
+        if attempt == 0:
+            MEALS.rebuild()
+    else:
+        return {"error": "MealIngredients changed during the read, please retry"}, 503
+
+    for code, (ing_rows, step_rows) in per_code.items():
+        agg = None
+        for r in ing_rows:
+            if agg is None:
+                agg = {
+                    "meal_type": ing_col(r, "MealType").strip().lower(),
+                    "description": ing_col(r, "Description").strip(),
+                    "ingredients": {},
+                }
+            ing = ing_col(r, "Ingredients").strip()
+            if ing:
+                agg["ingredients"][ing] = ing_col(r, "Amount").strip()
+        if agg is None:
             continue
         sec = agg["meal_type"] if agg["meal_type"] in out else "lunch"
         item = {
             "description": agg["description"],
             "ingredients": agg["ingredients"],
         }
-        # attach steps if we found any
-        if key in steps_by_key:
+        steps = []
+        for r in step_rows:
+            txt = step_col(r, "Instruction").strip()
+            if txt:
+                n = step_col(r, "Step")
+                steps.append((int(n) if n.isdigit() else 9999, txt))
+        if step_rows:
             # sort by step number if present
-            steps_sorted = [txt for _, txt in sorted(steps_by_key[key], key=lambda x: x[0])]
-            item["steps"] = steps_sorted
+            item["steps"] = [txt for _, txt in sorted(steps, key=lambda x: x[0])]
         out[sec][code] = item
 
     return jsonify(out), 200
@@ -437,28 +522,37 @@ def meals_ingredients():
 
 def _latest_summaries(username: str) -> tuple[str, str]:
     """Return (biomarker_summary, taste_profile). Empty strings if none."""
-    vals = get_values("UserSummarization")
-    if not vals:
-        return "", ""
-    header = vals[0]
-    try:
-        u_i = header.index("Username")
-        bs_i = header.index("BiomarkerSummary")
-        ps_i = header.index("PreferenceSummary")
-    except ValueError:
-        return "", ""
-
-    rows = [r for r in vals[1:] if len(r) > u_i and r[u_i] == username]
-    if not rows:
-        return "", ""
-    last = rows[-1]  # appended order ⇒ last is latest
-    biomarker_summary = last[bs_i] if len(last) > bs_i else ""
-    taste_profile = last[ps_i] if len(last) > ps_i else ""
-    return biomarker_summary, taste_profile
+    # pointer index kept current on every UserSummarization write (summary_index.py)
+    return SUMMARIES.latest(username)
 
 TODAY = lambda: dt.datetime.now().strftime("%Y-%m-%d")
 
+def _last_plan_fallback(view):
+    """
+    When Sheets or the model is unavailable (a circuit breaker is open, or
+    the connection fails), answer with the user's last stored plan instead
+    of an error (last_plans.py). X-Served-From tells the client.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            return view(*args, **kwargs)
+        except ConnectionError as e:
+            username = _extract_username(_safe_json())
+            last = last_plans.get(username) if username else None
+            if last is None:
+                raise
+            date, plan = last
+            print(f"[meals_daily] {e}; serving {username}'s plan from {date}")
+            resp = jsonify(plan)
+            resp.headers["X-Served-From"] = f"last-plan; date={date}"
+            return resp, 200
+    return wrapper
+
 @bp.post("/meals/daily")
+@job_mode
+@_last_plan_fallback  # outside coalesce, which replays only body and status
+@coalesce
 def meals_daily():
     data = _safe_json()
     username = _extract_username(data)
@@ -469,44 +563,38 @@ def meals_daily():
     biomarker_summary, taste_profile = _latest_summaries(username)
 
     # 2) If either is missing, compute now and write to sheet
-    computed_any = False
     if not biomarker_summary or not taste_profile:
         window_days = int(data.get("window_days", 7) or 7)
-        biomarker_window = _collect_recent_biomarkers(username, window_days)
-        meals_json       = _collect_recent_meals_json(username, window_days)
-        liked, disliked  = _collect_recent_likes(username, window_days)
-
-        # Compute biomarker summary if missing
-        if not biomarker_summary:
-            try:
-                biomarker_summary = update_biomarker_summary(payload={
-                    "existing_summary":  "",
-                    "biomarker_journal": json.dumps(biomarker_window or []),
-                    "meals_last_period": json.dumps(meals_json or {}),
-                })
-                if not isinstance(biomarker_summary, str):
-                    biomarker_summary = str(biomarker_summary)
-                computed_any = True
-            except Exception:
-                biomarker_summary = "No recent biomarker data; default to balanced meals, steady energy, and moderate sodium."
-
-        # Compute taste/Preference summary if missing
-        if not taste_profile:
-            try:
-                taste_profile = update_taste_summary(data={
-                    "existing_summary": "",
-                    "liked_meals":     ", ".join(liked) if liked else "",
-                    "disliked_meals":  ", ".join(disliked) if disliked else "",
-                })
-                if not isinstance(taste_profile, str):
-                    taste_profile = str(taste_profile)
-                computed_any = True
-            except Exception:
-                taste_profile = "No strong preferences recorded; include variety, moderate spice, and familiar flavors."
+        plan = summary_delta.plan(username, biomarker_summary, taste_profile, window_days, dt.date.today(),
+                                  need_bio=not biomarker_summary, need_taste=not taste_profile)
+        bio_done = taste_done = False
+
+        with model_routing.collect() as summary_calls:
+            # Compute biomarker summary if missing
+            if plan.need_bio:
+                try:
+                    biomarker_summary = update_biomarker_summary(payload=plan.bio_payload)
+                    if not isinstance(biomarker_summary, str):
+                        biomarker_summary = str(biomarker_summary)
+                    bio_done = True
+                except Exception:
+                    biomarker_summary = DEFAULT_BIOMARKER_SUMMARY
+
+            # Compute taste/Preference summary if missing
+            if plan.need_taste:
+                try:
+                    taste_profile = update_taste_summary(data=plan.taste_payload)
+                    if not isinstance(taste_profile, str):
+                        taste_profile = str(taste_profile)
+                    taste_done = True
+                except Exception:
+                    taste_profile = DEFAULT_TASTE_SUMMARY
 
         # If we computed anything, persist a row so future calls are warm
-        if computed_any:
-            append_row("UserSummarization", [TODAY(), username, taste_profile, biomarker_summary, "llama", 0.7])
+        if bio_done or taste_done:
+            append_row("UserSummarization", [TODAY(), username, taste_profile, biomarker_summary,
+                                             *model_routing.used(summary_calls, "biomarker_summary", "taste_summary")])
+            summary_delta.commit(plan, bio_done, taste_done)
 
     # 3) Profile fields
     restrictions = _user_restrictions(username) or []
@@ -519,190 +607,125 @@ def meals_daily():
     }
 
     # 5) Generate meals
-    meals_json_str = generate_daily_meals(context=payload_context)
-    try:
-        meals = json.loads(meals_json_str) if isinstance(meals_json_str, str) else meals_json_str
-    except Exception as e:
-        return {"error": f"Model did not return valid JSON: {e}", "raw": meals_json_str}, 500
+    with model_routing.collect() as calls:
+        try:
+            meals = generate_daily_meals(context=payload_context)
+        except meal_schema.MealFormatError as e:
+            return {"error": f"Model did not return valid JSON: {e}", "raw": e.raw}, 500
+        meals = enforce_restrictions(meals, restrictions, context=payload_context)
+    used = model_routing.used(calls, "daily", "single")
 
     # 6) Persist to MealIngredients & MealSteps (with Description)
     rows_ing, rows_steps = [], []
     for meal_type in ("breakfast", "lunch", "dinner"):
         section = meals.get(meal_type, {}) or {}
         for slug, meta in section.items():
-            desc = (meta.get("description") or "").strip()
-            # ingredients
-            for ing, amt in (meta.get("ingredients") or {}).items():
-                rows_ing.append([
-                    TODAY(), username, meal_type.capitalize(), slug,
-                    desc, ing, str(amt), "llama", 0.7
-                ])
-            # steps
-            instr = (meta.get("instructions") or "").replace("\r", "")
-            parts = [p.strip() for p in instr.split("\n") if p.strip()] or \
-                    [p.strip() for p in instr.split(".") if p.strip()]
-            for i, step in enumerate(parts, 1):
-                rows_steps.append([
-                    TODAY(), username, meal_type.capitalize(), slug,
-                    i, step, "llama", 0.7
-                ])
+            ing, steps = _meal_rows(username, meal_type.capitalize(), slug, meta, used)
+            rows_ing += ing; rows_steps += steps
 
     if rows_ing:   append_rows("MealIngredients", rows_ing)
     if rows_steps: append_rows("MealSteps", rows_steps)
 
+    last_plans.save(username, TODAY(), meals)
     return jsonify(meals), 200
 
-# ---------- Summaries: collect + run ----------
-
-from collections import defaultdict
+# POST /meals/swap  { Username, MealType, MealCode, ExistingCodes? }
+@bp.post("/meals/swap")
+@coalesce
+def meals_swap():
+    """
+    Replace ONE rejected suggestion. Uses the cached summaries (never
+    recomputes them) and persists only the replacement's rows.
+    Returns: { "meal_type": "lunch", "replaced": "<old code>", "meal": {slug: {...}} }
+    """
+    data = _safe_json()
+    username = _extract_username(data)
+    meal_type = str(data.get("MealType") or data.get("meal_type") or "").strip().lower()
+    meal_code = str(data.get("MealCode") or data.get("meal_code") or "").strip()
+    if not username:
+        return {"error": "Username is required"}, 400
+    if meal_type not in ("breakfast", "lunch", "dinner"):
+        return {"error": "MealType must be one of breakfast, lunch, dinner"}, 400
+    if not meal_code:
+        return {"error": "MealCode is required"}, 400
 
-def _parse_date(s: str) -> dt.date | None:
-    try:
-        return dt.datetime.strptime(s, "%Y-%m-%d").date()
-    except Exception:
-        return None
+    existing = [str(c) for c in (data.get("ExistingCodes") or []) if c]
+    biomarker_summary, taste_profile = _latest_summaries(username)
+    restrictions = _user_restrictions(username) or []
 
-def _collect_recent_biomarkers(username: str, window_days: int = 7) -> list[dict[str, int | str]]:
-    rows = get_values("UserBiomarker")
-    if not rows:
-        return []
-    hdr = rows[0]
-    try:
-        d_i = hdr.index("Date"); u_i = hdr.index("Username")
-        b1_i = hdr.index("BIOMARKER 1"); b2_i = hdr.index("BIOMARKER 2"); b3_i = hdr.index("BIOMARKER 3")
-    except ValueError:
-        return []
-    today = dt.date.today()
-    out = []
-    for r in rows[1:]:
-        if len(r) <= max(d_i, u_i, b1_i, b2_i, b3_i): continue
-        if r[u_i] != username: continue
-        d = _parse_date(r[d_i])
-        if not d or (today - d).days > window_days: continue
+    context = {
+        "biomarker_summary": biomarker_summary or "No recent biomarker data.",
+        "taste_summary":     taste_profile or "No strong preferences recorded.",
+        "existing_slugs":    sorted(set(existing) | {meal_code}),
+    }
+    with model_routing.collect() as calls:
         try:
-            out.append({
-                "date": r[d_i],
-                "b1": int(r[b1_i]),
-                "b2": int(r[b2_i]),
-                "b3": int(r[b3_i]),
+            meal = generate_single_meal({
+                **context,
+                "meal_type":            meal_type,
+                "dietary_restrictions": restrictions,
             })
-        except Exception:
-            continue
-    return out
-
-def _collect_recent_meals_json(username: str, window_days: int = 7) -> dict[str, dict]:
-    """Rebuild minimal meal JSON from MealIngredients/MealSteps for the last N days."""
-    # Ingredients
-    ing_rows = get_values("MealIngredients")
-    steps_rows = get_values("MealSteps")
-    today = dt.date.today()
-
-    def _by_meal(rows, is_ing=True):
-        if not rows: return {}
-        hdr = rows[0]
-        idx = {name: (hdr.index(name) if name in hdr else None) for name in
-               (["Date","Username","MealType","MealCode","Ingredients","Amount"] if is_ing
-                else ["Date","Username","MealType","MealCode","Step","Instruction"])}
-        m = defaultdict(lambda: {"long_name": "", "ingredients": defaultdict(str), "instructions": []})
-        for r in rows[1:]:
-            if any(idx[k] is None or len(r) <= idx[k] for k in idx): continue
-            if r[idx["Username"]] != username: continue
-            d = _parse_date(r[idx["Date"]]); 
-            if not d or (today - d).days > window_days: continue
-            code = r[idx["MealCode"]]
-            if is_ing:
-                ing, amt = r[idx["Ingredients"]], str(r[idx["Amount"]])
-                if not isinstance(m[code]["ingredients"], dict):
-                    m[code]["ingredients"] = {}
-                m[code]["ingredients"][ing] = amt
-            else:
-                step_txt = r[idx["Instruction"]].strip()
-                if step_txt:
-                    m[code]["instructions"].append(step_txt)
-        return m
-
-    m_ing = _by_meal(ing_rows, True)
-    m_steps = _by_meal(steps_rows, False)
-
-    # Merge
-    all_codes = set(m_ing.keys()) | set(m_steps.keys())
-    out = {}
-    for code in all_codes:
-        ingredients_obj = m_ing.get(code, {}).get("ingredients", {})
-        ings = dict(ingredients_obj) if isinstance(ingredients_obj, (dict, defaultdict)) else {}
-        steps_list = m_steps.get(code, {}).get("instructions", [])
-        out[code] = {
-            "long_name": code.replace("-", " ").title(),
-            "ingredients": ings,
-            "instructions": "\n".join(steps_list),
-        }
-    return out
+        except (ConnectionError, TimeoutError):
+            raise  # open breaker / deadline: the 503 + Retry-After and 504 handlers
+        except Exception as e:
+            return {"error": f"Model did not return a valid meal: {e}"}, 500
+        meal = enforce_restrictions({meal_type: meal}, restrictions, context=context).get(meal_type) or {}
+    if not meal:
+        return {"error": "Could not generate a replacement that honors the dietary restrictions"}, 502
+
+    slug, meta = next(iter(meal.items()))
+    rows_ing, rows_steps = _meal_rows(username, meal_type.capitalize(), slug, meta, model_routing.used(calls, "single"))
+    if rows_ing:   append_rows("MealIngredients", rows_ing)
+    if rows_steps: append_rows("MealSteps", rows_steps)
 
-def _collect_recent_likes(username: str, window_days: int = 7) -> tuple[list[str], list[str]]:
-    rows = get_values("UserMealPreferences")
-    if not rows:
-        return ([], [])
-    hdr = rows[0]
-    try:
-        d_i = hdr.index("Date"); u_i = hdr.index("Username")
-        code_i = hdr.index("MealCode"); like_i = hdr.index("Like")
-    except ValueError:
-        return ([], [])
-    today = dt.date.today()
-    likes, dislikes = [], []
-    for r in rows[1:]:
-        if len(r) <= max(d_i, u_i, code_i, like_i): continue
-        if r[u_i] != username: continue
-        d = _parse_date(r[d_i])
-        if not d or (today - d).days > window_days: continue
-        (likes if (r[like_i].upper() == "TRUE") else dislikes).append(r[code_i])
-    return (likes, dislikes)
+    last_plans.swap(username, meal_type, meal_code, meal)
+
+    return jsonify({"meal_type": meal_type, "replaced": meal_code, "meal": meal}), 200
+
+# ---------- Summaries: incremental run (summary_delta.py) ----------
 
 @bp.post("/summaries/run")
+@job_mode
+@coalesce
 def run_summaries():
     """Compute both summaries and store them in UserSummarization."""
     data = request.get_json(silent=True) or {}
-    username = (data.get("Username") or data.get("username") or "").strip()
+    username = _extract_username(data)
     window_days = int(data.get("window_days", 7) or 7)
     if not username:
         return {"error": "Username is required"}, 400
 
-    # prior summaries (if any)
+    # prior summaries (if any), and only what arrived since they were written
     old_bio, old_taste = _latest_summaries(username)
+    plan = summary_delta.plan(username, old_bio, old_taste, window_days, dt.date.today())
+    if not plan.need_bio and not plan.need_taste:
+        return {"ok": True, "unchanged": True}, 200
 
-    # fresh windowed data
-    biomarker_window = _collect_recent_biomarkers(username, window_days)  # list[dict]
-    meals_json       = _collect_recent_meals_json(username, window_days)  # dict[code]->obj
-    liked, disliked  = _collect_recent_likes(username, window_days)
-
-    # NOTE: use the arg names your workflow expects
-    try:
-        new_bio = update_biomarker_summary(payload={
-            "existing_summary":   old_bio or "",
-            "biomarker_journal":  json.dumps(biomarker_window or []),
-            "meals_last_period":  json.dumps(meals_json or {}),
-        })
-        if not isinstance(new_bio, str):
-            new_bio = str(new_bio)
-    except Exception as e:
-        return {"error": f"update_biomarker_summary failed: {e}"}, 500
+    new_bio, new_taste = old_bio, old_taste
+    with model_routing.collect() as calls:
+        if plan.need_bio:
+            try:
+                new_bio = update_biomarker_summary(payload=plan.bio_payload)
+                if not isinstance(new_bio, str):
+                    new_bio = str(new_bio)
+            except Exception as e:
+                return {"error": f"update_biomarker_summary failed: {e}"}, 500
 
-    try:
-        new_taste = update_taste_summary(data={
-            "existing_summary": old_taste or "",
-            "liked_meals":     ", ".join(liked) if liked else "",
-            "disliked_meals":  ", ".join(disliked) if disliked else "",
-        })
-        if not isinstance(new_taste, str):
-            new_taste = str(new_taste)
-    except Exception as e:
-        return {"error": f"update_taste_summary failed: {e}"}, 500
-
-    append_row("UserSummarization", [TODAY(), username, new_taste, new_bio, "llama", 0.7])
+        if plan.need_taste:
+            try:
+                new_taste = update_taste_summary(data=plan.taste_payload)
+                if not isinstance(new_taste, str):
+                    new_taste = str(new_taste)
+            except Exception as e:
+                return {"error": f"update_taste_summary failed: {e}"}, 500
+
+    append_row("UserSummarization", [TODAY(), username, new_taste, new_bio,
+                                     *model_routing.used(calls, "biomarker_summary", "taste_summary")])
+    summary_delta.commit(plan, plan.need_bio, plan.need_taste)
     return {"ok": True}, 201
 
 def _user_restrictions(username: str):
-    vals = get_values("UserPreferences")
+    vals = get_values("UserPreferences", username)
     if not vals:
         return []
     header = vals[0]
@@ -715,3 +738,74 @@ def _user_restrictions(username: str):
     raw = (row[r_i] if row and len(row) > r_i else "") or ""
     # return as list
     return [s.strip() for s in raw.split(",") if s.strip()]
+
+# ---------- Background jobs ----------
+# GET /jobs/<id>
+@bp.get("/jobs/<job_id>")
+def job_status(job_id: str):
+    # with a token, only the submitter's jobs exist (404, not 403: ids are not confirmed)
+    job = jobs.get(job_id, g.get("username"))
+    if job is None:
+        return {"error": "job not found"}, 404
+    return jsonify(job), 200
+
+# GET /jobs/metrics  (job queue, plus single-flight coalescing of the same endpoints)
+@bp.get("/jobs/metrics")
+@_admin_only
+def job_metrics():
+    return jsonify({**jobs.metrics(), "coalescing": singleflight.stats()}), 200
+
+# GET /llm/metrics  (per-workflow route, latency percentiles, hedging, output validity)
+@bp.get("/llm/metrics")
+@_admin_only
+def llm_metrics():
+    out = model_routing.stats()
+    for workflow, counts in meal_schema.stats().items():
+        out.setdefault(workflow, {})["structured_output"] = counts
+    return jsonify(out), 200
+
+# GET /health/breakers  (circuit breaker state: each Sheets shard and each model)
+@bp.get("/health/breakers")
+@_admin_only
+def breaker_health():
+    return jsonify({"sheets": sheets_client.breakers(), "llm": model_routing.breakers()}), 200
+
+# GET /llm/ledger?by=endpoint|username|day|workflow|model&since=YYYY-MM-DD&until=&username=
+# Admins see every user; a session token sees only its own user's rows.
+@bp.get("/llm/ledger")
+def llm_ledger_rollup():
+    username = request.args.get("username")
+    if not _is_admin():
+        if not g.get("username"):
+            return jsonify({"error": "authentication required"}), 401
+        if username and username != g.username:
+            return jsonify({"error": "Username does not match session token"}), 403
+        username = g.username
+    try:
+        rows = llm_ledger.rollup(
+            by=request.args.get("by", "endpoint"),
+            since=request.args.get("since"),
+            until=request.args.get("until"),
+            username=username,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(rows), 200
+
+@bp.errorhandler(RestrictionUnmetError)
+def _restrictions_unmet(e):
+    # a meal kept breaking the user's restrictions: fail rather than serve a smaller plan
+    return jsonify({"error": f"Could not generate meals that honor the dietary restrictions: {e}",
+                    "violations": e.violations}), 502
+
+@bp.errorhandler(TimeoutError)
+def _llm_deadline(e):
+    # model_routing.LLMDeadlineExceeded: the workflow ran out of its deadline
+    return jsonify({"error": f"Model did not respond in time: {e}"}), 504
+
+@bp.errorhandler(ConnectionError)
+def _dependency_down(e):
+    # circuit_breaker.CircuitOpenError (Sheets or a model is failing) or a refused connection
+    resp = jsonify({"error": f"Service temporarily unavailable: {e}"})
+    resp.headers["Retry-After"] = str(max(1, round(getattr(e, "retry_in_s", 0) or 5)))
+    return resp, 503
@@ -0,0 +1,123 @@
+# backend/shard_map.py
+"""
+Which spreadsheet holds which user's rows.
+
+With SHEETS_SHARD_MAP unset there is one spreadsheet (SPREADSHEET_ID) and
+nothing below matters. Otherwise it names a JSON file:
+
+    {
+      "shards": ["<home spreadsheet id>",
+                 "<spreadsheet id>",
+                 {"id": "<spreadsheet id>", "credentials": "sa-2.json"}],
+      "pins":   {"some-user": "<spreadsheet id>"}
+    }
+
+The first shard is the home shard: shared tabs (SHARED_TABS, e.g. Users)
+live only there. Every other tab is split by Username, a user's rows all on
+one shard, chosen by rendezvous hashing: each shard scores
+blake2b(shard id + username) and the highest score wins. The choice only
+depends on the ids, not their order, and adding a shard moves just the ~1/n
+of users it now wins (rebalance_shards.py moves their rows). `pins`
+overrides the hash for single users.
+
+A shard may carry its own service-account credentials: the Sheets read and
+write quotas are counted per project, so shards under different projects
+also add quota, not only cells.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+SHARED_TABS = frozenset({"Users"})
+
+
+@dataclass(frozen=True)
+class Shard:
+    id: str
+    credentials: Optional[str] = None   # None: GOOGLE_APPLICATION_CREDENTIALS
+
+
+def _score(shard_id: str, username: str) -> int:
+    digest = hashlib.blake2b(f"{shard_id}\x00{username}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+@dataclass(frozen=True)
+class ShardMap:
+    shards: Tuple[Shard, ...]
+    pins: Dict[str, str] = field(default_factory=dict)   # username -> shard id
+
+    def __post_init__(self):
+        if not self.shards:
+            raise ValueError("a shard map needs at least one shard")
+        ids = [s.id for s in self.shards]
+        if len(set(ids)) != len(ids):
+            raise ValueError("duplicate shard id in shard map")
+        unknown = set(self.pins.values()) - set(ids)
+        if unknown:
+            raise ValueError(f"pins name unknown shards: {sorted(unknown)}")
+
+    @property
+    def home(self) -> Shard:
+        return self.shards[0]
+
+    def index(self, shard_id: str) -> int:
+        return next(i for i, s in enumerate(self.shards) if s.id == shard_id)
+
+    def shard_of(self, username: str) -> int:
+        """Index (into `shards`) of the shard holding `username`'s rows."""
+        if len(self.shards) == 1:
+            return 0
+        pinned = self.pins.get(username)
+        if pinned is not None:
+            return self.index(pinned)
+        scores = [_score(s.id, username) for s in self.shards]
+        return scores.index(max(scores))
+
+    # ---- (de)serialization ----
+    @classmethod
+    def single(cls, spreadsheet_id: str) -> "ShardMap":
+        return cls((Shard(spreadsheet_id),))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ShardMap":
+        shards = tuple(Shard(s) if isinstance(s, str) else Shard(s["id"], s.get("credentials"))
+                       for s in data.get("shards", []))
+        return cls(shards, dict(data.get("pins") or {}))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "shards": [s.id if s.credentials is None else {"id": s.id, "credentials": s.credentials}
+                       for s in self.shards],
+            "pins": dict(self.pins),
+        }
+
+    @classmethod
+    def load(cls, path: str) -> "ShardMap":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, path: str) -> None:
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp, path)
+
+    @classmethod
+    def from_env(cls, default_id: str) -> "ShardMap":
+        path = os.environ.get("SHEETS_SHARD_MAP")
+        return cls.load(path) if path else cls.single(default_id)
+
+
+def moves(old: ShardMap, new: ShardMap, usernames: List[str]) -> Dict[str, Tuple[str, str]]:
+    """username -> (old shard id, new shard id) for users whose shard changes."""
+    out = {}
+    for u in usernames:
+        a, b = old.shards[old.shard_of(u)].id, new.shards[new.shard_of(u)].id
+        if a != b:
+            out[u] = (a, b)
+    return out
@@ -0,0 +1,216 @@
+# backend/shared_cache.py
+"""
+State shared by every worker on the host (or, with Redis, every host):
+
+    tab versions   a counter per (spreadsheet, tab), bumped on every write
+                   made through sheets_client by any worker
+    read cache     Sheets reads of the small, hot tabs (CACHED_TABS: Users,
+                   UserPreferences), stored with the tab version they were
+                   read at; a hit needs the version to still match, so one
+                   counter lookup replaces an API call, and a write in any
+                   worker invalidates every worker's copy
+    write log      every write (tab, shard, first row, rows), so each
+                   worker's in-process indexes (tab_index.py) can apply the
+                   other workers' writes instead of going stale or
+                   re-reading the tabs
+
+Without SHARED_CACHE_URL the store is a local_store SQLite file (WAL, so
+readers never block). With SHARED_CACHE_URL=redis://host:6379/0 it is
+Redis (the optional `redis` package; any Redis-compatible server). Cached
+reads also expire after SHARED_CACHE_TTL_S, which bounds staleness from
+edits made directly in the spreadsheet. The write log keeps
+SHARED_LOG_KEEP_S seconds; a worker that fell further behind rebuilds its
+indexes.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import local_store
+from diet_app_ai import json_codec
+
+try:
+    import redis  # optional
+except ImportError:  # pragma: no cover - depends on the deployment
+    redis = None
+
+SHARED_CACHE_URL = os.environ.get("SHARED_CACHE_URL", "")
+CACHE_TTL_S = float(os.environ.get("SHARED_CACHE_TTL_S", "300"))
+LOG_KEEP_S = float(os.environ.get("SHARED_LOG_KEEP_S", "3600"))
+CACHED_TABS = frozenset(t.strip() for t in os.environ.get("SHARED_CACHE_TABS", "Users,UserPreferences").split(",")
+                        if t.strip())
+
+ORIGIN = uuid.uuid4().hex[:12]   # this process, to skip its own writes in the log
+
+
+class SqliteStore:
+    def __init__(self):
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._appends = 0
+
+    def _conn(self):
+        conn = local_store.connect("shared_cache")
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.execute("CREATE TABLE IF NOT EXISTS versions (key TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+                    conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, version INTEGER NOT NULL, "
+                                 "expires REAL NOT NULL, value BLOB NOT NULL)")
+                    conn.execute("CREATE TABLE IF NOT EXISTS log (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                                 "ts REAL NOT NULL, entry BLOB NOT NULL)")
+                    self._schema_ready = True
+        return conn
+
+    def version(self, key: str) -> int:
+        row = self._conn().execute("SELECT version FROM versions WHERE key = ?", (key,)).fetchone()
+        return row["version"] if row else 0
+
+    def bump(self, key: str) -> None:
+        self._conn().execute("INSERT INTO versions (key, version) VALUES (?, 1) "
+                             "ON CONFLICT(key) DO UPDATE SET version = version + 1", (key,))
+
+    def get(self, key: str) -> Optional[Tuple[int, bytes]]:
+        row = self._conn().execute("SELECT version, value FROM cache WHERE key = ? AND expires > ?",
+                                   (key, time.time())).fetchone()
+        return (row["version"], row["value"]) if row else None
+
+    def set(self, key: str, version: int, value: bytes, ttl_s: float) -> None:
+        self._conn().execute("INSERT OR REPLACE INTO cache (key, version, expires, value) VALUES (?, ?, ?, ?)",
+                             (key, version, time.time() + ttl_s, value))
+
+    def append(self, entry: bytes) -> None:
+        db = self._conn()
+        now = time.time()
+        db.execute("INSERT INTO log (ts, entry) VALUES (?, ?)", (now, entry))
+        self._appends += 1
+        if self._appends % 500 == 0:
+            db.execute("DELETE FROM log WHERE ts < ?", (now - LOG_KEEP_S,))
+
+    def head(self) -> int:
+        row = self._conn().execute("SELECT MAX(seq) AS seq FROM log").fetchone()
+        return row["seq"] or 0
+
+    def since(self, after: int) -> Tuple[List[Tuple[int, bytes]], bool]:
+        """Entries after `after`, and whether some were already trimmed."""
+        db = self._conn()
+        rows = db.execute("SELECT seq, entry FROM log WHERE seq > ? ORDER BY seq", (after,)).fetchall()
+        gap = bool(rows) and rows[0]["seq"] != after + 1 and \
+            db.execute("SELECT 1 FROM log WHERE seq <= ? LIMIT 1", (after,)).fetchone() is None
+        return [(r["seq"], r["entry"]) for r in rows], gap
+
+
+class RedisStore:
+    """The same operations on Redis: INCR counters, SET ... EX entries, one stream for the log."""
+
+    LOG = "shared_cache:log"
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError("SHARED_CACHE_URL needs the `redis` package (pip install redis)")
+        self._r = redis.Redis.from_url(url)
+        self._maxlen = int(os.environ.get("SHARED_LOG_MAXLEN", "100000"))
+
+    def version(self, key: str) -> int:
+        return int(self._r.get(f"shared_cache:v:{key}") or 0)
+
+    def bump(self, key: str) -> None:
+        self._r.incr(f"shared_cache:v:{key}")
+
+    def get(self, key: str) -> Optional[Tuple[int, bytes]]:
+        raw = self._r.get(f"shared_cache:c:{key}")
+        if raw is None:
+            return None
+        version, _, value = raw.partition(b":")
+        return int(version), value
+
+    def set(self, key: str, version: int, value: bytes, ttl_s: float) -> None:
+        self._r.set(f"shared_cache:c:{key}", b"%d:" % version + value, px=int(ttl_s * 1000))
+
+    def append(self, entry: bytes) -> None:
+        self._r.xadd(self.LOG, {"e": entry}, maxlen=self._maxlen, approximate=True)
+        # stream ids start with the ms timestamp; drop what is older than LOG_KEEP_S
+        self._r.xtrim(self.LOG, minid=int((time.time() - LOG_KEEP_S) * 1000), approximate=True)
+
+    def head(self) -> bytes:
+        last = self._r.xrevrange(self.LOG, count=1)
+        return last[0][0] if last else b"0-0"
+
+    def since(self, after: bytes) -> Tuple[List[Tuple[bytes, bytes]], bool]:
+        rows = self._r.xrange(self.LOG, min=b"(" + after)
+        gap = bool(rows) and after != b"0-0" and not self._r.xrange(self.LOG, min=after, max=after)
+        return [(seq, fields[b"e"]) for seq, fields in rows], gap
+
+
+STORE = RedisStore(SHARED_CACHE_URL) if SHARED_CACHE_URL else SqliteStore()
+
+
+# ---- tab versions + write log (fed by sheets_client on every write) ----
+def _tab_key(spreadsheet_id: str, tab: str) -> str:
+    return f"{spreadsheet_id}:{tab}"
+
+
+def published(spreadsheet_id: str, shard: int, tab: str, first_row: Optional[int],
+              rows: List[List[Any]], kind: str) -> None:
+    """Record a write: bump the tab's version and log it for the other workers."""
+    STORE.bump(_tab_key(spreadsheet_id, tab))
+    STORE.append(json_codec.dumps({"o": ORIGIN, "s": shard, "t": tab, "f": first_row,
+                                   "r": rows, "k": kind}).encode("utf-8"))
+
+
+# ---- read cache ----
+_local: Dict[str, Tuple[int, float, Any]] = {}   # key -> (version, expires, decoded value)
+_local_lock = threading.Lock()
+
+
+def cached_read(spreadsheet_id: str, tab: str, read):
+    """
+    read() through the shared cache: reused while the tab's version is the
+    one it was read at (and not older than CACHE_TTL_S). Decoded values are
+    kept per process too, so a hit is one version lookup.
+    """
+    key = _tab_key(spreadsheet_id, tab)
+    version = STORE.version(key)
+    now = time.time()
+    with _local_lock:
+        hit = _local.get(key)
+    if hit is not None and hit[0] == version and hit[1] > now:
+        return hit[2]
+    shared = STORE.get(key)
+    if shared is not None and shared[0] == version:
+        value = json_codec.loads(shared[1])
+    else:
+        value = read()   # version taken before the read: a write meanwhile makes this entry stale, not wrong
+        STORE.set(key, version, json_codec.dumps(value).encode("utf-8"), CACHE_TTL_S)
+    with _local_lock:
+        _local[key] = (version, now + CACHE_TTL_S, value)
+    return value
+
+
+# ---- following the other workers' writes ----
+_poll_lock = threading.Lock()
+try:
+    # from import on (before the indexes first read the tabs); any overlap
+    # with what they read is skipped by tab_index
+    _position: Any = STORE.head()
+except Exception as e:  # store unreachable: start from the first poll instead
+    print(f"[shared_cache] write log unavailable at startup: {e}")
+    _position = None
+
+
+def poll() -> Tuple[List[Dict[str, Any]], bool]:
+    """Writes by other processes since the last poll, and whether some were missed (trimmed)."""
+    global _position
+    with _poll_lock:
+        if _position is None:
+            _position = STORE.head()   # earlier writes are in the sheet, read by the first index build
+            return [], False
+        rows, gap = STORE.since(_position)
+        if rows:
+            _position = rows[-1][0]
+    entries = [json_codec.loads(raw) for _seq, raw in rows]
+    return [e for e in entries if e["o"] != ORIGIN], gap
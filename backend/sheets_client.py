@@ -1,51 +1,216 @@
 # backend/sheets_client.py
 from __future__ import annotations
-from typing import Any, List, Tuple, Optional, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Tuple, Optional, Dict, TypeVar
 import os
+import re
+import threading
 import gspread
 from google.oauth2.service_account import Credentials
 from gspread.utils import rowcol_to_a1
 
+import shared_cache
+from diet_app_ai.circuit_breaker import CircuitBreaker
+from shard_map import SHARED_TABS, Shard, ShardMap
+
+T = TypeVar("T")
+
 # ---- CONFIG ----
 SPREADSHEET_ID = os.environ.get("SPREADSHEET_ID", "16XTW3RelaEbkubvk7OXP8_EcKx05Pmd8LdHEM5Gs-Cc")
 CREDS_FILE = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", "backend/credentials.json")
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 
-# Authorize once and reuse
-_creds = Credentials.from_service_account_file(CREDS_FILE, scopes=SCOPES)
-_gc = gspread.authorize(_creds)
-_sheet = _gc.open_by_key(SPREADSHEET_ID)
+SHEETS_BACKEND = os.environ.get("SHEETS_BACKEND", "google")  # google | memory
+
+# One spreadsheet unless SHEETS_SHARD_MAP says otherwise (see shard_map.py)
+SHARDS = ShardMap.from_env(SPREADSHEET_ID)
+
+# -------- Opening spreadsheets --------
+# Authorize once per credentials file and reuse
+_clients: Dict[str, Any] = {}
+_books: Dict[str, Any] = {}
+_open_lock = threading.Lock()
+
+def _seed_filter(shard_index: int) -> Callable[[str, List[Any], List[Any]], bool]:
+    """Memory backend: which rows of SHEETS_MEMORY_SEED belong on this shard."""
+    def keep(tab: str, header: List[Any], row: List[Any]) -> bool:
+        if tab in SHARED_TABS or "Username" not in header:
+            return shard_index == 0
+        i = header.index("Username")
+        return SHARDS.shard_of(str(row[i]) if i < len(row) else "") == shard_index
+    return keep
 
-def _ws(tab: str):
+def open_spreadsheet(shard: Shard) -> Any:
+    """The (cached) Spreadsheet for a shard; also used by rebalance_shards.py for new shards."""
+    with _open_lock:
+        book = _books.get(shard.id)
+        if book is None:
+            if SHEETS_BACKEND == "memory":
+                from memory_sheets import MemorySpreadsheet
+                index = next((i for i, s in enumerate(SHARDS.shards) if s.id == shard.id), None)
+                book = MemorySpreadsheet.from_env(_seed_filter(index) if index is not None else lambda *_: False)
+            else:
+                creds_file = shard.credentials or CREDS_FILE
+                gc = _clients.get(creds_file)
+                if gc is None:
+                    gc = _clients[creds_file] = gspread.authorize(
+                        Credentials.from_service_account_file(creds_file, scopes=SCOPES))
+                book = gc.open_by_key(shard.id)
+            _books[shard.id] = book
+        return book
+
+_sheets = [open_spreadsheet(s) for s in SHARDS.shards]
+_sheet = _sheets[0]  # home shard
+
+def books() -> List[Any]:
+    """The open Spreadsheet of every shard, home first."""
+    return list(_sheets)
+
+def _ws(tab: str, shard: int = 0):
     """Get worksheet by exact title."""
-    return _sheet.worksheet(tab)
+    return _sheets[shard].worksheet(tab)
+
+# -------- Routing --------
+# Shared tabs live on the home shard; other tabs are split by Username.
+# A read that names its user goes to that user's shard only; whole-tab
+# reads without a user (index rebuilds, admin and bulk jobs) fan out to
+# every shard concurrently.
+_username_cols: Dict[str, Optional[int]] = {}
+_fanout = ThreadPoolExecutor(max_workers=max(len(_sheets), 1) * 4, thread_name_prefix="sheets-shard") \
+    if len(_sheets) > 1 else None
+
+def shard_for(username: str) -> int:
+    return SHARDS.shard_of(username)
+
+def _shard(tab: str, username: Optional[str]) -> Optional[int]:
+    """Shard to read `tab` from, or None for all of them."""
+    if len(_sheets) == 1 or tab in SHARED_TABS:
+        return 0
+    return None if username is None else shard_for(username)
+
+def _row_shard(tab: str, row: List[Any]) -> int:
+    """Shard a row of `tab` is written to (by its Username cell)."""
+    if len(_sheets) == 1 or tab in SHARED_TABS:
+        return 0
+    if tab not in _username_cols:
+        header = get_header(tab)
+        _username_cols[tab] = header.index("Username") if "Username" in header else None
+    i = _username_cols[tab]
+    return 0 if i is None else shard_for(str(row[i]) if i < len(row) else "")
+
+def each_shard(fn: Callable[[int], T]) -> List[T]:
+    """fn(shard) for every shard, concurrently; results in shard order."""
+    if _fanout is None:
+        return [fn(0)]
+    return list(_fanout.map(fn, range(len(_sheets))))
+
+# -------- Write listeners --------
+# Derived in-memory indexes subscribe here so they stay current without
+# re-reading tabs. Callback: fn(tab, first_row, rows, kind, shard) where
+# first_row is the 1-based sheet row of rows[0] on that shard (None if
+# unknown) and kind is "append" or "update". Every write is also published
+# to shared_cache, for the other workers (tab versions, write log).
+WriteListener = Callable[[str, Optional[int], List[List[Any]], str, int], None]
+_listeners: Dict[str, List[WriteListener]] = {}
+_UPDATED_ROW = re.compile(r"![A-Z]+(\d+)")
+
+def subscribe(tab: str, fn: WriteListener) -> None:
+    _listeners.setdefault(tab, []).append(fn)
+
+def _notify(tab: str, first_row: Optional[int], rows: List[List[Any]], kind: str, shard: int = 0) -> None:
+    for fn in _listeners.get(tab, ()):
+        try:
+            fn(tab, first_row, rows, kind, shard)
+        except Exception as e:  # an index bug must never fail the write
+            print(f"[sheets_client] write listener for {tab} failed: {e}")
+    try:
+        shared_cache.published(SHARDS.shards[shard].id, shard, tab, first_row, rows, kind)
+    except Exception as e:  # nor may the shared store
+        print(f"[sheets_client] publishing write to {tab} failed: {e}")
+
+def _first_row(resp: Any) -> Optional[int]:
+    """1-based row of the first appended row, from the API's updatedRange."""
+    try:
+        m = _UPDATED_ROW.search(resp["updates"]["updatedRange"])
+        return int(m.group(1)) if m else None
+    except (KeyError, TypeError):
+        return None
+
+# -------- Circuit breakers --------
+# Every API call below goes through its shard's breaker: once a spreadsheet
+# keeps failing, calls to it fail fast with CircuitOpenError (a
+# ConnectionError) instead of each waiting through the outage, while the
+# other shards carry on; see diet_app_ai/circuit_breaker.py.
+def _is_outage(e: BaseException) -> bool:
+    """Errors that say the API is unhealthy (not that the request was wrong)."""
+    if isinstance(e, gspread.exceptions.WorksheetNotFound):
+        return False
+    if isinstance(e, gspread.exceptions.APIError):
+        code = getattr(e, "code", None) or getattr(getattr(e, "response", None), "status_code", 0)
+        return code == 429 or code >= 500
+    return True
+
+BREAKERS = [CircuitBreaker("sheets" if i == 0 else f"sheets[{i}]", is_failure=_is_outage)
+            for i in range(len(_sheets))]
+BREAKER = BREAKERS[0]
+
+def breakers() -> Dict[str, Dict[str, Any]]:
+    """Breaker snapshot per shard (keyed by shard index), for /health/breakers."""
+    return {str(i): b.snapshot() for i, b in enumerate(BREAKERS)}
+
+def _call(shard: int, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    return BREAKERS[shard].call(fn, *args, **kwargs)
 
 # -------- Basic ops (API compatible with your existing code) --------
-def get_values(tab: str) -> List[List[str]]:
-    """Return all values, including header row. Empty cells come back as ''."""
-    return _ws(tab).get_all_values()
+def _read_values(shard: int, tab: str) -> List[List[str]]:
+    """A whole tab of one shard; small hot tabs through the shared read cache."""
+    def read() -> List[List[str]]:
+        return _call(shard, lambda: _ws(tab, shard).get_all_values())
+    if tab not in shared_cache.CACHED_TABS:
+        return read()
+    return [list(r) for r in shared_cache.cached_read(SHARDS.shards[shard].id, tab, read)]
 
-def append_row(tab: str, values: List[Any]) -> None:
-    _ws(tab).append_row(values, value_input_option="USER_ENTERED")
+def get_values(tab: str, username: Optional[str] = None) -> List[List[str]]:
+    """Return all values, including header row. Empty cells come back as ''.
+    With `username`, only that user's shard is read (its rows plus others on
+    the same shard); without, a sharded tab is read from every shard."""
+    shard = _shard(tab, username)
+    if shard is not None:
+        return _read_values(shard, tab)
+    return _merge(each_shard(lambda s: _read_values(s, tab)))
 
-def append_rows(tab: str, rows: List[List[Any]]) -> None:
-    if not rows:
-        return
-    _ws(tab).append_rows(rows, value_input_option="USER_ENTERED")
+def _merge(parts: List[List[List[str]]]) -> List[List[str]]:
+    """One header, then every shard's data rows in shard order."""
+    header = next((p[0] for p in parts if p), None)
+    if header is None:
+        return []
+    return [header] + [r for p in parts for r in p[1:]]
+
+def get_header(tab: str) -> List[str]:
+    """Header row only (row 1); every shard has the same headers."""
+    return _call(0, lambda: _ws(tab).row_values(1))
+
+def append_row(tab: str, values: List[Any]) -> None:
+    shard = _row_shard(tab, values)
+    resp = _call(shard, lambda: _ws(tab, shard).append_row(values, value_input_option="USER_ENTERED"))
+    _notify(tab, _first_row(resp), [values], "append", shard)
 
 def update_row(tab: str, row_index: int, values: List[Any]) -> None:
-    """row_index is 1-based including header (same as Google Sheets)."""
-    ws = _ws(tab)
+    """row_index is 1-based including header (same as Google Sheets), on the
+    shard of the row's user (as returned by find_row_by_header_value)."""
+    shard = _row_shard(tab, values)
     # Update the exact range width of 'values'
     end_a1 = rowcol_to_a1(row_index, len(values)).split(":")[0]
     rng = f"A{row_index}:{end_a1[1:]}" if ":" in end_a1 else f"A{row_index}:{end_a1}"
-    ws.update(rng, [values], value_input_option="USER_ENTERED")
+    _call(shard, lambda: _ws(tab, shard).update(rng, [values], value_input_option="USER_ENTERED"))
+    _notify(tab, row_index, [values], "update", shard)
 
-def batch_get(tabs: List[str]) -> Dict[str, List[List[str]]]:
-    """Fetch multiple tabs' values as a dict {tab: values}."""
+def _batch_get(shard: int, tabs: List[str]) -> Dict[str, List[List[str]]]:
+    if not tabs:
+        return {}
     # gspread batch_get takes A1 ranges; map titles to "'Tab'!A1:Z"
     ranges = [f"'{t}'!A1:Z" for t in tabs]
-    results = _sheet.values_batch_get(ranges=ranges)["valueRanges"]
+    results = _call(shard, lambda: _sheets[shard].values_batch_get(ranges=ranges))["valueRanges"]
     out: Dict[str, List[List[str]]] = {}
     for r in results:
         # r["range"] looks like 'Users'!A1:Z
@@ -53,23 +218,86 @@ def batch_get(tabs: List[str]) -> Dict[str, List[List[str]]]:
         out[tab] = r.get("values", [])
     return out
 
+def batch_get_shards(tabs: List[str]) -> List[Dict[str, List[List[str]]]]:
+    """
+    {tab: values} per shard (home first), one call per shard, concurrently.
+    Row numbers are those of each shard; shared tabs only come from home.
+    """
+    return each_shard(lambda s: _batch_get(s, [t for t in tabs if s == 0 or t not in SHARED_TABS]))
+
+def batch_get(tabs: List[str], username: Optional[str] = None) -> Dict[str, List[List[str]]]:
+    """Fetch multiple tabs' values as a dict {tab: values}. With `username`,
+    sharded tabs are read from that user's shard only."""
+    if len(_sheets) == 1:
+        return _batch_get(0, tabs)
+    if username is not None:
+        shard = shard_for(username)
+        out = _batch_get(shard, [t for t in tabs if shard == 0 or t not in SHARED_TABS])
+        if shard != 0 and any(t in SHARED_TABS for t in tabs):
+            out.update(_batch_get(0, [t for t in tabs if t in SHARED_TABS]))
+        return out
+    per_shard = batch_get_shards(tabs)
+    return {t: _merge([p.get(t, []) for p in per_shard]) for t in tabs}
+
+def batch_get_from(first_rows: Dict[str, int], shard: int = 0) -> Dict[str, List[List[str]]]:
+    """{tab: first 1-based row} -> {tab: that row and every row after it},
+    from one shard in ONE call (delta reads on top of a snapshot, see snapshot.py)."""
+    if not first_rows:
+        return {}
+    tabs = list(first_rows)
+    ranges = [f"'{t}'!A{first_rows[t]}:Z" for t in tabs]
+    results = _call(shard, lambda: _sheets[shard].values_batch_get(ranges=ranges))["valueRanges"]
+    return {t: r.get("values", []) for t, r in zip(tabs, results)}
+
+def batch_get_rows(runs: Dict[str, List[Tuple[int, int]]],
+                   username: Optional[str] = None) -> Dict[str, List[List[List[str]]]]:
+    """
+    Fetch specific 1-based inclusive row runs from several tabs in ONE call.
+    {tab: [(first, last), ...]} -> {tab: [rows_of_run_1, rows_of_run_2, ...]}
+    Row numbers are on `username`'s shard (home if None).
+    """
+    order = [(tab, a, b) for tab, rs in runs.items() for a, b in rs]
+    out: Dict[str, List[List[List[str]]]] = {tab: [] for tab in runs}
+    if not order:
+        return out
+    shard = shard_for(username) if username is not None else 0
+    ranges = [f"'{tab}'!A{a}:Z{b}" for tab, a, b in order]
+    results = _call(shard, lambda: _sheets[shard].values_batch_get(ranges=ranges))["valueRanges"]
+    for (tab, _a, _b), r in zip(order, results):
+        out[tab].append(r.get("values", []))
+    return out
+
 def find_row_by_header_value(tab: str, header_name: str, value: str) -> Tuple[Optional[int], Optional[List[str]], List[str]]:
-    """Return (row_index, row_values, header_row). row_index is 1-based."""
-    rows = get_values(tab)
-    if not rows:
-        return None, None, []
-    header = rows[0]
+    """Return (row_index, row_values, header_row). row_index is 1-based, on
+    the shard the row lives on (update_row finds it again from the row)."""
+    shard = _shard(tab, value if header_name == "Username" else None)
+    parts = [get_values(tab, value)] if shard is not None else each_shard(lambda s: _read_values(s, tab))
+    header: List[str] = next((p[0] for p in parts if p), [])
     if header_name not in header:
         return None, None, header
     idx = header.index(header_name)
-    for i, row in enumerate(rows[1:], start=2):
-        if len(row) > idx and row[idx] == value:
-            return i, row, header
+    for rows in parts:
+        for i, row in enumerate(rows[1:], start=2):
+            if len(row) > idx and row[idx] == value:
+                return i, row, header
     return None, None, header
 
 def append_rows(tab: str, rows: List[List[Any]]) -> None:
-    """Append multiple rows in one API call.
+    """Append multiple rows in one API call (per shard).
     Each inner list is a row aligned to your header order."""
     if not rows:
         return
-    _ws(tab).append_rows(rows, value_input_option="USER_ENTERED")
\ No newline at end of file
+    groups: Dict[int, List[List[Any]]] = {}
+    for r in rows:
+        groups.setdefault(_row_shard(tab, r), []).append(r)
+
+    def write(shard: int, part: List[List[Any]]) -> None:
+        resp = _call(shard, lambda: _ws(tab, shard).append_rows(part, value_input_option="USER_ENTERED"))
+        _notify(tab, _first_row(resp), part, "append", shard)
+
+    if len(groups) == 1 or _fanout is None:
+        for shard, part in groups.items():
+            write(shard, part)
+        return
+    for f in [_fanout.submit(write, shard, part) for shard, part in groups.items()]:
+        f.result()
@@ -0,0 +1,255 @@
+# backend/singleflight.py
+"""
+Single-flight coalescing for the generation endpoints.
+
+Concurrent identical requests (same endpoint, Username, day and body, e.g.
+a double tap on "generate") share ONE execution: the first caller runs the
+view, the others wait for it and receive a copy of the same response. This
+prevents duplicate LLM calls and duplicate MealIngredients/MealSteps rows.
+
+Within a process this uses an in-memory table of in-flight calls. With
+SINGLEFLIGHT_CROSS_PROCESS=1 it also coordinates gunicorn workers on the
+same host: the leader holds a lease row per key in a local SQLite database
+(local_store) and publishes its response there; followers poll for it.
+"""
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import current_app, g, request
+
+import local_store
+
+CROSS_PROCESS = os.environ.get("SINGLEFLIGHT_CROSS_PROCESS", "0") == "1"
+WAIT_TIMEOUT_S = float(os.environ.get("SINGLEFLIGHT_WAIT_TIMEOUT_S", "600"))
+POLL_S = float(os.environ.get("SINGLEFLIGHT_POLL_S", "0.05"))
+RESULT_TTL_S = float(os.environ.get("SINGLEFLIGHT_RESULT_TTL_S", "30"))
+
+# (body text, status, mimetype) — a response that can be replayed to followers
+Shared = Tuple[str, int, str]
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Shared] = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.stats = {"leaders": 0, "coalesced": 0, "cross_process_hits": 0}
+
+    def do(self, key: str, fn: Callable[[], Shared]) -> Tuple[Shared, bool]:
+        """Run fn once per key among concurrent callers. Returns (result, shared)."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["leaders"] += 1
+            else:
+                call.waiters += 1
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            if not call.done.wait(WAIT_TIMEOUT_S):
+                return fn(), False
+            if call.error is not None:
+                raise call.error
+            return call.result, True  # type: ignore[return-value]
+
+        try:
+            call.result = _cross_process(key, fn, self.stats) if CROSS_PROCESS else fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """asyncio flavour for the Quart views (one event loop per worker)."""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self.stats = {"leaders": 0, "coalesced": 0}
+
+    async def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        fut = self._calls.get(key)
+        if fut is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(fut), True
+        fut = self._calls[key] = asyncio.get_running_loop().create_future()
+        self.stats["leaders"] += 1
+        try:
+            result = await fn()
+            fut.set_result(result)
+            return result, False
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            self._calls.pop(key, None)
+
+
+# ---- cross-process coordination ----
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, pid INTEGER NOT NULL, expires REAL NOT NULL);
+"""
+
+
+def _results_db():
+    conn = local_store.connect("singleflight")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _acquire(db, key: str) -> bool:
+    """Take the key's lease unless a live leader holds an unexpired one."""
+    now = time.time()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        row = db.execute("SELECT pid, expires FROM leases WHERE key=?", (key,)).fetchone()
+        if row is not None and row["expires"] > now and _pid_alive(row["pid"]):
+            db.execute("COMMIT")
+            return False
+        db.execute("INSERT OR REPLACE INTO leases VALUES (?, ?, ?)", (key, os.getpid(), now + WAIT_TIMEOUT_S))
+        db.execute("COMMIT")
+        return True
+    except Exception:
+        if db.in_transaction:
+            db.execute("ROLLBACK")
+        raise
+
+
+def _lead(db, key: str, fn: Callable[[], Shared]) -> Shared:
+    try:
+        result = fn()
+        db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (key, json.dumps(result), time.time()))
+        db.execute("DELETE FROM results WHERE created_at < ?", (time.time() - RESULT_TTL_S,))
+        return result
+    finally:
+        db.execute("DELETE FROM leases WHERE key=? AND pid=?", (key, os.getpid()))
+
+
+def _cross_process(key: str, fn: Callable[[], Shared], stats: Dict[str, int]) -> Shared:
+    """
+    One leader per key across the host's workers: a row in `leases` (pid +
+    expiry, removed when the leader is done) instead of a lock file per key,
+    so nothing accumulates. Followers poll for the leader's result; when the
+    leader is gone without one they take over, and after WAIT_TIMEOUT_S they
+    run fn themselves.
+    """
+    db = _results_db()
+    started = time.time()
+    if _acquire(db, key):
+        return _lead(db, key, fn)
+    while time.time() - started < WAIT_TIMEOUT_S:
+        time.sleep(POLL_S)
+        row = db.execute("SELECT value FROM results WHERE key=? AND created_at >= ?",
+                         (key, started - RESULT_TTL_S)).fetchone()
+        if row is not None:
+            stats["cross_process_hits"] += 1
+            body, status, mimetype = json.loads(row["value"])
+            return body, int(status), mimetype
+        if _acquire(db, key):   # the leader failed, exited or expired
+            return _lead(db, key, fn)
+    print(f"[singleflight] leader for {key[:12]} still busy after {WAIT_TIMEOUT_S:g}s; running it here")
+    return fn()
+
+
+# ---- view decorators ----
+_flight = SingleFlight()
+_aflight = AsyncSingleFlight()
+
+
+def request_key(endpoint: str, body: Any, args: Dict[str, Any], username: Optional[str] = None) -> str:
+    """(endpoint, Username, date, inputs) -> stable hex key. `username` (session token) wins."""
+    body = body if isinstance(body, dict) else {}
+    username = username or ""
+    for k in ("Username", "username", "user", "name"):
+        if username:
+            break
+        if isinstance(body.get(k), str) and body[k].strip():
+            username = body[k].strip()
+            break
+    username = username or (args.get("Username") or args.get("username") or "").strip()
+    raw = json.dumps(
+        [endpoint, username, dt.date.today().isoformat(), body, args],
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def coalesce(view):
+    """Share one execution of a Flask view among concurrent identical requests."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        body = request.get_json(force=True, silent=True)
+        key = request_key(request.endpoint, body, request.args.to_dict(), g.get("username"))
+
+        def run() -> Shared:
+            resp = current_app.make_response(view(*args, **kwargs))
+            return resp.get_data(as_text=True), resp.status_code, resp.mimetype
+
+        (text, status, mimetype), shared = _flight.do(key, run)
+        resp = current_app.response_class(text, status=status, mimetype=mimetype)
+        if shared:
+            resp.headers["X-Coalesced"] = "1"
+        return resp
+    return wrapper
+
+
+def coalesce_async(view):
+    """Quart counterpart of `coalesce` (in-process only)."""
+    @functools.wraps(view)
+    async def wrapper(*args, **kwargs):
+        from quart import current_app as qapp, g as qg, request as qrequest
+
+        body = await qrequest.get_json(force=True, silent=True)
+        key = request_key(qrequest.endpoint, body, qrequest.args.to_dict(), qg.get("username"))
+
+        async def run() -> Shared:
+            resp = await qapp.make_response(await view(*args, **kwargs))
+            return (await resp.get_data(as_text=True)), resp.status_code, resp.mimetype
+
+        (text, status, mimetype), shared = await _aflight.do(key, run)
+        resp = qapp.response_class(text, status=status, mimetype=mimetype)
+        if shared:
+            resp.headers["X-Coalesced"] = "1"
+        return resp
+    return wrapper
+
+
+def stats() -> Dict[str, Any]:
+    """Leader / coalesced counts of this process (reported by GET /jobs/metrics)."""
+    return {"sync": dict(_flight.stats), "async": dict(_aflight.stats), "cross_process": CROSS_PROCESS}
@@ -0,0 +1,213 @@
+# backend/snapshot.py
+"""
+Columnar snapshots of the spreadsheet(s), for warm starts and offline analysis.
+
+    python snapshot.py export              # every tab of every shard -> <SNAPSHOT_DIR>/<UTC stamp>/
+    python snapshot.py export --parquet    # plus .parquet copies (pandas, duckdb, ...)
+    python snapshot.py info                # manifest of the latest snapshot
+
+A snapshot directory holds one Arrow IPC file per shard and tab (every
+column utf8, as Sheets returns strings; uncompressed, so it can be
+memory-mapped) and manifest.json:
+
+    {"created_at": ..., "shards": [{"id": <spreadsheet id>,
+                                    "tabs": {tab: {"file", "rows", "columns"}}}]}
+
+`rows` counts data rows (the header is row 1). LATEST names the newest
+snapshot; SNAPSHOT_DIR defaults to <BACKEND_STATE_DIR>/snapshots.
+
+Warm start (app.py): load(tabs) memory-maps the latest snapshot and
+delta-syncs it in one batch read per shard, concurrently: append-only tabs
+are fetched from the snapshot's last row on, tabs whose rows are updated in
+place (MUTABLE_TABS, one row per user) in full. The first fetched row must
+equal the snapshot's last row; if it doesn't (rows were deleted or
+rewritten, e.g. by rebalance_shards.py) that tab is read in full. A
+snapshot of a different shard layout is not used. pyarrow is optional;
+without it the indexes warm from Sheets as before.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import local_store
+import sheets_client
+from data_versions import USER_TABS
+from shard_map import SHARED_TABS
+
+try:
+    import pyarrow as pa  # optional
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover - depends on the deployment
+    pa = None
+
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", os.path.join(local_store.STATE_DIR, "snapshots"))
+MUTABLE_TABS = frozenset({"Users", "UserPreferences"})   # update_row targets
+
+Values = List[List[str]]
+
+
+def _tabs_of(shard: int, tabs: List[str]) -> List[str]:
+    return [t for t in tabs if shard == 0 or t not in SHARED_TABS]
+
+
+def _file(shard: int, tab: str) -> str:
+    return f"{shard}-{tab}.arrow"
+
+
+# ---- export ----
+def _table(values: Values) -> "pa.Table":
+    header = [str(h) for h in values[0]] if values else []
+    rows = values[1:]
+    columns = [pa.array([r[i] if i < len(r) else "" for r in rows], type=pa.string())
+               for i in range(len(header))]
+    return pa.Table.from_arrays(columns, names=header)
+
+
+def export(tabs: Optional[List[str]] = None, parquet: bool = False) -> str:
+    """Write a snapshot of `tabs` (default: all) from every shard; returns its directory."""
+    if pa is None:
+        raise SystemExit("snapshot export needs pyarrow (pip install pyarrow)")
+    tabs = list(tabs or USER_TABS)
+    created = dt.datetime.now(dt.timezone.utc)
+    name = created.strftime("%Y%m%dT%H%M%S%fZ")
+    out_dir = os.path.join(SNAPSHOT_DIR, name)
+    os.makedirs(out_dir)
+    manifest: Dict[str, Any] = {"created_at": created.isoformat(timespec="seconds"), "shards": []}
+    for shard, data in enumerate(sheets_client.batch_get_shards(tabs)):
+        entry: Dict[str, Any] = {"id": sheets_client.SHARDS.shards[shard].id, "tabs": {}}
+        for tab in _tabs_of(shard, tabs):
+            table = _table(data.get(tab) or [])
+            path = os.path.join(out_dir, _file(shard, tab))
+            with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            if parquet:
+                import pyarrow.parquet as pq
+                pq.write_table(table, path[: -len(".arrow")] + ".parquet")
+            entry["tabs"][tab] = {"file": _file(shard, tab), "rows": table.num_rows,
+                                  "columns": table.column_names}
+        manifest["shards"].append(entry)
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    tmp = os.path.join(SNAPSHOT_DIR, "LATEST.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(tmp, os.path.join(SNAPSHOT_DIR, "LATEST"))
+    return out_dir
+
+
+# ---- warm start ----
+def latest() -> Optional[Tuple[str, Dict[str, Any]]]:
+    """(directory, manifest) of the newest snapshot, or None."""
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, "LATEST"), encoding="utf-8") as f:
+            snap_dir = os.path.join(SNAPSHOT_DIR, f.read().strip())
+        with open(os.path.join(snap_dir, "manifest.json"), encoding="utf-8") as f:
+            return snap_dir, json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _read(path: str) -> Values:
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+        # via NumPy: several times faster than to_pylist() for string columns
+        columns = [c.to_numpy(zero_copy_only=False).tolist() for c in table.columns]
+    return [table.column_names] + [list(r) for r in zip(*columns)]
+
+
+def _same(a: List[Any], b: List[Any]) -> bool:
+    # Sheets drops trailing empty cells; the snapshot pads rows to the header
+    def trim(r: List[Any]) -> List[str]:
+        r = [str(v) for v in r]
+        while r and r[-1] == "":
+            r.pop()
+        return r
+    return trim(a) == trim(b)
+
+
+def _sync(shard: int, snap_dir: str, entry: Dict[str, Any], tabs: List[str]) -> Tuple[Dict[str, Values], Dict[str, int]]:
+    cached = {t: _read(os.path.join(snap_dir, entry["tabs"][t]["file"]))
+              for t in tabs if t in entry["tabs"] and t not in MUTABLE_TABS}
+    # the snapshot's last row sits at sheet row len(values) (header = row 1)
+    fetched = sheets_client.batch_get_from({t: len(cached[t]) if t in cached else 1 for t in tabs}, shard)
+    out: Dict[str, Values] = {}
+    stats = {"snapshot_rows": 0, "synced_rows": 0, "reread_tabs": 0}
+    stale = []
+    for t in tabs:
+        got = fetched.get(t, [])
+        if t not in cached:
+            out[t] = got
+            stats["synced_rows"] += len(got)
+        elif got and _same(got[0], cached[t][-1]):
+            out[t] = cached[t] + got[1:]
+            stats["snapshot_rows"] += len(cached[t])
+            stats["synced_rows"] += len(got) - 1
+        else:
+            stale.append(t)
+    if stale:
+        out.update(sheets_client.batch_get_from({t: 1 for t in stale}, shard))
+        stats["reread_tabs"] += len(stale)
+        stats["synced_rows"] += sum(len(out[t]) for t in stale)
+    return out, stats
+
+
+def load(tabs: List[str]) -> Optional[List[Dict[str, Values]]]:
+    """
+    {tab: values} per shard for `tabs`, from the latest snapshot plus the rows
+    added since; None when there is no usable snapshot (callers then read
+    Sheets as usual).
+    """
+    if pa is None or not tabs or os.environ.get("SNAPSHOT_WARM_START", "1") != "1":
+        return None
+    found = latest()
+    if found is None:
+        return None
+    snap_dir, manifest = found
+    if [s["id"] for s in manifest["shards"]] != [s.id for s in sheets_client.SHARDS.shards]:
+        print(f"[snapshot] {os.path.basename(snap_dir)} is of another shard layout; not used")
+        return None
+    t0 = time.perf_counter()
+    try:
+        results = sheets_client.each_shard(
+            lambda s: _sync(s, snap_dir, manifest["shards"][s], _tabs_of(s, tabs)))
+    except Exception as e:
+        print(f"[snapshot] warm start from {os.path.basename(snap_dir)} failed: {e}")
+        return None
+    totals = {k: sum(st[k] for _d, st in results) for k in results[0][1]}
+    print(f"[snapshot] warm start from {os.path.basename(snap_dir)} in {time.perf_counter() - t0:.2f}s: "
+          f"{totals['snapshot_rows']} rows mapped, {totals['synced_rows']} synced, "
+          f"{totals['reread_tabs']} tabs re-read")
+    return [data for data, _st in results]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ex = sub.add_parser("export", help="write a new snapshot")
+    ex.add_argument("--tabs", nargs="+", help="default: every tab")
+    ex.add_argument("--parquet", action="store_true", help="also write .parquet copies")
+    sub.add_parser("info", help="print the latest snapshot's manifest")
+    args = ap.parse_args()
+
+    if args.cmd == "export":
+        t0 = time.perf_counter()
+        out_dir = export(args.tabs, args.parquet)
+        print(f"snapshot written to {out_dir} in {time.perf_counter() - t0:.1f}s")
+        return
+    found = latest()
+    if found is None:
+        raise SystemExit(f"no snapshot in {SNAPSHOT_DIR}")
+    snap_dir, manifest = found
+    print(f"{snap_dir} (created {manifest['created_at']})")
+    for entry in manifest["shards"]:
+        for tab, t in entry["tabs"].items():
+            print(f"  {entry['id'][:24]:<26}{tab:<22}{t['rows']:>9} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# backend/status_index.py
+"""
+Materialized per-user status for /user/status.
+
+One record per user, kept current by the sheets_client write listeners
+(UserPreferences.save, /meals/feedback, /meals/daily, /summaries/run all
+write through it), so a status lookup is a dict read instead of two full
+tab downloads. `STATUS.rebuild()` recomputes everything from the tabs.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List
+
+from tab_index import TabIndex, Col
+
+
+@dataclass
+class UserStatus:
+    has_profile: bool = False
+    has_initial_feedback: bool = False
+    last_plan_date: str = ""        # latest daily (non-Initial) MealIngredients date
+    last_summary_date: str = ""     # latest UserSummarization date
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class StatusIndex(TabIndex):
+    TABS = ("UserPreferences", "UserMealPreferences", "MealIngredients", "UserSummarization")
+
+    def _reset(self) -> None:
+        self._by_user: Dict[str, UserStatus] = {}
+
+    def _user(self, username: str) -> UserStatus:
+        st = self._by_user.get(username)
+        if st is None:
+            st = self._by_user[username] = UserStatus()
+        return st
+
+    def _apply(self, tab: str, col: Col, first_row: int, rows: List[List[Any]]) -> None:
+        for r in rows:
+            username = col(r, "Username")
+            if not username:
+                continue
+            if tab == "UserPreferences":
+                self._user(username).has_profile = True
+            elif tab == "UserMealPreferences":
+                if col(r, "Initial").upper() == "TRUE":
+                    self._user(username).has_initial_feedback = True
+            elif tab == "MealIngredients":
+                date = col(r, "Date")
+                st = self._user(username)
+                if col(r, "MealType") != "Initial" and date > st.last_plan_date:
+                    st.last_plan_date = date
+            elif tab == "UserSummarization":
+                date = col(r, "Date")
+                st = self._user(username)
+                if date > st.last_summary_date:
+                    st.last_summary_date = date
+
+    def _apply_update(self, tab: str, col: Col, row_index: int, values: List[Any]) -> None:
+        # the only in-place write is the UserPreferences upsert
+        if tab == "UserPreferences" and col(values, "Username"):
+            self._user(col(values, "Username")).has_profile = True
+        else:
+            self._built = False
+
+    def get(self, username: str) -> UserStatus:
+        self.ensure_built()
+        with self._lock:
+            st = self._by_user.get(username)
+            return UserStatus(**asdict(st)) if st else UserStatus()
+
+
+STATUS = StatusIndex()
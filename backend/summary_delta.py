@@ -0,0 +1,252 @@
+# backend/summary_delta.py
+"""
+Incremental summary updates: per-user high-water marks.
+
+Each summary remembers the last sheet rows it has already folded in
+(local_store "summary_marks"), so /summaries/run sends the model only what
+arrived since, and skips a workflow entirely when nothing did:
+
+    biomarker summary   new UserBiomarker rows, plus the ingredient
+                        statistics when new picks (UserMealPreferences) or
+                        meals (MealIngredients) may have moved them; the
+                        statistics' hash is stored with the mark, so an
+                        unchanged result is not sent (or rerun) again
+    taste summary       new UserMealPreferences rows
+
+A summary without a mark (first run, or the state dir was wiped) falls back
+to the old behaviour: the last `window_days` of data. Marks only advance
+after the new summary row has been written, and they are the rows seen at
+collection time, so anything appended mid-run is picked up next time.
+
+The rows themselves come from ActivityIndex, which follows the three tabs
+like the other tab indexes, so collecting a delta costs no Sheets call.
+"""
+from __future__ import annotations
+
+import bisect
+import datetime as dt
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import biomarker_correlation
+import local_store
+from tab_index import TabIndex, Col
+
+from diet_app_ai import json_codec
+
+BIOMARKER_TAB = "UserBiomarker"
+PREFERENCE_TAB = "UserMealPreferences"
+MEAL_TAB = "MealIngredients"
+
+STATS_UNCHANGED = "Unchanged since the previous findings."
+
+
+def _date(s: str) -> Optional[dt.date]:
+    try:
+        return dt.datetime.strptime(s, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+class ActivityIndex(TabIndex):
+    """Per user and tab: the sheet rows (ascending) and what the summaries need of them."""
+
+    TABS = (BIOMARKER_TAB, PREFERENCE_TAB, MEAL_TAB)
+
+    def _reset(self) -> None:
+        # tab -> username -> ([row, ...], [item, ...]); MealIngredients keeps row numbers only
+        self._rows: Dict[str, Dict[str, Tuple[List[int], List[Any]]]] = {t: {} for t in self.TABS}
+
+    def _apply(self, tab: str, col: Col, first_row: int, rows: List[List[Any]]) -> None:
+        by_user = self._rows[tab]
+        for offset, r in enumerate(rows):
+            username = col(r, "Username")
+            if not username:
+                continue
+            if tab == BIOMARKER_TAB:
+                item: Any = {"date": col(r, "Date")}
+                for name in biomarker_correlation.BIOMARKERS:
+                    try:
+                        item[name] = int(col(r, name))
+                    except ValueError:
+                        continue
+            elif tab == PREFERENCE_TAB:
+                item = (col(r, "Date"), col(r, "MealCode"), col(r, "Like").upper() == "TRUE")
+            else:
+                item = None
+            rows_, items = by_user.setdefault(username, ([], []))
+            row = first_row + offset
+            if rows_ and row < rows_[-1]:  # another worker's write, applied late (tab_index.sync)
+                i = bisect.bisect_left(rows_, row)
+                rows_.insert(i, row)
+                items.insert(i, item)
+            else:
+                rows_.append(row)
+                items.append(item)
+
+    def head(self, username: str) -> Dict[str, int]:
+        """tab -> last row of `username` (0: none)."""
+        self.ensure_built()
+        with self._lock:
+            return {t: (self._rows[t][username][0][-1] if username in self._rows[t] else 0) for t in self.TABS}
+
+    def since(self, username: str, tab: str, after_row: int, upto_row: int) -> List[Any]:
+        """Items of rows in (after_row, upto_row] (O(log n + new rows))."""
+        self.ensure_built()
+        with self._lock:
+            rows, items = self._rows[tab].get(username, ([], []))
+            return items[bisect.bisect_right(rows, after_row):bisect.bisect_right(rows, upto_row)]
+
+    def recent(self, username: str, tab: str, window_days: int, today: dt.date, upto_row: int) -> List[Any]:
+        """Items of rows up to `upto_row` dated within the last `window_days` days."""
+        self.ensure_built()
+        with self._lock:
+            rows, items = self._rows[tab].get(username, ([], []))
+            items = items[:bisect.bisect_right(rows, upto_row)]
+        out = []
+        for item in items:
+            d = _date(item["date"] if tab == BIOMARKER_TAB else item[0])
+            if d and (today - d).days <= window_days:
+                out.append(item)
+        return out
+
+
+ACTIVITY = ActivityIndex()
+
+
+# ---- marks (local_store "summary_marks") ----
+@dataclass(frozen=True)
+class Mark:
+    biomarker_row: int = 0
+    preference_row: int = 0
+    meal_row: int = 0
+    stats_hash: str = ""
+
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
+def _conn():
+    global _schema_ready
+    conn = local_store.connect("summary_marks")
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS marks ("
+                    " username TEXT NOT NULL, summary TEXT NOT NULL,"
+                    " biomarker_row INTEGER NOT NULL, preference_row INTEGER NOT NULL,"
+                    " meal_row INTEGER NOT NULL, stats_hash TEXT NOT NULL,"
+                    " PRIMARY KEY (username, summary))"
+                )
+                _schema_ready = True
+    return conn
+
+
+def _load(username: str) -> Dict[str, Mark]:
+    rows = _conn().execute(
+        "SELECT summary, biomarker_row, preference_row, meal_row, stats_hash FROM marks WHERE username = ?",
+        (username,),
+    ).fetchall()
+    return {r["summary"]: Mark(r["biomarker_row"], r["preference_row"], r["meal_row"], r["stats_hash"])
+            for r in rows}
+
+
+def _store(username: str, marks: Dict[str, Mark]) -> None:
+    if not marks:
+        return
+    db = _conn()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        db.executemany(
+            "INSERT OR REPLACE INTO marks (username, summary, biomarker_row, preference_row, meal_row, stats_hash) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(username, s, m.biomarker_row, m.preference_row, m.meal_row, m.stats_hash) for s, m in marks.items()],
+        )
+        db.execute("COMMIT")
+    except Exception:
+        if db.in_transaction:
+            db.execute("ROLLBACK")
+        raise
+
+
+# ---- planning a run ----
+@dataclass
+class Plan:
+    username: str
+    need_bio: bool
+    need_taste: bool
+    bio_payload: Dict[str, str] = field(default_factory=dict)
+    taste_payload: Dict[str, str] = field(default_factory=dict)
+    marks: Dict[str, Mark] = field(default_factory=dict)    # stored by commit() once the summary row is written
+
+
+def _stats_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def plan(username: str, old_bio: str, old_taste: str, window_days: int = 7,
+         today: Optional[dt.date] = None, need_bio: bool = True, need_taste: bool = True) -> Plan:
+    """
+    What each summary workflow should be sent. A summary with no previous
+    text or no mark gets the `window_days` window; otherwise only rows past
+    its mark. need_bio / need_taste come back False when there is nothing new.
+    """
+    today = today or dt.date.today()
+    head = ACTIVITY.head(username)
+    marks = _load(username)
+    out = Plan(username, need_bio=False, need_taste=False)
+
+    bio_mark = marks.get("biomarker") if old_bio else None
+    if need_bio:
+        if bio_mark is None:
+            journal = ACTIVITY.recent(username, BIOMARKER_TAB, window_days, today, head[BIOMARKER_TAB])
+        else:
+            journal = ACTIVITY.since(username, BIOMARKER_TAB, bio_mark.biomarker_row, head[BIOMARKER_TAB])
+        stats, stats_hash = "", bio_mark.stats_hash if bio_mark else ""
+        moved = bio_mark is None or journal or head[PREFERENCE_TAB] > bio_mark.preference_row \
+            or head[MEAL_TAB] > bio_mark.meal_row
+        if moved:
+            stats = biomarker_correlation.findings_text(biomarker_correlation.analyze(username, today=today))
+            stats_hash = _stats_hash(stats)
+        stats_changed = moved and (bio_mark is None or stats_hash != bio_mark.stats_hash)
+        if bio_mark is None or journal or stats_changed:
+            out.need_bio = True
+            out.bio_payload = {
+                "existing_summary": old_bio or "",
+                "biomarker_journal": json_codec.dumps(journal),
+                "ingredient_stats": stats if stats_changed else STATS_UNCHANGED,
+            }
+            out.marks["biomarker"] = Mark(head[BIOMARKER_TAB], head[PREFERENCE_TAB], head[MEAL_TAB], stats_hash)
+
+    taste_mark = marks.get("taste") if old_taste else None
+    if need_taste:
+        if taste_mark is None:
+            picks = ACTIVITY.recent(username, PREFERENCE_TAB, window_days, today, head[PREFERENCE_TAB])
+        else:
+            picks = ACTIVITY.since(username, PREFERENCE_TAB, taste_mark.preference_row, head[PREFERENCE_TAB])
+        if taste_mark is None or picks:
+            out.need_taste = True
+            out.taste_payload = {
+                "existing_summary": old_taste or "",
+                "liked_meals": ", ".join(code for _d, code, like in picks if like),
+                "disliked_meals": ", ".join(code for _d, code, like in picks if not like),
+            }
+            out.marks["taste"] = Mark(preference_row=head[PREFERENCE_TAB])
+    return out
+
+
+def commit(plan_: Plan, bio_done: bool = True, taste_done: bool = True) -> None:
+    """Advance the marks of the summaries that were actually written."""
+    done = {"biomarker": bio_done, "taste": taste_done}
+    _store(plan_.username, {s: m for s, m in plan_.marks.items() if done[s]})
+
+
+def forget(usernames) -> None:
+    """Drop the marks of `usernames` (their row numbers changed, e.g. after rebalance_shards.py)."""
+    names = [(u,) for u in usernames]
+    if names:
+        _conn().executemany("DELETE FROM marks WHERE username = ?", names)
@@ -0,0 +1,55 @@
+# backend/summary_index.py
+"""
+Latest-summary pointer per user.
+
+Keeps, for every user, the sheet row of their most recent UserSummarization
+entry plus its summary text, so /meals/daily and /summaries/run read the
+current summaries without touching the Sheets API. Rows are appended in
+time order, so a later row always replaces the pointer.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+from tab_index import TabIndex, Col
+
+
+@dataclass(frozen=True)
+class LatestSummary:
+    row: int                    # 1-based sheet row in UserSummarization
+    date: str
+    biomarker_summary: str
+    preference_summary: str
+
+
+class SummaryIndex(TabIndex):
+    TABS = ("UserSummarization",)
+
+    def _reset(self) -> None:
+        self._latest: Dict[str, LatestSummary] = {}
+
+    def _apply(self, tab: str, col: Col, first_row: int, rows: List[List[Any]]) -> None:
+        for offset, r in enumerate(rows):
+            username = col(r, "Username")
+            if not username:
+                continue
+            row = first_row + offset
+            prev = self._latest.get(username)
+            if prev is None or row >= prev.row:
+                self._latest[username] = LatestSummary(
+                    row=row,
+                    date=col(r, "Date"),
+                    biomarker_summary=col(r, "BiomarkerSummary"),
+                    preference_summary=col(r, "PreferenceSummary"),
+                )
+
+    def latest(self, username: str) -> Tuple[str, str]:
+        """Return (biomarker_summary, taste_profile); empty strings if none."""
+        self.ensure_built()
+        with self._lock:
+            s = self._latest.get(username)
+        return (s.biomarker_summary, s.preference_summary) if s else ("", "")
+
+
+SUMMARIES = SummaryIndex()
@@ -0,0 +1,165 @@
+# backend/tab_index.py
+"""
+Base class for in-memory indexes derived from Sheets tabs.
+
+An index declares the tabs it follows, rebuilds itself from one batch_get
+of those tabs (per shard, see shard_map.py), and afterwards applies every
+write made through sheets_client incrementally (see sheets_client.subscribe),
+so reads never touch the API.
+
+Row numbers passed to _apply are those of the shard the rows live on. All
+of a user's rows share one shard, so per-user row numbers stay comparable.
+
+Writes made by other worker processes arrive through the shared write log
+(shared_cache.py): ensure_built() first applies whatever was logged since
+the last look (sync()), skipping rows the index already read from the tab.
+
+Subclasses implement:
+    _reset()                                   clear all derived state
+    _apply(tab, col, first_row, rows)          fold appended rows in
+and may override _apply_update() (default: mark dirty, rebuild lazily).
+`col(row, "Header")` returns the cell under that header or "".
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import shared_cache
+import sheets_client
+
+Col = Callable[[List[Any], str], str]
+
+
+def _col_getter(header: List[str]) -> Col:
+    pos = {name: i for i, name in enumerate(header)}
+
+    def col(row: List[Any], name: str) -> str:
+        i = pos.get(name)
+        if i is None or i >= len(row) or row[i] is None:
+            return ""
+        return str(row[i])
+    return col
+
+
+_registry: List["TabIndex"] = []
+
+
+_sync_lock = threading.Lock()
+
+
+def sync() -> None:
+    """Apply the writes other workers logged since the last call to every index."""
+    if not _sync_lock.acquire(blocking=False):
+        return  # another thread is applying them right now
+    try:
+        entries, gap = shared_cache.poll()
+        if gap:
+            print("[tab_index] missed writes from other workers; indexes will rebuild")
+            for index in _registry:
+                index._built = False
+        for e in entries:
+            for index in _registry:
+                if e["t"] in index.TABS:
+                    index._replay(e["t"], e["f"], e["r"], e["k"], e["s"])
+    except Exception as e:
+        print(f"[tab_index] sync with other workers failed: {e}")
+    finally:
+        _sync_lock.release()
+
+
+def followed_tabs() -> List[str]:
+    """Every tab some index follows."""
+    return list(dict.fromkeys(tab for index in _registry for tab in index.TABS))
+
+
+def warm_all(data: Optional[List[Dict[str, List[List[str]]]]] = None) -> None:
+    """
+    Rebuild every index that has been created (called once at startup),
+    from `data` ({tab: values} per shard, e.g. snapshot.load()) when given,
+    else each from its own batch_get.
+    """
+    for index in list(_registry):
+        try:
+            index.rebuild(data)
+        except Exception as e:
+            print(f"[tab_index] warm-up of {type(index).__name__} failed, will build lazily: {e}")
+
+
+class TabIndex:
+    TABS: Tuple[str, ...] = ()
+
+    def __init__(self):
+        _registry.append(self)
+        self._lock = threading.RLock()
+        self._built = False
+        self._cols: Dict[str, Col] = {}
+        self._next_row: Dict[Tuple[int, str], int] = {}   # (shard, tab) -> next row
+        self._read_upto: Dict[Tuple[int, str], int] = {}  # (shard, tab) -> first row not in the last rebuild
+        for tab in self.TABS:
+            sheets_client.subscribe(tab, self._on_write)
+
+    # ---- subclass hooks ----
+    def _reset(self) -> None:
+        raise NotImplementedError
+
+    def _apply(self, tab: str, col: Col, first_row: int, rows: List[List[Any]]) -> None:
+        raise NotImplementedError
+
+    def _apply_update(self, tab: str, col: Col, row_index: int, values: List[Any]) -> None:
+        self._built = False
+
+    # ---- lifecycle ----
+    def rebuild(self, data: Optional[List[Dict[str, List[List[str]]]]] = None) -> None:
+        """Full rebuild from the tabs (one batch_get per shard), or from `data` already read."""
+        # the lock is held across the read so no write can slip in between
+        with self._lock:
+            shards = data if data is not None else sheets_client.batch_get_shards(list(self.TABS))
+            self._reset()
+            self._cols.clear()
+            for shard, data in enumerate(shards):
+                for tab in self.TABS:
+                    rows = data.get(tab) or []
+                    if rows and tab not in self._cols:
+                        self._cols[tab] = _col_getter(rows[0])
+                    self._next_row[(shard, tab)] = self._read_upto[(shard, tab)] = len(rows) + 1
+                    if len(rows) > 1:
+                        self._apply(tab, self._cols[tab], 2, rows[1:])
+            for tab in self.TABS:
+                self._cols.setdefault(tab, _col_getter([]))
+            self._built = True
+
+    def ensure_built(self) -> None:
+        sync()
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self.rebuild()
+
+    def _on_write(self, tab: str, first_row: Optional[int], rows: List[List[Any]], kind: str,
+                  shard: int = 0) -> None:
+        with self._lock:
+            if not self._built:
+                return  # the next rebuild will read these rows
+            col = self._cols.get(tab)
+            if col is None:
+                self._built = False
+                return
+            if kind == "update":
+                for offset, values in enumerate(rows):
+                    self._apply_update(tab, col, (first_row or 0) + offset, values)
+                return
+            if first_row is not None:
+                # a write that landed while rebuild() was reading: skip the rows it already read
+                seen = self._read_upto.get((shard, tab), 0) - first_row
+                if seen >= len(rows):
+                    return
+                if seen > 0:
+                    first_row, rows = first_row + seen, rows[seen:]
+            start = first_row or self._next_row.get((shard, tab), 0)
+            self._apply(tab, col, start, rows)
+            self._next_row[(shard, tab)] = start + len(rows)
+
+    def _replay(self, tab: str, first_row: Optional[int], rows: List[List[Any]], kind: str, shard: int) -> None:
+        """A write logged by another worker (see sync()); _on_write skips what a rebuild already read."""
+        self._on_write(tab, first_row, rows, kind, shard)
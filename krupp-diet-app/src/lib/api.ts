@@ -1,4 +1,5 @@
 import { saveUsername } from "@/lib/user";
+import { getToken, setToken } from "@/lib/session";
 import { useRouter } from "next/navigation";
 
 // lib/api.ts
@@ -6,6 +7,11 @@ const RAW_BASE = process.env.NEXT_PUBLIC_API_BASE ?? "http://127.0.0.1:8000";
 // normalize: remove trailing slash
 const API_BASE = RAW_BASE.replace(/\/+$/, "");
 
+function authHeaders(): Record<string, string> {
+  const token = getToken();
+  return token ? { Authorization: `Bearer ${token}` } : {};
+}
+
 function u(path: string) {
   return `${API_BASE}${path.startsWith("/") ? path : `/${path}`}`;
 }
@@ -14,8 +20,8 @@ async function http<T>(path: string, init?: RequestInit): Promise<T> {
   const res = await fetch(`${API_BASE}${path}`, {
     // Important for client components; avoid caching cross-origin GETs
     cache: 'no-store',
-    headers: { 'Content-Type': 'application/json', ...(init?.headers ?? {}) },
     ...init,
+    headers: { 'Content-Type': 'application/json', ...authHeaders(), ...(init?.headers ?? {}) },
   });
   if (!res.ok) {
     // try to surface JSON error bodies
@@ -28,6 +34,24 @@ async function http<T>(path: string, init?: RequestInit): Promise<T> {
   return (text ? JSON.parse(text) : ({} as any)) as T;
 }
 
+// ETag revalidation for read endpoints: repeat visits send If-None-Match and
+// reuse the cached body on 304 (no Sheets reads, no payload on the wire).
+const etagCache = new Map<string, { etag: string; body: any }>();
+
+async function cachedGet<T>(path: string): Promise<T> {
+  const hit = etagCache.get(path);
+  const res = await fetch(u(path), {
+    method: "GET",
+    cache: "no-store",
+    headers: { ...authHeaders(), ...(hit ? { "If-None-Match": hit.etag } : {}) },
+  });
+  if (res.status === 304 && hit) return hit.body as T;
+  const body = await handle(res);
+  const etag = res.headers.get("ETag");
+  if (etag) etagCache.set(path, { etag, body });
+  return body as T;
+}
+
 async function handle(res: Response) {
   // let the caller check res.status before throwing
   if (!res.ok) {
@@ -53,6 +77,19 @@ export type IngredientsResponse = {
   dinner: IngredientsSection;
 };
 
+/** limit: 1-100 (default 20); since/until: YYYY-MM-DD, inclusive */
+export type HistoryQuery = { limit?: number; cursor?: string | null; since?: string; until?: string };
+export type HistoryPage<T> = { items: T[]; next_cursor: string | null };
+
+function historyPath(path: string, username: string, opts: HistoryQuery) {
+  const q = new URLSearchParams({ username });
+  if (opts.limit) q.set("limit", String(opts.limit));
+  if (opts.cursor) q.set("cursor", opts.cursor);
+  if (opts.since) q.set("since", opts.since);
+  if (opts.until) q.set("until", opts.until);
+  return `${path}?${q.toString()}`;
+}
+
 
 export const api = {
   login: async (usernameInput: any, passwordInput: any) => {
@@ -76,7 +113,9 @@ export const api = {
 
     // Allow the app to branch on “needsPassword” without throwing
     if (res.status === 409) return { needsPassword: true as const };
-    return handle(res); // { ok: true }
+    const out = await handle(res); // { ok: true, token, expires_at }
+    if (out?.token) setToken(out.token);
+    return out;
   },
 
   register: async (usernameInput: any, passwordInput: any) => {
@@ -115,10 +154,7 @@ export const api = {
   },
 
   async status(username: string) {
-    const res = await fetch(u(`/user/status?username=${encodeURIComponent(username)}`), {
-      method: "GET",
-    });
-    return handle(res);
+    return cachedGet<any>(`/user/status?username=${encodeURIComponent(username)}`);
   },
 
   setupUser(payload: {
@@ -161,7 +197,7 @@ export const api = {
   biomarkers(username: string, b1: number, b2: number, b3: number) {
     return fetch(`${API_BASE}/biomarkers`, {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { 'Content-Type': 'application/json', ...authHeaders() },
       body: JSON.stringify({
         Username: username,
         "Mood": b1,
@@ -173,7 +209,34 @@ export const api = {
       return res.json();
     });
   },
-  
+
+  /** Rolling 7/30/90-day biomarker means, deltas and streaks */
+  biomarkerTrends(username: string) {
+    type Trend = { mean: number | null; prev_mean: number | null; delta: number | null };
+    return http<{
+      username: string;
+      as_of: string;
+      days_logged: number;
+      last_logged: string | null;
+      windows: Record<string, { days: number; Mood: Trend; Energy: Trend; Fullness: Trend }>;
+      streaks: { logging: number; Mood?: number; Energy?: number; Fullness?: number };
+    }>(`/biomarkers/trends?username=${encodeURIComponent(username)}`);
+  },
+
+  /** Generated meals, newest first; pass next_cursor back to get the next page */
+  mealHistory(username: string, opts: HistoryQuery = {}) {
+    return cachedGet<HistoryPage<{ date: string; meal_type: string; meal_code: string; description: string }>>(
+      historyPath("/history/meals", username, opts)
+    );
+  },
+
+  /** Likes / dislikes, newest first; pass next_cursor back to get the next page */
+  feedbackHistory(username: string, opts: HistoryQuery = {}) {
+    return cachedGet<HistoryPage<{ date: string; meal_code: string; like: boolean; initial: boolean }>>(
+      historyPath("/history/feedback", username, opts)
+    );
+  },
+
   runSummaries(username: string, windowDays = 7) {
     return http<{ ok: true }>('/summaries/run', {
       method: 'POST',
@@ -188,18 +251,25 @@ export const api = {
     );
   },
 
-  chosenIngredients(username: string, mealCodes: string[]) {
-    return http<Record<"breakfast"|"lunch"|"dinner", Record<string, {
-      description?: string;
-      ingredients: Record<string, string>;
-      // steps is optional — we render it if present
-      steps?: string[] | string;
-    }>>>('/meals/ingredients', {
+  swapMeal(username: string, mealType: "breakfast" | "lunch" | "dinner", mealCode: string, existingCodes: string[] = []) {
+    return http<{ meal_type: string; replaced: string; meal: Record<string, any> }>('/meals/swap', {
       method: 'POST',
       body: JSON.stringify({
         Username: username,
-        MealCodes: mealCodes,
+        MealType: mealType,
+        MealCode: mealCode,
+        ExistingCodes: existingCodes,
       }),
     });
   },
+
+  chosenIngredients(username: string, mealCodes: string[]) {
+    const codes = mealCodes.map(encodeURIComponent).join(",");
+    return cachedGet<Record<"breakfast"|"lunch"|"dinner", Record<string, {
+      description?: string;
+      ingredients: Record<string, string>;
+      // steps is optional — we render it if present
+      steps?: string[] | string;
+    }>>>(`/meals/ingredients?username=${encodeURIComponent(username)}&MealCodes=${codes}`);
+  },
 }
\ No newline at end of file
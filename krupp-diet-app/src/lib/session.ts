@@ -2,3 +2,8 @@
 export const getUser = () => (typeof window !== 'undefined' ? localStorage.getItem('username') : null);
 export const setUser = (u: string) => localStorage.setItem('username', u);
 export const clearUser = () => localStorage.removeItem('username');
+
+// Signed session token issued by /auth/login (sent as `Authorization: Bearer`)
+export const getToken = () => (typeof window !== 'undefined' ? localStorage.getItem('session_token') : null);
+export const setToken = (t: string) => localStorage.setItem('session_token', t);
+export const clearToken = () => localStorage.removeItem('session_token');